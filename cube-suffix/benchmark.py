@@ -0,0 +1,103 @@
+"""Benchmarks for the Hensel lifting used to find cubes with a given suffix.
+
+Usage:
+    python benchmark.py [bits ...]
+"""
+
+import random
+import sys
+import time
+
+import cube_suffix
+import hensel
+import polynomial
+
+
+def _recursive_hensel_lift(f, p, k):
+    """Reference (original) recursive implementation of hensel.hensel_lift."""
+    if k == 1:
+        return [x for x in range(p) if f.eval(x) % p == 0]
+    roots = _recursive_hensel_lift(f, p, k - 1)
+    new_roots = []
+    df = f.derivative()
+    for r in roots:
+        if df.eval(r) % p != 0:
+            df_r_inv = hensel.modinv(df.eval(r), p)
+            new_root = (r - f.eval(r) * df_r_inv) % p**k
+            assert f.eval(new_root) % p**k == 0
+            new_roots.append(new_root)
+        elif f.eval(r) % p**k == 0:
+            for t in range(p):
+                new_root = (r + t * p**(k - 1)) % p**k
+                assert f.eval(new_root) % p**k == 0
+                new_roots.append(new_root)
+    return new_roots
+
+
+def _power_list_eval(f, x):
+    """Reference (original) implementation of polynomial.Polynomial.eval."""
+    xs = [x**i for i in range(len(f.coefficients))]
+    terms = [coefficient * x for coefficient, x in zip(f.coefficients, xs)]
+    return sum(terms)
+
+
+def _time(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def benchmark_hensel_lift(bits):
+    """Compares the recursive, iterative and quadratic lifting for odd
+    suffixes, as well as the specialized 2-adic cube root.
+    """
+    print("%6s %12s %12s %8s %12s %8s %12s %8s" % (
+        "bits", "recursive", "iterative", "speedup", "quadratic", "speedup",
+        "2-adic", "speedup"))
+    for k in bits:
+        suffix = random.getrandbits(k) | 1 | (1 << (k - 1))
+        f = polynomial.Polynomial(coefficients=[-suffix, 0, 0, 1])
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), k + 100))
+        recursive_time, expected = _time(_recursive_hensel_lift, f, 2, k)
+        iterative_time, roots = _time(hensel.hensel_lift, f, 2, k)
+        quadratic_time, quadratic_roots = _time(hensel.hensel_lift, f, 2, k,
+                                                quadratic=True)
+        cube_root_time, cube_root = _time(cube_suffix.cube_root_2adic, suffix,
+                                          k)
+        assert list(roots) == expected and list(quadratic_roots) == expected
+        assert [cube_root] == expected
+        print("%6d %11.4fs %11.4fs %7.1fx %11.4fs %7.1fx %11.6fs %7.0fx" % (
+            k, recursive_time, iterative_time, recursive_time / iterative_time,
+            quadratic_time, recursive_time / quadratic_time,
+            cube_root_time, recursive_time / cube_root_time))
+
+
+def benchmark_polynomial_eval(bits, degrees=(3, 16), points=200):
+    """Compares power-list and Horner evaluation of f(x) mod 2^bits."""
+    print("%6s %6s %12s %12s %12s %12s" % (
+        "bits", "degree", "power list", "horner", "horner mod", "eval_many"))
+    for k in bits:
+        modulus = 2**k
+        xs = [random.getrandbits(k) for _ in range(points)]
+        for degree in degrees:
+            f = polynomial.Polynomial(coefficients=[
+                random.getrandbits(k) for _ in range(degree + 1)])
+            power_list_time, expected = _time(
+                lambda: [_power_list_eval(f, x) % modulus for x in xs])
+            horner_time, values = _time(
+                lambda: [f.eval(x) % modulus for x in xs])
+            horner_mod_time, mod_values = _time(
+                lambda: [f.eval(x, mod=modulus) for x in xs])
+            eval_many_time, many_values = _time(f.eval_many, xs, mod=modulus)
+            assert expected == values == mod_values == many_values
+            print("%6d %6d %11.4fs %11.4fs %11.4fs %11.4fs" % (
+                k, degree, power_list_time, horner_time, horner_mod_time,
+                eval_many_time))
+
+
+if __name__ == "__main__":
+    random.seed(1337)
+    bits = [int(arg) for arg in sys.argv[1:]] or [256, 2048, 8192]
+    benchmark_hensel_lift(bits)
+    print()
+    benchmark_polynomial_eval(bits)
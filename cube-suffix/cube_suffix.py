@@ -39,28 +39,130 @@ For even 'suffix':
        0xf6**3 = 0xe32818
 """
 
+import functools
+import itertools
+import multiprocessing
+
 import hensel
 import polynomial
 
 
-def cubic_suffix(suffix):
-    """Tries to find an 'x' such that x**3 has the provided suffix."""
-    # f(x) = x**3 - suffix
-    # By finding roots of 'f' mod 2**bitlen(suffix), we are finding values for
-    # which x**3 will have the provided suffix, in bits.
-    f = polynomial.Polynomial(coefficients=[-suffix, 0, 0, 1])
-    k = max(suffix.bit_length(), 1)  # hensel_lift expects k > 0.
-    # Note that we round up bitlen to a multiple of 8 bits, since we're working
-    # with bytes (e.g. 0x7d ends in same bits as 0x5, but we want the same
-    # ending bytes).
-    k += -k % 8  # Make k a multiple of 8 bits (byte)
-    return hensel.hensel_lift(f, 2, k)
-
-
-suffix = int(input("Enter the target suffix, as hex: "), 16)
-xs = cubic_suffix(suffix)
-for x in xs:
-    print("Solution: 0x%x**3 = 0x%x" % (x, x**3))
-    assert bin(x**3)[2:].endswith(bin(suffix)[2:])
-if not xs:
-    print("No possible x that gives a x**3 with suffix 0x%x." % suffix)
+def cubic_suffix(suffix, bits=None):
+    """Tries to find an 'x' such that x**3 has the provided suffix.
+
+    Returns the solutions as a hensel.RootSet, which can be iterated.
+
+    By default, the suffix is matched on its bit length rounded up to a whole
+    number of bytes. 'bits' can be given to match a specific number of bits
+    instead.
+    """
+    if bits is None:
+        bits = max(suffix.bit_length(), 1)  # hensel_lift expects k > 0.
+        # Note that we round up bitlen to a multiple of 8 bits, since we're
+        # working with bytes (e.g. 0x7d ends in same bits as 0x5, but we want
+        # the same ending bytes).
+        bits += -bits % 8  # Make bits a multiple of 8 bits (byte)
+    return _solver(bits).solve(suffix)
+
+
+def solve_many(suffixes, bits=None, processes=None):
+    """Yields cubic_suffix(suffix, bits) for each of the 'suffixes'.
+
+    Results are yielded in the same order as 'suffixes', as soon as they are
+    solved. Setup that only depends on the number of bits (the precisions
+    used by cube_root_2adic) is shared across suffixes.
+
+    If 'processes' is set, the work is spread over a pool of that many worker
+    processes (each keeping its own shared setup).
+    """
+    solve = functools.partial(cubic_suffix, bits=bits)
+    if not processes or processes == 1:
+        yield from map(solve, suffixes)
+        return
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap(solve, suffixes, chunksize=16)
+
+
+def cube_root_2adic(suffix, bits):
+    """Returns the x < 2**bits such that x**3 = suffix (mod 2**bits).
+
+    Specialized version of hensel.newton_lift for odd suffixes and p=2, using
+    only integer and bitwise operations (no polynomials, no egcd).
+
+    Flipping bit i of x flips bit i of x**3, leaving the lower bits untouched,
+    so the lowest set bit of x**3 - suffix tells us which bit of x to flip
+    next. A Newton step x' = x - (x**3 - suffix) * (3x**2)^(-1) does all of
+    these flips at once for the next e bits when x is correct on e bits,
+    doubling the number of correct bits at each step.
+
+    We start from closed forms mod 8: odd cubes are the identity mod 8 (so
+    x = suffix (mod 8)), and 3x**2 = 3 (mod 8) for odd x, whose inverse is 3
+    (3*3 = 9 = 1 (mod 8)). The inverse of 3x**2 is then refined with its own
+    Newton iteration (u' = u * (2 - 3x**2 * u)).
+
+    Complexity:
+        - O(lg bits) multiplications of numbers of up to 4*bits bits.
+    """
+    assert suffix % 2 == 1, "Only odd suffixes have a unique cube root."
+    return _cube_root_2adic(suffix, _newton_masks(bits), bits)
+
+
+def _newton_masks(bits):
+    """Returns masks 2**e - 1 for each precision 'e' of _cube_root_2adic.
+
+    Each precision is at most double the previous one, starting from 3 bits
+    (closed forms mod 8) and ending with exactly 'bits'.
+    """
+    exponents = []
+    while bits > 3:
+        exponents.append(bits)
+        bits = (bits + 1) // 2
+    return [(1 << e) - 1 for e in reversed(exponents)]
+
+
+def _cube_root_2adic(suffix, masks, bits):
+    x = suffix & 7  # Odd cubes are the identity mod 8.
+    inverse = 3  # (3x**2)^(-1) = 3^(-1) = 3 (mod 8) for odd x.
+    for mask in masks:
+        x = (x - (x * x * x - suffix) * inverse) & mask
+        inverse = (inverse * (2 - 3 * x * x * inverse)) & mask
+    return x & ((1 << bits) - 1)
+
+
+class _CubicSuffixSolver:
+    """Solves x**3 = suffix (mod 2^bits) for a fixed number of bits."""
+
+    def __init__(self, bits):
+        self.bits = bits
+        self.masks = _newton_masks(bits)
+
+    def solve(self, suffix):
+        if suffix % 2 == 1:
+            # For odd suffixes, there is a unique root (see module docstring).
+            root = _cube_root_2adic(suffix, self.masks, self.bits)
+            return hensel.RootSet(2, self.bits, [(root, self.bits)])
+        # f(x) = x**3 - suffix
+        # By finding roots of 'f' mod 2**bits, we are finding values for which
+        # x**3 will have the provided suffix, in bits.
+        # Even suffixes have a singular root mod 2, so hensel_lift lifts them
+        # one bit at a time.
+        f = polynomial.Polynomial(coefficients=[-suffix, 0, 0, 1])
+        return hensel.hensel_lift(f, 2, self.bits, quadratic=True)
+
+
+@functools.lru_cache(maxsize=None)
+def _solver(bits):
+    return _CubicSuffixSolver(bits)
+
+
+if __name__ == "__main__":
+    suffix = int(input("Enter the target suffix, as hex: "), 16)
+    xs = cubic_suffix(suffix)
+    # Singular roots can have a huge number of liftings, only show a few.
+    for x in itertools.islice(xs, 16):
+        print("Solution: 0x%x**3 = 0x%x" % (x, x**3))
+        assert bin(x**3)[2:].endswith(bin(suffix)[2:])
+    if xs.count() > 16:
+        print("... (%d solutions in total)" % xs.count())
+    if not xs:
+        print("No possible x that gives a x**3 with suffix 0x%x." % suffix)
@@ -0,0 +1,82 @@
+import itertools
+import random
+import unittest
+import hensel
+import polynomial
+from cube_suffix import cube_root_2adic, cubic_suffix, solve_many
+
+
+def hensel_roots(suffix, bits):
+    f = polynomial.Polynomial(coefficients=[-suffix, 0, 0, 1])
+    return list(hensel.hensel_lift(f, 2, bits))
+
+
+class CubeRoot2AdicTests(unittest.TestCase):
+    def test_all_small_odd_suffixes(self):
+        for bits in range(1, 11):
+            for suffix in range(1, 2**bits, 2):
+                x = cube_root_2adic(suffix, bits)
+                self.assertEqual([x], hensel_roots(suffix, bits))
+
+    def test_large_odd_suffixes(self):
+        random.seed(42)
+        for bits in [64, 255, 256, 1000, 2048]:
+            suffix = random.getrandbits(bits) | 1
+            x = cube_root_2adic(suffix, bits)
+            self.assertEqual(pow(x, 3, 2**bits), suffix)
+            self.assertEqual([x], hensel_roots(suffix, bits))
+
+    def test_even_suffix(self):
+        with self.assertRaises(AssertionError):
+            cube_root_2adic(0x18, 8)
+
+
+class CubicSuffixTests(unittest.TestCase):
+    def test_odd_suffix(self):
+        self.assertEqual(list(cubic_suffix(0x15)), [0x8d])
+
+    def test_even_suffix_multiple_roots(self):
+        self.assertEqual(list(cubic_suffix(0x18)), [0x36, 0xb6, 0x76, 0xf6])
+
+    def test_even_suffix_no_roots(self):
+        self.assertEqual(list(cubic_suffix(0x12)), [])
+
+    def test_bits(self):
+        self.assertEqual(list(cubic_suffix(0x15, bits=4)), [0xd])
+
+    def test_matches_hensel_lift(self):
+        for suffix in range(2**12):
+            self.assertEqual(list(cubic_suffix(suffix, bits=12)),
+                             hensel_roots(suffix, 12))
+
+
+class SolveManyTests(unittest.TestCase):
+    def test_input_order(self):
+        random.seed(42)
+        suffixes = [random.getrandbits(256) for _ in range(50)]
+        self.assertEqual(list(solve_many(suffixes)),
+                         [cubic_suffix(suffix) for suffix in suffixes])
+
+    def test_process_pool(self):
+        random.seed(42)
+        suffixes = [random.getrandbits(256) for _ in range(50)]
+        self.assertEqual(list(solve_many(suffixes, bits=200, processes=2)),
+                         [cubic_suffix(suffix, bits=200)
+                          for suffix in suffixes])
+
+    def test_single_process(self):
+        suffixes = [0x15, 0x18, 0x12, 0x8d]
+        expected = [cubic_suffix(suffix) for suffix in suffixes]
+        for processes in [None, 1]:
+            self.assertEqual(list(solve_many(suffixes, processes=processes)),
+                             expected)
+
+    def test_streams_results(self):
+        # Works on an endless input, yielding results as they are solved.
+        results = solve_many(itertools.count(1, 2), bits=8, processes=1)
+        self.assertEqual([list(roots) for roots in
+                          itertools.islice(results, 3)], [[1], [123], [93]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,67 @@
 """Usage of Hensel's Lemma to iteratively solve roots for f(x) = 0 (mod p^k)."""
 
+import itertools
+
+import hensel_validation as validation
+
+
+class RootSet:
+    """Roots of f mod p^k, stored as residue classes.
+
+    Each class (r, j) stands for the p^(k-j) roots x < p^k such that
+    x = r (mod p^j). When every lifting of a singular root is a root, it stays
+    a single class instead of being expanded to p explicit roots per level.
+
+    Roots are only made explicit when iterating, in the same order as lifting
+    explicit roots one exponent at a time would produce them.
+    """
+
+    def __init__(self, p, k, classes):
+        self.p = p
+        self.k = k
+        self.classes = classes
+
+    def __iter__(self):
+        for r, j in self.classes:
+            yield from _expand_class(self.p, self.k, r, j)
+
+    def count(self):
+        """Number of roots.
+
+        There is no len(): the number of roots can be larger than what it
+        supports (sys.maxsize), e.g. for singular roots with a large k.
+        """
+        return sum(self.p**(self.k - j) for _, j in self.classes)
+
+    def __bool__(self):
+        return bool(self.classes)
+
+    def __contains__(self, x):
+        return 0 <= x < self.p**self.k and any(
+            (x - r) % self.p**j == 0 for r, j in self.classes)
+
+    def __eq__(self, other):
+        return (self.__class__ == other.__class__ and
+                (self.p, self.k, self.classes) ==
+                (other.p, other.k, other.classes))
+
+    def __repr__(self):
+        return "RootSet(p=%d, k=%d, classes=%s)" % (self.p, self.k,
+                                                    self.classes)
+
+
+def _expand_class(p, k, r, j):
+    """Yields the roots x < p^k such that x = r (mod p^j)."""
+    # Digits are enumerated from least to most significant, so that the most
+    # significant digit varies fastest (as when lifting one digit at a time).
+    for digits in itertools.product(range(p), repeat=k - j):
+        root, power = r, p**j
+        for digit in digits:
+            root += digit * power
+            power *= p
+        yield root
+
+
 def egcd(a, b):
     """as + bt = gcd(a, b). Returns (gcd(a,b), s, t)"""
     # https://en.wikipedia.org/wiki/Extended_Euclidean_algorithm
@@ -22,8 +84,8 @@ def modinv(a, n):
     return t
 
 
-def hensel_lift(f, p, k):
-    """Returns a list of roots for f mod p^k, lifting solutions from mod p.
+def hensel_lift(f, p, k, validate=None, quadratic=False):
+    """Returns the roots of f mod p^k (RootSet), lifting solutions from mod p.
 
     For k=1, we can find roots by trying all x in range(p) (brute-force).
 
@@ -47,34 +109,184 @@ def hensel_lift(f, p, k):
     p^(k+1) * c (mod p^k) = p * p^k * c (mod p^k) = 0 (mod p^k)
     i.e. f(x) = 0 (mod p^(k+1)) => f(x) = 0 (mod p^k).
 
+    The lifting is done iteratively (see iter_roots) rather than recursively,
+    so that large k (e.g. 4096-bit suffixes) do not hit the recursion limit.
+    f'(x) is computed once, and simple roots are evaluated once per level.
+    Classes of singular roots take one Taylor expansion of f per level
+    instead, which also says whether to split them (see below).
+    Lifted roots are verified with an extra evaluation of f as the validation
+    policy 'validate' says (see hensel_validation.py, the global policy by
+    default): a few of them with "sampled", all of them at every level with
+    "full".
+
+    Roots are tracked as residue classes r mod p^j (j <= k), standing for all
+    the liftings of r, see RootSet. A class is kept whole while f(x) (mod p^k)
+    is the same for all of its members, which is checked from the Taylor
+    expansion of f at r (f(r + h) = sum c_i h^i, with h = 0 (mod p^j)).
+    Otherwise, it is split into the p classes mod p^(j+1) that it contains.
+    In particular, for a root r mod p^k with f'(r) = 0 (mod p), the class
+    r mod p^k is kept whole when f(r) = 0 (mod p^(k+1)), rather than
+    enumerating its p liftings.
+
+    If 'quadratic' is set, simple roots (f'(r) != 0 (mod p)) are lifted with
+    newton_lift instead, doubling the exponent at each step. Singular roots
+    are still lifted one exponent at a time.
+
     Resources:
     - https://math.stackexchange.com/a/90856
     - https://en.wikipedia.org/wiki/Hensel%27s_lemma#Hensel_lifting
     - https://brilliant.org/wiki/hensels-lemma/
     - https://github.com/gmossessian/Hensel
     """
+    return RootSet(p, k, list(_iter_classes(f, p, k, validate, quadratic)))
+
+
+def iter_roots(f, p, k, validate=None, quadratic=False):
+    """Yields the roots of f mod p^k, as soon as they are fully lifted.
+
+    Same roots (in the same order) as hensel_lift, but lifted depth-first:
+    each root mod p^i is lifted all the way to mod p^k before moving on to
+    the next one. Memory is bounded by the depth of the lifting, O(k), rather
+    than by the number of roots.
+    """
+    for r, j in _iter_classes(f, p, k, validate, quadratic):
+        yield from _expand_class(p, k, r, j)
+
+
+def first_root(f, p, k, validate=None, quadratic=False):
+    """Returns a root of f mod p^k, or None if there is none.
+
+    Stops lifting as soon as one root is found (see iter_roots).
+    """
+    return next(iter_roots(f, p, k, validate=validate, quadratic=quadratic),
+                None)
+
+
+def newton_moduli(p, k):
+    """Returns the moduli p^e visited by newton_lift to go from p to p^k.
+
+    Each exponent is at most double the previous one, ending with exactly k:
+    e.g. for k=10, the exponents are [2, 3, 5, 10].
+    """
+    exponents = []
+    while k > 1:
+        exponents.append(k)
+        k = (k + 1) // 2
+    return [p**e for e in reversed(exponents)]
+
+
+def newton_lift(f, p, root, moduli, df=None, validate=None):
+    """Lifts a simple root of f mod p to a root mod moduli[-1].
+
+    This is Newton's iteration in the p-adics: if f(r) = 0 (mod p^e) and
+    f'(r) != 0 (mod p), then s = r - f(r) * f'(r)^(-1) is a root mod p^(2e),
+    where f'(r)^(-1) only needs to be known mod p^e. This doubles the
+    precision at each step, instead of gaining one p-adic digit, so a 4096-bit
+    suffix takes 12 steps instead of 4096. The inverse itself is refined with
+    the same iteration (u' = u * (2 - f'(r) * u)), so we never need egcd on
+    large numbers.
+
+    'moduli' are the successive moduli to lift through (see newton_moduli),
+    each at most the square of the previous one, starting from p.
+
+    With the "full" validation policy (see hensel_validation.py), the root is
+    checked after each step, and with "sampled", only once lifted.
+    """
+    policy = validation.get_policy(validate)
+    if df is None:
+        df = f.derivative()
+    inverse = modinv(df.eval(root, mod=p), p)
+    for modulus in moduli:
+        root = (root - f.eval(root, mod=modulus) * inverse) % modulus
+        if policy == validation.FULL:
+            _check_root(f, root, modulus)
+        inverse = (inverse * (2 - df.eval(root, mod=modulus) * inverse) %
+                   modulus)
+    if policy == validation.SAMPLED and moduli:
+        _check_root(f, root, moduli[-1])
+    return root
+
+
+def _check_root(f, root, modulus):
+    assert f.eval(root, mod=modulus) == 0, \
+        "%d is not a root mod %d." % (root, modulus)
+
+
+def _iter_classes(f, p, k, validate, quadratic):
+    """Yields the classes of roots of f mod p^k (see RootSet), depth-first.
+
+    With the "sampled" validation policy, the classes yielded are checked per
+    validation.should_check, and with "full", every class at every level.
+    """
     assert k > 0
-    if k == 1:
-        # Find the roots (mod p) via bruteforce.
-        return [x for x in range(p) if f.eval(x) % p == 0]
-    # We'll be lifting solutions starting from f(x) = 0 (mod p^(k-1)).
-    roots = hensel_lift(f, p, k - 1)
-    new_roots = []
+    policy = validation.get_policy(validate)
+    yielded = 0
     df = f.derivative()
+    # Roots of f mod p (k=1), found via bruteforce.
+    roots = [x for x in range(p) if f.eval(x, mod=p) == 0]
+    # f'(r) (mod p) only depends on r (mod p), which is shared by all the
+    # liftings of a given root mod p. We can compute the inverses once.
+    inverses = {}
+    for r in roots:
+        df_r = df.eval(r, mod=p)
+        inverses[r] = modinv(df_r, p) if df_r != 0 else None
+    moduli = newton_moduli(p, k) if quadratic else None
     for r in roots:
-        if df.eval(r) % p != 0:  # f'(r) != 0, can apply Hensel's Lemma.
-            # We can lift to the unique solution mod p^k.
-            df_r_inv = modinv(df.eval(r), p)
-            new_root = (r - f.eval(r) * df_r_inv) % p**k
-            assert f.eval(new_root) % p**k == 0
-            new_roots.append(new_root)
-        elif f.eval(r) % p**k == 0:
-            # f'(r) = 0 (mod p), can't apply Hensel's Lemma directly.
-            # If f(r) = 0 (mod p^k), however, then every lifting of r to mod p^k
-            # is a root of f(x) mod p^k. Note that if it is not, then there is
-            # no lifting of r to mod p^k.
-            for t in range(p):
-                new_root = (r + t * p**(k - 1)) % p**k
-                assert f.eval(new_root) % p**k == 0
-                new_roots.append(new_root)
-    return new_roots
+        if quadratic and inverses[r] is not None:
+            # Simple root, unique lifting.
+            check = validation.should_check(yielded, policy)
+            yield newton_lift(f, p, r, moduli, df=df,
+                              validate=policy if check else validation.OFF), k
+            yielded += 1
+            continue
+        # stack[i-1] yields the classes of roots mod p^i left to lift, so
+        # that we only keep one pending generator per level.
+        stack = [iter([(r, 1)])]
+        modulus = p  # p^len(stack)
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:  # Done with this level, backtrack.
+                stack.pop()
+                modulus //= p
+                continue
+            if len(stack) == k:
+                if validation.should_check(yielded, policy):
+                    _check_root(f, child[0], modulus)
+                yield child
+                yielded += 1
+                continue
+            if policy == validation.FULL:
+                _check_root(f, child[0], modulus)
+            modulus *= p
+            stack.append(_lift_class(f, p, len(stack), modulus, *child,
+                                     inverses))
+
+
+def _lift_class(f, p, i, modulus, r, j, inverses):
+    """Yields the classes of roots mod p^(i+1) within a class of roots mod p^i.
+
+    The class r mod p^j contains roots of f mod p^i, 'modulus' is p^(i+1).
+    """
+    df_r_inv = inverses[r % p]
+    if df_r_inv is not None:  # f'(r) != 0, can apply Hensel's Lemma.
+        # Simple roots are unique mod p^i (so j = i), and we can lift to the
+        # unique solution mod p^(i+1).
+        yield (r - f.eval(r, mod=modulus) * df_r_inv) % modulus, i + 1
+        return
+    pending = [(r, j)]
+    while pending:
+        r, j = pending.pop()
+        # f(r + h) = c[0] + c[1]*h + c[2]*h^2 + ..., with c[0] = f(r).
+        taylor = f.taylor_coefficients(r, mod=modulus)
+        step = p**j
+        if all(c * pow(step, n, modulus) % modulus == 0
+               for n, c in enumerate(taylor[1:], start=1)):
+            # f(r + t*p^j) = f(r) (mod p^(i+1)) for all t: either every
+            # member of the class is a root, or none of them is.
+            # Note that this is always the case for j = i when f'(r) = 0
+            # (mod p), like in the simple form of the lemma.
+            if taylor[0] == 0:
+                yield r, j
+        else:
+            # Split into the p classes mod p^(j+1), keeping them in order.
+            pending.extend((r + t * step, j + 1) for t in reversed(range(p)))
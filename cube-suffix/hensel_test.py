@@ -0,0 +1,197 @@
+import itertools
+import random
+import unittest
+from hensel import (RootSet, first_root, hensel_lift, iter_roots, modinv,
+                    newton_lift, newton_moduli)
+from polynomial import Polynomial
+import hensel_validation as validation
+
+
+def cube_minus(suffix):
+    return Polynomial(coefficients=[-suffix, 0, 0, 1])
+
+
+def brute_force_roots(f, p, k):
+    return [x for x in range(p**k) if f.eval(x, mod=p**k) == 0]
+
+
+class ModinvTests(unittest.TestCase):
+    def test_inverse(self):
+        self.assertEqual(modinv(3, 8) * 3 % 8, 1)
+
+    def test_not_coprime(self):
+        with self.assertRaises(ValueError):
+            modinv(2, 8)
+
+
+class HenselLiftTests(unittest.TestCase):
+    def test_odd_suffix_unique_root(self):
+        self.assertEqual(list(hensel_lift(cube_minus(0x15), 2, 8)), [0x8d])
+
+    def test_even_suffix_multiple_roots(self):
+        roots = hensel_lift(cube_minus(0x18), 2, 8)
+        self.assertEqual(list(roots), [0x36, 0xb6, 0x76, 0xf6])
+        self.assertEqual(roots.classes, [(0x36, 6)])
+
+    def test_even_suffix_no_roots(self):
+        roots = hensel_lift(cube_minus(0x12), 2, 8)
+        self.assertFalse(roots)
+        self.assertEqual(list(roots), [])
+
+    def test_matches_brute_force(self):
+        for p, k in [(2, 6), (3, 4), (5, 3), (7, 2)]:
+            for suffix, quadratic in itertools.product(range(60),
+                                                       [False, True]):
+                f = cube_minus(suffix)
+                roots = hensel_lift(f, p, k, validate=validation.FULL,
+                                    quadratic=quadratic)
+                self.assertEqual(sorted(roots), brute_force_roots(f, p, k))
+                self.assertEqual(roots.count(),
+                                 len(brute_force_roots(f, p, k)))
+
+    def test_other_polynomial(self):
+        f = Polynomial(coefficients=[-17, 0, 1])  # x^2 - 17
+        for quadratic in [False, True]:
+            roots = hensel_lift(f, 2, 10, quadratic=quadratic)
+            self.assertEqual(sorted(roots), brute_force_roots(f, 2, 10))
+
+    def test_singular_roots_stay_compressed(self):
+        roots = hensel_lift(cube_minus(0), 2, 2048)
+        # x^3 = 0 (mod 2^2048) <=> x = 0 (mod 2^683)
+        self.assertEqual(roots.classes, [(0, 683)])
+        self.assertEqual(roots.count(), 2**(2048 - 683))
+        self.assertEqual(next(iter(roots)), 0)
+        self.assertIn(2**683 * 5, roots)
+        self.assertNotIn(2**682, roots)
+
+
+class IterativeLiftTests(unittest.TestCase):
+    def test_roots_that_lift(self):
+        f = Polynomial(coefficients=[-2, 0, 1])  # x^2 - 2, 3^2 = 2 (mod 7)
+        self.assertEqual(sorted(hensel_lift(f, 7, 1)), [3, 4])
+        for k in range(2, 6):
+            roots = sorted(hensel_lift(f, 7, k))
+            self.assertEqual(roots, brute_force_roots(f, 7, k))
+            self.assertEqual(sorted(r % 7 for r in roots), [3, 4])
+
+    def test_roots_that_do_not_lift(self):
+        # 0 is a singular root mod 3 (f'(0) = 0), and f(0) != 0 (mod 9).
+        f = Polynomial(coefficients=[3, 0, 1])  # x^2 + 3
+        self.assertEqual(list(hensel_lift(f, 3, 1)), [0])
+        for k in range(2, 5):
+            self.assertEqual(list(hensel_lift(f, 3, k)), [])
+            self.assertEqual(brute_force_roots(f, 3, k), [])
+        # 0 is a root of x^3 - 0x12 mod 2, but there are none mod 2^8.
+        self.assertEqual(list(hensel_lift(cube_minus(0x12), 2, 1)), [0])
+
+    def test_odd_and_even_moduli(self):
+        for p, k in [(2, 7), (3, 5), (5, 3), (11, 2)]:
+            for a in range(-10, 10):
+                f = Polynomial(coefficients=[a, 1, 0, 1])  # x^3 + x + a
+                self.assertEqual(sorted(hensel_lift(f, p, k)),
+                                 brute_force_roots(f, p, k), (p, k, a))
+
+    def test_deep_lifting(self):
+        # Iterative, so k is not bounded by the recursion limit.
+        f = Polynomial(coefficients=[-7, 0, 1])  # x^2 - 7, roots 1, 2 mod 3
+        roots = list(hensel_lift(f, 3, 3000))
+        self.assertEqual(sorted(r % 3 for r in roots), [1, 2])
+        for r in roots:
+            self.assertEqual(f.eval(r, mod=3**3000), 0)
+
+
+class IterRootsTests(unittest.TestCase):
+    def test_same_as_hensel_lift(self):
+        for suffix, quadratic in itertools.product(range(256), [False, True]):
+            f = cube_minus(suffix)
+            self.assertEqual(list(iter_roots(f, 2, 8, quadratic=quadratic)),
+                             list(hensel_lift(f, 2, 8)))
+
+    def test_lazy(self):
+        roots = iter_roots(cube_minus(0), 2, 4096)
+        self.assertEqual(next(roots), 0)
+        self.assertEqual(next(roots), 2**4095)
+
+    def test_first_root(self):
+        self.assertEqual(first_root(cube_minus(0x18), 2, 8), 0x36)
+        self.assertEqual(first_root(cube_minus(0x15), 2, 8, quadratic=True),
+                         0x8d)
+
+    def test_first_root_none(self):
+        self.assertIsNone(first_root(cube_minus(0x12), 2, 8))
+
+    def test_large_k(self):
+        suffix = 3**2000 * 8  # Even, with a simple root after factoring 2^3.
+        f = cube_minus(suffix)
+        root = first_root(f, 2, 4096, validate=validation.FULL)
+        self.assertEqual(f.eval(root, mod=2**4096), 0)
+
+
+class RootSetTests(unittest.TestCase):
+    def test_iteration_order(self):
+        roots = RootSet(p=2, k=4, classes=[(1, 2), (2, 4)])
+        self.assertEqual(list(roots), [1, 9, 5, 13, 2])
+
+    def test_count(self):
+        roots = RootSet(p=3, k=4, classes=[(1, 2), (2, 4)])
+        self.assertEqual(roots.count(), 10)
+        self.assertEqual(roots.count(), len(list(roots)))
+
+    def test_huge_count(self):
+        roots = RootSet(p=2, k=100, classes=[(0, 1)])
+        self.assertEqual(roots.count(), 2**99)
+        self.assertTrue(roots)
+        self.assertEqual(next(iter(roots)), 0)
+
+    def test_contains(self):
+        roots = RootSet(p=2, k=4, classes=[(1, 2)])
+        self.assertIn(13, roots)
+        self.assertNotIn(3, roots)
+        self.assertNotIn(17, roots)
+
+
+class NewtonLiftTests(unittest.TestCase):
+    def test_moduli(self):
+        self.assertEqual(newton_moduli(2, 10), [2**2, 2**3, 2**5, 2**10])
+        self.assertEqual(newton_moduli(3, 1), [])
+
+    def test_lift(self):
+        f = cube_minus(0x15)
+        self.assertEqual(newton_lift(f, 2, 1, newton_moduli(2, 8)), 0x8d)
+
+    def test_matches_iterative_lifting(self):
+        random.seed(1337)
+        for p, k in [(2, 12), (3, 9), (5, 6), (7, 5), (13, 3)]:
+            for _ in range(30):
+                f = Polynomial(coefficients=[random.randrange(-50, 50)
+                                             for _ in range(4)])
+                quadratic = hensel_lift(f, p, k, quadratic=True)
+                iterative = hensel_lift(f, p, k)
+                self.assertEqual(sorted(quadratic), sorted(iterative))
+                self.assertEqual(quadratic.count(), iterative.count())
+
+    def test_simple_roots(self):
+        # Each simple root mod p lifts to the iterative root congruent to it.
+        df = cube_minus(0).derivative()
+        for p, k in [(5, 7), (7, 6), (11, 4)]:
+            for suffix in range(1, 40):
+                f = cube_minus(suffix)
+                iterative = list(hensel_lift(f, p, k))
+                for r in hensel_lift(f, p, 1):
+                    if df.eval(r, mod=p) == 0:
+                        continue  # Singular, not lifted by Newton.
+                    root = newton_lift(f, p, r, newton_moduli(p, k))
+                    self.assertEqual(f.eval(root, mod=p**k), 0)
+                    self.assertEqual([x for x in iterative if x % p == r],
+                                     [root])
+
+    def test_roots_that_do_not_lift(self):
+        # Singular roots mod p are lifted one exponent at a time.
+        f = Polynomial(coefficients=[3, 0, 1])  # x^2 + 3
+        self.assertEqual(list(hensel_lift(f, 3, 4, quadratic=True)), [])
+        self.assertEqual(list(hensel_lift(cube_minus(0x12), 2, 8,
+                                          quadratic=True)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+"""How much to check that the roots lifted by hensel.py are roots.
+
+Checking a root is an extra evaluation of f, as expensive as lifting it. The
+validation policy says how much to check:
+    - "off": no checks;
+    - "sampled" (default): the 1st, 2nd, 4th, 8th, ... fully lifted roots, so
+      O(lg n) checks for n roots;
+    - "full": every root, at every step of the lifting.
+The policy is set for all calls with set_policy, or per call with the
+'validate' argument of the liftings (which takes precedence). It is the same
+policy as for ../merge's sortedness checks: both re-export
+../shared/validation_policy.py, which _import_policy imports once by path.
+
+Example:
+    hensel_validation.set_policy(hensel_validation.FULL)  # e.g. debugging
+    hensel.hensel_lift(f, 2, 4096, validate=hensel_validation.OFF)
+"""
+
+import importlib.util
+import os
+import sys
+
+
+def _import_policy():
+    """Imports ../shared/validation_policy.py, once for both trees.
+
+    It is imported by path as the "validation_policy" module, so that the
+    merge/ and cube-suffix/ checks share the same one in a process, without
+    adding ../shared to sys.path.
+    """
+    module = sys.modules.get("validation_policy")
+    if module is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            os.pardir, "shared", "validation_policy.py")
+        spec = importlib.util.spec_from_file_location("validation_policy",
+                                                      path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["validation_policy"] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+_policy = _import_policy()
+OFF, SAMPLED, FULL = _policy.OFF, _policy.SAMPLED, _policy.FULL
+POLICIES = _policy.POLICIES
+set_policy, get_policy = _policy.set_policy, _policy.get_policy
+
+
+def should_check(index, validate=None):
+    """Whether the result number 'index' (from 0) is checked by the policy.
+
+    With "sampled", those are the indices 2^i - 1 (0, 1, 3, 7, ...).
+    """
+    policy = get_policy(validate)
+    return policy == FULL or (policy == SAMPLED and index & (index + 1) == 0)
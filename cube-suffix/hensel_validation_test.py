@@ -0,0 +1,76 @@
+import sys
+import unittest
+from unittest import mock
+import hensel
+import hensel_validation as validation
+from polynomial import Polynomial
+
+
+class PolicyTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(validation.set_policy, validation.get_policy())
+
+    def test_default_is_sampled(self):
+        self.assertEqual(validation.get_policy(), validation.SAMPLED)
+
+    def test_set_policy(self):
+        self.assertEqual(validation.set_policy(validation.FULL),
+                         validation.SAMPLED)
+        self.assertEqual(validation.get_policy(), validation.FULL)
+        self.assertEqual(validation.get_policy(validation.OFF),
+                         validation.OFF)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(AssertionError):
+            validation.set_policy("sometimes")
+
+    def test_policy_is_shared(self):
+        shared = sys.modules["validation_policy"]
+        self.assertIs(validation._policy, shared)
+        validation.set_policy(validation.FULL)
+        self.assertEqual(shared.get_policy(), validation.FULL)
+        shared.set_policy(validation.OFF)
+        self.assertEqual(validation.get_policy(), validation.OFF)
+
+    def test_should_check(self):
+        self.assertEqual(
+            [i for i in range(20) if validation.should_check(i)],
+            [0, 1, 3, 7, 15])
+        self.assertTrue(all(validation.should_check(i, validation.FULL)
+                            for i in range(20)))
+        self.assertFalse(any(validation.should_check(i, validation.OFF)
+                             for i in range(20)))
+
+
+class HenselValidationTests(unittest.TestCase):
+    def count_evals(self, validate, quadratic):
+        # x^2 - 1 has 4 classes of roots mod 2^k (k >= 3): 1, 2^(k-1) - 1,
+        # 2^(k-1) + 1 and -1, and x^2 - 17 has 4 simple roots mod 2^k.
+        evals = 0
+        for f in [Polynomial(coefficients=[-1, 0, 1]),
+                  Polynomial(coefficients=[-17, 0, 1])]:
+            with mock.patch.object(Polynomial, "eval", autospec=True,
+                                   side_effect=Polynomial.eval) as spy:
+                roots = hensel.hensel_lift(f, 2, 64, validate=validate,
+                                           quadratic=quadratic)
+            self.assertEqual(roots.count(), 4)
+            evals += spy.call_count
+        return evals
+
+    def test_fewer_evaluations(self):
+        for quadratic in [False, True]:
+            off = self.count_evals(validation.OFF, quadratic)
+            sampled = self.count_evals(validation.SAMPLED, quadratic)
+            full = self.count_evals(validation.FULL, quadratic)
+            self.assertLess(off, sampled)
+            self.assertLess(sampled, full)
+
+    def test_detects_wrong_root(self):
+        f = Polynomial(coefficients=[-17, 0, 1])
+        with self.assertRaises(AssertionError):
+            hensel._check_root(f, 3, 2**8)
+        hensel._check_root(f, hensel.first_root(f, 2, 8), 2**8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,12 +7,57 @@ class Polynomial:
         assert len(coefficients) > 0
         self.coefficients = coefficients
 
-    def eval(self, x):
-        """Evaluates f(x)."""
-        xs = [x**i for i in range(len(self.coefficients))]
-        terms = [coefficient * x
-                 for coefficient, x in zip(self.coefficients, xs)]
-        return sum(terms)
+    def eval(self, x, mod=None):
+        """Evaluates f(x), reduced mod 'mod' if given.
+
+        Uses Horner's method: f(x) = (...(c[n]*x + c[n-1])*x + ...)*x + c[0],
+        which takes n multiplications and no powers of x. With 'mod', every
+        intermediate result is reduced, so they stay smaller than mod*x.
+        """
+        result = 0
+        if mod is None:
+            for coefficient in reversed(self.coefficients):
+                result = result * x + coefficient
+            return result
+        x %= mod
+        for coefficient in reversed(self.coefficients):
+            result = (result * x + coefficient) % mod
+        return result
+
+    def eval_many(self, xs, mod=None):
+        """Returns [f(x) for x in xs], reduced mod 'mod' if given.
+
+        All points go through Horner's method together, in one pass over the
+        coefficients.
+        """
+        if mod is not None:
+            xs = [x % mod for x in xs]
+        results = [0] * len(xs)
+        for coefficient in reversed(self.coefficients):
+            if mod is None:
+                results = [result * x + coefficient
+                           for result, x in zip(results, xs)]
+            else:
+                results = [(result * x + coefficient) % mod
+                           for result, x in zip(results, xs)]
+        return results
+
+    def taylor_coefficients(self, a, mod=None):
+        """Returns [c[0], ..., c[n]] such that f(a + h) = sum(c[i] * h^i).
+
+        c[i] = f^(i)(a) / i!, computed by repeated synthetic division (Taylor
+        shift), reduced mod 'mod' if given.
+        """
+        coefficients = list(self.coefficients)
+        n = len(coefficients) - 1
+        for i in range(n):
+            for j in range(n - 1, i - 1, -1):
+                coefficients[j] += a * coefficients[j + 1]
+                if mod is not None:
+                    coefficients[j] %= mod
+        if mod is not None:
+            coefficients = [coefficient % mod for coefficient in coefficients]
+        return coefficients
 
     def derivative(self):
         """Returns f'(x)."""
@@ -0,0 +1,64 @@
+import random
+import unittest
+from polynomial import Polynomial
+
+
+class EvalTests(unittest.TestCase):
+    def test_constant(self):
+        self.assertEqual(Polynomial(coefficients=[7]).eval(3), 7)
+
+    def test_cubic(self):
+        f = Polynomial(coefficients=[-5, 0, 2, 1])  # x^3 + 2x^2 - 5
+        self.assertEqual(f.eval(3), 27 + 18 - 5)
+        self.assertEqual(f.eval(-2), -8 + 8 - 5)
+
+    def test_mod(self):
+        f = Polynomial(coefficients=[-5, 0, 2, 1])
+        self.assertEqual(f.eval(3, mod=7), (27 + 18 - 5) % 7)
+        self.assertEqual(f.eval(-2, mod=7), (-8 + 8 - 5) % 7)
+
+    def test_mod_large(self):
+        random.seed(42)
+        f = Polynomial(coefficients=[random.getrandbits(512)
+                                     for _ in range(10)])
+        x = random.getrandbits(512)
+        self.assertEqual(f.eval(x, mod=2**256), f.eval(x) % 2**256)
+
+
+class EvalManyTests(unittest.TestCase):
+    def test_matches_eval(self):
+        f = Polynomial(coefficients=[-5, 0, 2, 1])
+        xs = list(range(-10, 10))
+        self.assertEqual(f.eval_many(xs), [f.eval(x) for x in xs])
+        self.assertEqual(f.eval_many(xs, mod=8),
+                         [f.eval(x, mod=8) for x in xs])
+
+    def test_empty(self):
+        self.assertEqual(Polynomial(coefficients=[1, 1]).eval_many([]), [])
+
+
+class TaylorCoefficientsTests(unittest.TestCase):
+    def test_cubic(self):
+        f = Polynomial(coefficients=[-5, 0, 2, 1])
+        # f(2 + h) = 11 + 20h + 8h^2 + h^3
+        self.assertEqual(f.taylor_coefficients(2), [11, 20, 8, 1])
+
+    def test_mod(self):
+        f = Polynomial(coefficients=[-5, 0, 2, 1])
+        self.assertEqual(f.taylor_coefficients(2, mod=8), [3, 4, 0, 1])
+
+    def test_matches_eval(self):
+        f = Polynomial(coefficients=[3, -1, 4, 1, -5])
+        taylor = Polynomial(coefficients=f.taylor_coefficients(7))
+        for h in range(-5, 5):
+            self.assertEqual(taylor.eval(h), f.eval(7 + h))
+
+
+class DerivativeTests(unittest.TestCase):
+    def test_cubic(self):
+        f = Polynomial(coefficients=[-5, 0, 2, 1])
+        self.assertEqual(f.derivative().coefficients, [0, 4, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
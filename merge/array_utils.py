@@ -1,4 +1,36 @@
-""" Helper generic array functions. """
+""" Helper generic array functions.
+
+Functions that move many elements dispatch to vectorized.py for arrays that
+support slice assignment (lists, bytearrays, array.array, NumPy arrays and
+memoryviews), and otherwise move one element at a time.
+"""
+
+import math
+
+import vectorized
+
+
+# Most elements of a list copied at once when moving stretches of elements
+# (see vectorized.CHUNK_LENGTH for numeric arrays): copies of lists update
+# reference counts and are slower per element anyway, so shorter chunks cost
+# little and keep the copies small (a few KB, see
+# merge_test.KeyAndStableMergeTests.test_stable_memory).
+LIST_CHUNK_LENGTH = 256
+
+
+def supports_slices(A):
+    """Whether elements of A can be moved with slice assignment.
+
+    Includes lists and bytearrays, on top of vectorized.is_vectorizable(A).
+    """
+    return isinstance(A, (list, bytearray)) or vectorized.is_vectorizable(A)
+
+
+def chunk_length(A):
+    """Most elements of A copied at once, see LIST_CHUNK_LENGTH."""
+    if isinstance(A, list):
+        return LIST_CHUNK_LENGTH
+    return vectorized.CHUNK_LENGTH
 
 
 def find_first_unsorted_index(A, start, length):
@@ -15,6 +47,8 @@ def find_first_unsorted_index(A, start, length):
         - O(length) time
         - O(1) space
     """
+    if vectorized.is_numpy_array(A):
+        return vectorized.find_first_unsorted_index(A, start, length)
     unsorted_elements = (i for i in range(start+1, start+length)
                          if A[i-1] > A[i])
     default = None
@@ -35,6 +69,9 @@ def swap_k_elements(A, start, k, target):
         - O(k) time
         - O(1) space
     """
+    if supports_slices(A):
+        vectorized.swap_k_elements(A, start, k, target, chunk_length(A))
+        return
     for i in range(k):
         A[start+i], A[target+i] = A[target+i], A[start+i]
 
@@ -65,6 +102,67 @@ def selection_sort(length, compare_fn, swap_fn):
             swap_fn(i, min_index)
 
 
+def heap_sort(length, compare_fn, swap_fn):
+    """Generalized sort, using heapsort.
+    Same interface as selection_sort: elements are compared by calling
+    compare_fn with the indices of 2 elements, and swapped by calling swap_fn
+    with the indices of 2 elements.
+    Does O(length lg length) swaps, use selection_sort if swaps are expensive.
+
+    Example:
+        A = [3, 2, 1, 0]
+        compare_fn = lambda i, j: A[i] < A[j]
+        def swap_fn(i, j): A[i], A[j] = A[j], A[i]
+        heap_sort(len(A), compare_fn, swap_fn)
+        assert A == [0, 1, 2, 3]
+
+    Complexity:
+        - O(length lg length) time  (O(length lg length) swaps)
+        - O(1) space
+    """
+    sifts = max(1, length)
+    for _ in heap_sort_steps(length, compare_fn, swap_fn, sifts=sifts):
+        pass
+
+
+def heap_sort_steps(length, compare_fn, swap_fn, sifts=1):
+    """Same as heap_sort, as a generator of steps of O(sifts lg length) swaps.
+
+    Yields after every 'sifts' sift-downs of the heap (which is kept in the
+    sorted elements themselves, so the sort can be paused between two steps)
+    the most swaps they could have done.
+    """
+    def sift_down(root, end):
+        # Max-heap: move 'root' down until it is bigger than its children.
+        while 2 * root + 1 < end:
+            child = 2 * root + 1
+            if child + 1 < end and compare_fn(child, child + 1):
+                child += 1
+            if not compare_fn(root, child):
+                return
+            swap_fn(root, child)
+            root = child
+
+    assert sifts >= 1
+    depth = length.bit_length()
+    done = 0
+    for root in reversed(range(length // 2)):
+        sift_down(root, length)
+        done += 1
+        if done == sifts:
+            yield done * depth
+            done = 0
+    for end in reversed(range(1, length)):
+        swap_fn(0, end)  # Move the biggest element to its place.
+        sift_down(0, end)
+        done += 1
+        if done == sifts:
+            yield done * (depth + 1)
+            done = 0
+    if done:
+        yield done * (depth + 1)
+
+
 def rotate_k_left(A, start, length, k):
     """Rotates the region [start, start+length) by k elements to the left
     within A.
@@ -78,8 +176,16 @@ def rotate_k_left(A, start, length, k):
         - O(length) time
         - O(1) space
 
+    The rotation is done by whichever of these moves the fewest elements
+    through Python code:
+        - arrays that support slices: block swaps (Gries-Mills), moving
+          stretches of elements with slices, see _rotate_by_block_swaps;
+        - other arrays (e.g. instrumentation.CountingArray): cycles (juggling),
+          that move each element once, see _rotate_by_cycles.
+
     Note:
-        To do this in O(n) time O(1) mem, we apply 3 invertions:
+        The classic way to do this in O(n) time O(1) mem is to apply 3
+        invertions (see _rotate_by_reversals):
             # assuming we're rotating a full array of length n for simplicity
             invert(0, k)
             invert(k, n)
@@ -100,9 +206,12 @@ def rotate_k_left(A, start, length, k):
     if length == 0:
         return  # prevent % 0
     k %= length  # rotate(m*length + i) == rotate(i)
-    invert(A, start, k)  # O(k) = O(length)
-    invert(A, start+k, length-k)  # O(length-k) = O(length)
-    invert(A, start, length)  # O(length)
+    if k == 0:
+        return
+    if supports_slices(A):
+        _rotate_by_block_swaps(A, start, length, k)
+    else:
+        _rotate_by_cycles(A, start, length, k)
 
 
 def rotate_k_right(A, start, length, k):
@@ -110,6 +219,169 @@ def rotate_k_right(A, start, length, k):
     return rotate_k_left(A, start, length, -k)
 
 
+def rotate_k_left_steps(A, start, length, k, unit):
+    """Same as rotate_k_left, as a generator of steps of O(unit) moves.
+
+    Yields the number of elements moved by each step. Nothing is held outside
+    of A between two steps, so [start, start+length) is always a permutation
+    of its elements, and a long rotation can be paused (see stepwise.py):
+        - while both sides are longer than 'unit', the blocks of the
+          Gries-Mills rotation (see _rotate_by_block_swaps) are swapped 'unit'
+          elements at a time;
+        - then the short side (at most 'unit' elements) crosses the long one
+          with rotations of at most 'unit' elements of the long side each.
+
+    Complexity:
+        - O(length) time (at most 2 * length moves to cross the long side,
+          in O(length / unit) steps)
+        - O(1) space (O(unit) for arrays that support slices)
+    """
+    assert unit > 0
+    if length == 0:
+        return
+    k %= length
+    a, b = k, length - k
+    while a > unit and b > unit:
+        if a <= b:  # Swap |--a--|--a'--| (see _rotate_by_block_swaps).
+            for i in range(0, a, unit):
+                count = min(unit, a - i)
+                swap_k_elements(A, start=start+i, k=count, target=start+a+i)
+                yield 2 * count
+            start += a
+            b -= a
+        else:  # Swap |--b--|--b'--|.
+            for i in range(0, b, unit):
+                count = min(unit, b - i)
+                swap_k_elements(A, start=start+a-b+i, k=count,
+                                target=start+a+i)
+                yield 2 * count
+            a -= b
+    if a == 0 or b == 0:
+        return
+    if a <= b:  # |--a--:-count-|-------| -> |-count-:--a--|-------|
+        for i in range(0, b, unit):
+            count = min(unit, b - i)
+            rotate_k_left(A, start=start+i, length=a + count, k=a)
+            yield a + count
+    else:  # |-------|-count-:--b--| -> |-------|--b--:-count-|
+        end = start + a + b
+        for i in range(0, a, unit):
+            count = min(unit, a - i)
+            rotate_k_left(A, start=end-b-i-count, length=count + b, k=count)
+            yield count + b
+
+
+def rotate_k_right_steps(A, start, length, k, unit):
+    """Same as rotate_k_right, see rotate_k_left_steps."""
+    return rotate_k_left_steps(A, start, length, -k, unit)
+
+
+def _rotate_by_reversals(A, start, length, k):
+    """rotate_k_left with 3 invertions (2 * length moves), see rotate_k_left.
+    """
+    invert(A, start, k)  # O(k) = O(length)
+    invert(A, start+k, length-k)  # O(length-k) = O(length)
+    invert(A, start, length)  # O(length)
+
+
+def _rotate_by_cycles(A, start, length, k):
+    """rotate_k_left by following the cycles of the rotation (juggling).
+
+    The element at i goes to i-k (mod length): starting from an element, each
+    element of its cycle is moved once into the hole left by the previous one.
+    There are gcd(length, k) such cycles, for a total of 'length' moves (a swap
+    is 2 moves: 3 invertions do 2 * length moves).
+
+    Complexity:
+        - O(length) time
+        - O(1) space
+    """
+    end = start + length
+    for leader in range(start, start + math.gcd(length, k)):
+        value = A[leader]
+        i = leader
+        while True:
+            j = i + k
+            if j >= end:
+                j -= length
+            if j == leader:
+                break
+            A[i] = A[j]
+            i = j
+        A[i] = value
+
+
+def _rotate_by_block_swaps(A, start, length, k):
+    """rotate_k_left by swapping blocks of equal lengths (Gries-Mills).
+
+    With a = k and b = length - k, rotating |--a--|----b----| places the
+    shortest side at its final position with a single swap of equal blocks:
+        if a <= b: |--a--|--a'--|--b'--| -> |--a'--|--a--|--b'--|
+                    then rotate |--a--|--b'--| (length - a, k = a)
+        if a > b:  |--a'--|--b--|--b'--| -> |--a'--|--b'--|--b--|
+                    then rotate |--a'--|--b'--| (length - b, k = a - b)
+    Once the shortest side fits in chunk_length(A), the rest is rotated by
+    copying that side and shifting the other one (_rotate_short_side).
+
+    Complexity:
+        - O(length) time (O(length / chunk + length / min(a, b)) slice
+          assignments)
+        - O(chunk) space, with chunk = chunk_length(A)
+    """
+    chunk = chunk_length(A)
+    a, b = k, length - k
+    while a > 0 and b > 0:
+        if min(a, b) <= chunk:
+            _rotate_short_side(A, start, a + b, a)
+            return
+        if a <= b:
+            swap_k_elements(A, start=start, k=a, target=start+a)
+            start += a
+            b -= a
+        else:
+            swap_k_elements(A, start=start+a-b, k=b, target=start+a)
+            a -= b
+
+
+def _rotate_short_side(A, start, length, k):
+    """Rotates [start, start+length) by k to the left, copying its short side.
+
+    The shortest of [start, start+k) and [start+k, start+length) is copied,
+    the other side is shifted over it a chunk at a time, and the copy is
+    written back on the other end. A must support slices.
+
+    Complexity:
+        - O(length) time
+        - O(min(k, length - k)) space (_rotate_by_block_swaps only calls
+          this with at most chunk_length(A) elements on a side)
+    """
+    end = start + length
+    if k <= length - k:
+        head = vectorized.copy_slice(A, start, start + k)
+        _shift(A, start + k, end, target=start)
+        A[end-k:end] = head
+    else:
+        tail = vectorized.copy_slice(A, start + k, end)
+        _shift(A, start, start + k, target=end - k)
+        A[start:start+length-k] = tail
+
+
+def _shift(A, start, end, target):
+    """Moves A[start:end) to 'target', a copied chunk at a time.
+
+    Chunks are moved from the side of 'target', so that overlapping regions
+    are read before being overwritten.
+    """
+    length, chunk = end - start, chunk_length(A)
+    chunks = range(0, length, chunk)
+    if target > start:
+        chunks = reversed(chunks)
+    for i in chunks:
+        count = min(chunk, length - i)
+        A[target+i:target+i+count] = vectorized.copy_slice(A, start + i,
+                                                           start + i + count)
+
+
 def invert(A, start, length):
     """Inverts the region [start, start+length) within A.
 
@@ -122,6 +394,9 @@ def invert(A, start, length):
         - O(length) time
         - O(1) space
     """
+    if supports_slices(A):
+        vectorized.invert(A, start, length, chunk_length(A))
+        return
     last = start+length-1
     for i in range(length//2):
         A[start+i], A[last-i] = A[last-i], A[start+i]
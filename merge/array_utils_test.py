@@ -1,7 +1,13 @@
+import array
 import unittest
+from unittest import mock
+import instrumentation
 from array_utils import (find_first_unsorted_index, swap_k_elements,
                          rotate_k_left, rotate_k_right, invert, selection_sort,
-                         is_sorted)
+                         rotate_k_left_steps, rotate_k_right_steps,
+                         heap_sort, heap_sort_steps, is_sorted,
+                         _rotate_by_reversals, _rotate_by_cycles,
+                         _rotate_by_block_swaps)
 
 
 class FindFirstUnsortedIndexTests(unittest.TestCase):
@@ -98,6 +104,74 @@ class RotateKRightTests(unittest.TestCase):
         self.assertEqual(A, [0, 1, 4, 2, 3, 5, 6])
 
 
+class RotationMethodsTests(unittest.TestCase):
+    def setUp(self):
+        # Small chunks, so that block swaps are used on small arrays.
+        for name in ["vectorized.CHUNK_LENGTH",
+                     "array_utils.LIST_CHUNK_LENGTH"]:
+            patcher = mock.patch(name, 3)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def check_rotations(self, make_array):
+        for method in [rotate_k_left, _rotate_by_reversals, _rotate_by_cycles,
+                       _rotate_by_block_swaps]:
+            for length in range(1, 30):
+                for k in range(1, length):
+                    A = make_array(range(length + 4))
+                    method(A, 2, length, k)
+                    expected = list(range(length + 4))
+                    expected[2:2+length] = (expected[2+k:2+length] +
+                                            expected[2:2+k])
+                    self.assertEqual(list(A), expected, (method, length, k))
+
+    def test_list(self):
+        self.check_rotations(list)
+
+    def test_array(self):
+        self.check_rotations(lambda values: array.array("i", values))
+
+    def test_bytearray(self):
+        self.check_rotations(bytearray)
+
+    def test_memoryview(self):
+        self.check_rotations(
+            lambda values: memoryview(array.array("q", values)))
+
+    def test_cycles_move_each_element_once(self):
+        stats = instrumentation.MergeStats()
+        A = instrumentation.CountingArray(list(range(12)), stats)
+        rotate_k_left(A, 0, 12, k=8)
+        self.assertEqual(A.array, [8, 9, 10, 11, 0, 1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(stats.moves["other"], 12)
+
+
+class RotationStepsTests(unittest.TestCase):
+    def test_rotations(self):
+        for length in range(0, 40):
+            for k in range(-1, length + 1):
+                for unit in [1, 2, 5, 100]:
+                    for rotate, rotate_steps in [
+                            (rotate_k_left, rotate_k_left_steps),
+                            (rotate_k_right, rotate_k_right_steps)]:
+                        A = list(range(length + 4))
+                        expected = list(A)
+                        rotate(expected, 2, length, k)
+                        moves = sum(rotate_steps(A, 2, length, k, unit))
+                        self.assertEqual(A, expected, (length, k, unit))
+                        self.assertLessEqual(moves, 2 * length)
+
+    def test_bounded_steps(self):
+        # Both with block swaps (k = 400) and a short side (k = 7).
+        for k in [400, 7]:
+            A = list(range(1000))
+            for moves in rotate_k_left_steps(A, 0, 1000, k, unit=20):
+                self.assertLessEqual(moves, 40)
+                # Always a permutation between two steps.
+                self.assertEqual(sorted(A), list(range(1000)))
+            self.assertEqual(A, list(range(k, 1000)) + list(range(k)))
+
+
 class InvertTests(unittest.TestCase):
     def test_invert_full_array(self):
         A = [0, 1, 2, 3, 4, 5]
@@ -127,6 +201,41 @@ class SelectionSortTests(unittest.TestCase):
         self.assertEqual(A, [5, 1, 2, 3, 4, 0])
 
 
+class HeapSortTests(unittest.TestCase):
+    def test_sort_all(self):
+        A = [5, 4, 3, 2, 1, 0]
+        def compare_fn(i, j): return A[i] < A[j]
+        def swap(i, j): A[i], A[j] = A[j], A[i]
+        heap_sort(len(A), compare_fn, swap)
+        self.assertEqual(A, [0, 1, 2, 3, 4, 5])
+
+    def test_sort_middle(self):
+        start = 1
+        A = [5, 4, 3, 2, 1, 0]
+        def swap_fn(i, j): A[start+i], A[start+j] = A[start+j], A[start+i]
+        def compare_fn(i, j): return A[start+i] < A[start+j]
+        heap_sort(length=4, compare_fn=compare_fn, swap_fn=swap_fn)
+        self.assertEqual(A, [5, 1, 2, 3, 4, 0])
+
+    def test_sort_many_sizes(self):
+        for length in range(20):
+            A = [(i * 7) % 5 for i in range(length)]
+            def compare_fn(i, j): return A[i] < A[j]
+            def swap(i, j): A[i], A[j] = A[j], A[i]
+            heap_sort(len(A), compare_fn, swap)
+            self.assertEqual(A, sorted(A))
+
+    def test_steps(self):
+        A = [(i * 7) % 100 for i in range(100)]
+        def compare_fn(i, j): return A[i] < A[j]
+        def swap(i, j): A[i], A[j] = A[j], A[i]
+        steps = list(heap_sort_steps(len(A), compare_fn, swap, sifts=10))
+        self.assertEqual(A, sorted(A))
+        # 50 sift-downs to build the heap, 99 to empty it.
+        self.assertEqual(len(steps), 15)
+        self.assertLessEqual(max(steps), 10 * 8)
+
+
 class IsSortedTests(unittest.TestCase):
     def test_sorted(self):
         A = [0, 1, 2, 3, 4, 5]
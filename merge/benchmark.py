@@ -0,0 +1,411 @@
+"""Benchmarks for the in-place merges.
+
+Times merge_inplace, merge_inplace_kronrad and merge_sort_inplace on
+differently shaped inputs, counting comparisons and moves (assignments to the
+array, so a swap counts twice) with instrumentation.py, compared to sorted()
+and heapq.merge. The JSON output has the counts per phase of each merge.
+'parallel' times parallel.py's merge sort for each of --processes,
+'external' reports the throughput (MB/s) of external.py's file merges,
+'rotate' times each rotation method of array_utils.py per type of array, and
+'keys' times the merges on inputs with few distinct elements.
+
+Usage:
+    python benchmark.py [cutoffs|merge|sort|parallel|external|rotate|keys ...]
+                        [--sizes 100 1000 ...]
+                        [--shapes random sorted ...] [--json results.json]
+
+Sizes go up to 10^5 by default (pure Python merges of 10^7 elements take a
+while), use e.g. --max-size 10000000 for larger runs.
+"""
+
+import argparse
+import array
+import functools
+import heapq
+import json
+import math
+import os
+import random
+import tempfile
+import time
+
+import array_utils
+import external
+import instrumentation
+import keyed
+import merge
+import parallel
+
+
+SHAPES = ["random", "sorted", "reversed", "unbalanced", "duplicates",
+          "clustered"]
+DUPLICATES_KEYS = 16  # Distinct values in the "duplicates" shape.
+# Length of the stretches of consecutive values in the "clustered" shape (e.g.
+# time series, where one run mostly precedes the other).
+CLUSTER_LENGTH = 100
+# Distinct values in the inputs of the "keys" benchmark.
+KEYS_COUNTS = [2, 16, 256]
+
+
+def _random_runs(n, m):
+    """Returns an array made of a sorted run of n elements then m elements."""
+    values = random.sample(range(10 * (n + m)), n + m)
+    return sorted(values[:n]) + sorted(values[n:])
+
+
+def _merge_input(shape, N):
+    """Returns (A, n): A is made of 2 sorted runs, [0, n) and [n, N)."""
+    n = N // 2
+    if shape == "random":
+        return _random_runs(n, N - n), n
+    if shape == "sorted":
+        return list(range(N)), n
+    if shape == "reversed":  # All of ys goes before xs.
+        return list(range(N - n, N)) + list(range(N - n)), n
+    if shape == "unbalanced":
+        n = max(1, N // 1000)
+        return _random_runs(n, N - n), n
+    if shape == "duplicates":
+        values = [random.randrange(DUPLICATES_KEYS) for _ in range(N)]
+        return sorted(values[:n]) + sorted(values[n:]), n
+    if shape == "clustered":  # Stretches of values go to xs or ys.
+        xs, ys = [], []
+        for i in range(0, N, CLUSTER_LENGTH):
+            cluster = range(i, min(i + CLUSTER_LENGTH, N))
+            random.choice([xs, ys]).extend(cluster)
+        return xs + ys, len(xs)
+    raise ValueError("Unknown shape: %s" % shape)
+
+
+def _sort_input(shape, N):
+    """Returns (A, None), with A an array to sort."""
+    return _unsorted_array(shape, N), None
+
+
+def _unsorted_array(shape, N):
+    if shape == "random":
+        return random.sample(range(10 * N), N)
+    if shape == "sorted":
+        return list(range(N))
+    if shape == "reversed":
+        return list(reversed(range(N)))
+    if shape == "unbalanced":  # Sorted, with a few random elements at the end.
+        n = max(1, N // 1000)
+        return list(range(N - n)) + random.sample(range(N), n)
+    if shape == "duplicates":
+        return [random.randrange(DUPLICATES_KEYS) for _ in range(N)]
+    if shape == "clustered":  # Stretches of values, shuffled.
+        stretches = [list(range(i, min(i + CLUSTER_LENGTH, N)))
+                     for i in range(0, N, CLUSTER_LENGTH)]
+        random.shuffle(stretches)
+        return [value for stretch in stretches for value in stretch]
+    raise ValueError("Unknown shape: %s" % shape)
+
+
+# Each algorithm takes (A, n, stats), with n the start of ys (ignored when
+# sorting), and either sorts A in-place or returns a sorted copy. The in-place
+# merges count their operations per phase in 'stats', the baselines are given
+# an instrumentation.CountingArray when counting.
+MERGES = {
+    "merge_inplace": lambda A, n, stats: merge.merge_inplace(
+        A, 0, len(A), stats=stats),
+    "merge_inplace_block": lambda A, n, stats: merge.merge_inplace(
+        A, 0, len(A), adaptive=False, stats=stats),
+    "merge_inplace_kronrad": lambda A, n, stats: merge.merge_inplace_kronrad(
+        A, 0, len(A), stats=stats),
+    "sorted": lambda A, n, stats: sorted(
+        instrumentation.count_operations(A, stats)),
+    "heapq.merge": lambda A, n, stats: list(heapq.merge(
+        instrumentation.count_operations(A, stats)[:n],
+        instrumentation.count_operations(A, stats)[n:])),
+}
+SORTS = {
+    "merge_sort_inplace": lambda A, n, stats: merge.merge_sort_inplace(
+        A, stats=stats),
+    "merge_sort_buffered_inplace":
+        lambda A, n, stats: merge.merge_sort_buffered_inplace(A, stats=stats),
+    "merge_sort_natural_inplace":
+        lambda A, n, stats: merge.merge_sort_natural_inplace(A, stats=stats),
+    "sorted": lambda A, n, stats: sorted(
+        instrumentation.count_operations(A, stats)),
+}
+
+
+def _run(algorithm, A, n, counts):
+    """Runs 'algorithm' on a copy of A, returns its result as a dict."""
+    result = {}
+    values = list(A)
+    start = time.perf_counter()
+    output = algorithm(values, n, None)
+    result["seconds"] = time.perf_counter() - start
+    output = values if output is None else output
+    assert output == sorted(A)
+
+    if counts:
+        stats = instrumentation.MergeStats()
+        algorithm(list(A), n, stats)
+        result["phases"] = stats.as_dict()
+        result.update(result["phases"]["total"])
+    return result
+
+
+def benchmark(algorithms, make_input, sizes, shapes, repeat=1, counts=True):
+    """Runs each algorithm on each shape and size of input.
+
+    Returns a list of dicts, one per (algorithm, shape, size), with the best
+    time over 'repeat' runs, and the comparisons and moves (per phase, see
+    instrumentation.py) of the last run.
+    """
+    results = []
+    print("%-28s %-10s %9s %11s %13s %13s" % (
+        "algorithm", "shape", "N", "seconds", "comparisons", "moves"))
+    for shape in shapes:
+        for N in sizes:
+            inputs = [make_input(shape, N) for _ in range(repeat)]
+            for name, algorithm in algorithms.items():
+                runs = [_run(algorithm, A, n, counts) for A, n in inputs]
+                result = {"algorithm": name, "shape": shape, "size": N,
+                          "seconds": min(run["seconds"] for run in runs)}
+                if counts:
+                    for key in ["comparisons", "moves", "phases"]:
+                        result[key] = runs[-1][key]
+                results.append(result)
+                print("%-28s %-10s %9d %10.4fs %13s %13s" % (
+                    name, shape, N, result["seconds"],
+                    result.get("comparisons", "-"), result.get("moves", "-")))
+    return results
+
+
+def benchmark_merges(sizes, shapes, repeat=1, counts=True):
+    """Compares the in-place merges with sorted() and heapq.merge."""
+    return benchmark(MERGES, _merge_input, sizes, shapes, repeat, counts)
+
+
+def benchmark_sorts(sizes, shapes, repeat=1, counts=True):
+    """Compares merge_sort_inplace with sorted()."""
+    return benchmark(SORTS, _sort_input, sizes, shapes, repeat, counts)
+
+
+def benchmark_parallel(sizes, processes_counts):
+    """Times parallel.parallel_merge_sort_inplace on random floats."""
+    print("%10s %10s %11s %9s" % ("N", "processes", "seconds", "speedup"))
+    results = []
+    for N in sizes:
+        values = array.array("d", (random.random() for _ in range(N)))
+        base = None
+        for processes in processes_counts:
+            A = array.array("d", values)
+            start = time.perf_counter()
+            parallel.parallel_merge_sort_inplace(A, processes=processes)
+            seconds = time.perf_counter() - start
+            assert A.tolist() == sorted(values)
+            base = base or seconds
+            results.append({"size": N, "processes": processes,
+                            "seconds": seconds})
+            print("%10d %10d %10.4fs %8.2fx" % (
+                N, processes, seconds, base / seconds))
+    return results
+
+
+def benchmark_external(sizes, files=2):
+    """Throughput of external.merge_sorted_files on files of random doubles."""
+    print("%10s %6s %10s %11s %10s" % ("N", "files", "MB", "seconds", "MB/s"))
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for N in sizes:
+            paths = []
+            for i in range(files):
+                path = os.path.join(directory, "run%d.bin" % i)
+                run = sorted(random.random() for _ in range(N // files))
+                with open(path, "wb") as f:
+                    array.array("d", run).tofile(f)
+                paths.append(path)
+            output = os.path.join(directory, "merged.bin")
+            start = time.perf_counter()
+            external.merge_sorted_files(paths, output, typecode="d")
+            seconds = time.perf_counter() - start
+            megabytes = os.path.getsize(output) / 1e6
+            results.append({"size": N, "files": files, "seconds": seconds,
+                            "mb_per_second": megabytes / seconds})
+            print("%10d %6d %10.1f %10.4fs %10.2f" % (
+                N, files, megabytes, seconds, megabytes / seconds))
+    return results
+
+
+# Types of arrays for the rotation benchmark, built from a range of ints.
+CONTAINERS = {
+    "list": list,
+    "array.array": functools.partial(array.array, "q"),
+    "bytearray": lambda values: bytearray(i % 256 for i in values),
+    "memoryview": lambda values: memoryview(array.array("q", values)),
+    # No slices: elements are moved one at a time.
+    "keyed": lambda values: keyed.KeyedArray(list(values), key=abs),
+}
+ROTATIONS = {
+    "rotate_k_left": array_utils.rotate_k_left,
+    "reversals": array_utils._rotate_by_reversals,
+    "cycles": array_utils._rotate_by_cycles,
+    "block_swaps": array_utils._rotate_by_block_swaps,
+}
+
+
+def benchmark_rotations(sizes, repeat=1):
+    """Times each rotation method of array_utils on each type of array.
+
+    Block swaps are only timed on arrays that support slices. Rotates the
+    whole array by k = 1, sqrt(N) and N/3 (short, medium and balanced sides).
+    """
+    print("%-12s %-14s %9s %8s %11s" % ("container", "method", "N", "k",
+                                        "seconds"))
+    results = []
+    for container, make_array in CONTAINERS.items():
+        for N in sizes:
+            for k in sorted({1, math.isqrt(N), N // 3}):
+                for name, rotate in ROTATIONS.items():
+                    if (rotate is array_utils._rotate_by_block_swaps and
+                            not array_utils.supports_slices(make_array([]))):
+                        continue
+                    seconds = []
+                    for _ in range(repeat):
+                        A = make_array(range(N))
+                        start = time.perf_counter()
+                        rotate(A, 0, N, k)
+                        seconds.append(time.perf_counter() - start)
+                    results.append({"container": container, "method": name,
+                                    "size": N, "k": k,
+                                    "seconds": min(seconds)})
+                    print("%-12s %-14s %9d %8d %10.5fs" % (
+                        container, name, N, k, min(seconds)))
+    return results
+
+
+def _time_merge(merge_fn, arrays, n):
+    """Total time to merge each array (copied first) at index n."""
+    total = 0
+    for A in arrays:
+        A = list(A)
+        start = time.perf_counter()
+        merge_fn(A, 0, n, len(A))
+        total += time.perf_counter() - start
+    return total
+
+
+def _block_merge(A, start, ys_start, end):
+    merge.merge_inplace(A, start, end - start, adaptive=False, mid=ys_start)
+
+
+def benchmark_cutoffs(repeat=20):
+    """Compares the fast paths of merge_inplace with its block merge.
+
+    Used to pick merge.INSERTION_MERGE_MAX_LENGTH and
+    merge.ROTATION_MERGE_MAX_SQRT_FACTOR: the fast path should win up to the
+    cutoff.
+    """
+    print("insertion vs block merge, balanced runs:")
+    print("%8s %12s %12s" % ("N", "insertion", "block"))
+    for N in [8, 16, 32, 64, 128]:
+        arrays = [_random_runs(N // 2, N - N // 2) for _ in range(repeat)]
+        print("%8d %11.5fs %11.5fs" % (
+            N, _time_merge(merge._insertion_merge, arrays, N // 2),
+            _time_merge(_block_merge, arrays, N // 2)))
+
+    print("rotation vs block merge, shorter run of factor * sqrt(N):")
+    print("%8s %8s %12s %12s" % ("N", "factor", "rotation", "block"))
+    for N in [1000, 10000, 100000]:
+        for factor in [0.5, 1, 2, 4, 8, 16]:
+            n = int(factor * math.isqrt(N))
+            short_xs = [_random_runs(n, N - n) for _ in range(3)]
+            short_ys = [_random_runs(N - n, n) for _ in range(3)]
+            rotation_time = (
+                _time_merge(merge._rotation_merge, short_xs, n) +
+                _time_merge(merge._rotation_merge, short_ys, N - n))
+            block_time = (_time_merge(_block_merge, short_xs, n) +
+                          _time_merge(_block_merge, short_ys, N - n))
+            print("%8d %8.1f %11.5fs %11.5fs" % (
+                N, factor, rotation_time, block_time))
+
+
+def benchmark_keys(sizes, repeat=1):
+    """Times the merges on balanced runs with KEYS_COUNTS distinct values.
+
+    merge_inplace merges with rotations up to merge.FEW_KEYS_MAX_DISTINCT
+    distinct values, and with the block merge above.
+    """
+    merges = {
+        "merge_inplace": lambda A, start, ys_start, end: merge.merge_inplace(
+            A, start, end - start, mid=ys_start),
+        "rotation": merge._rotation_merge,
+        "block": _block_merge,
+    }
+    print("%9s %6s %-14s %11s" % ("N", "keys", "merge", "seconds"))
+    results = []
+    for N in sizes:
+        for keys in KEYS_COUNTS:
+            arrays = []
+            for _ in range(repeat):
+                values = [random.randrange(keys) for _ in range(N)]
+                arrays.append(sorted(values[:N // 2]) +
+                              sorted(values[N // 2:]))
+            for name, merge_fn in merges.items():
+                seconds = _time_merge(merge_fn, arrays, N // 2) / repeat
+                results.append({"size": N, "keys": keys, "merge": name,
+                                "seconds": seconds})
+                print("%9d %6d %-14s %10.5fs" % (N, keys, name, seconds))
+    return results
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("benchmarks", nargs="*", default=["merge", "sort"],
+                        help="cutoffs, merge, sort, parallel, external, "
+                             "rotate and/or keys (default: merge sort)")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        help="input sizes (default: powers of 10 from 10^2)")
+    parser.add_argument("--max-size", type=int, default=10**5,
+                        help="largest default size (default: 10^5)")
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=SHAPES)
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="runs per input, keeping the best time")
+    parser.add_argument("--no-counts", dest="counts", action="store_false",
+                        help="skip counting comparisons and moves")
+    parser.add_argument("--processes", type=int, nargs="+",
+                        default=[1, 2, 4, 8],
+                        help="process counts for the parallel benchmark")
+    parser.add_argument("--seed", type=int, default=1337)
+    parser.add_argument("--json", metavar="PATH",
+                        help="also write the results to this JSON file")
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in ("cutoffs", "merge", "sort", "parallel",
+                        "external", "rotate", "keys"):
+            parser.error("unknown benchmark: %s" % name)
+    return args
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    random.seed(args.seed)
+    sizes = args.sizes or [10**e for e in range(2, 8)
+                           if 10**e <= args.max_size]
+    results = {}
+    for name in args.benchmarks:
+        if name == "cutoffs":
+            benchmark_cutoffs()
+        elif name == "merge":
+            results["merge"] = benchmark_merges(sizes, args.shapes,
+                                                args.repeat, args.counts)
+        elif name == "external":
+            results["external"] = benchmark_external(sizes)
+        elif name == "rotate":
+            results["rotate"] = benchmark_rotations(sizes, args.repeat)
+        elif name == "keys":
+            results["keys"] = benchmark_keys(sizes, args.repeat)
+        elif name == "parallel":
+            results["parallel"] = benchmark_parallel(sizes, args.processes)
+        elif name == "sort":
+            results["sort"] = benchmark_sorts(sizes, args.shapes,
+                                              args.repeat, args.counts)
+        print()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"seed": args.seed, "results": results}, f, indent=2)
@@ -0,0 +1,67 @@
+"""In-place merges of sorted binary files, through mmap.
+
+Files hold fixed-width numbers (array.array typecodes, e.g. "d" for doubles,
+in native byte order). The file is memory-mapped and seen as a memoryview of
+numbers, so merge_inplace runs on it directly: the operating system pages the
+file in and out, and only O(sqrt(N)) extra memory is used for the block heads
+and buffer sort. Block swaps and rotations go through vectorized.py, which
+moves large chunks with slices, so most of the I/O is sequential.
+
+Example:
+    merge_sorted_files(["run0.bin", "run1.bin"], "merged.bin", typecode="d")
+"""
+
+import array
+import mmap
+import os
+import shutil
+
+import merge
+
+
+# Bytes copied at a time when concatenating files.
+COPY_BUFFER_SIZE = 1 << 20
+
+
+def merge_sorted_files(paths, output_path, typecode="d"):
+    """Merges sorted binary files of 'typecode' numbers into 'output_path'.
+
+    The files are concatenated into 'output_path' (with large sequential
+    copies), whose runs are then merged in-place, see merge_runs_inplace.
+
+    Complexity:
+        - O(N lg k) time, for k files
+        - O(sqrt(N)) memory, no other disk space than 'output_path'
+    """
+    itemsize = array.array(typecode).itemsize
+    boundaries = [0]
+    with open(output_path, "wb") as output:
+        for path in paths:
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, output, COPY_BUFFER_SIZE)
+            assert output.tell() % itemsize == 0, \
+                "%s is not made of %d-byte numbers." % (path, itemsize)
+            boundaries.append(output.tell() // itemsize)
+    merge_runs_inplace(output_path, boundaries, typecode)
+
+
+def merge_runs_inplace(path, boundaries, typecode="d"):
+    """Merges, in-place, the sorted runs of a binary file of numbers.
+
+    'boundaries' are the indices (in numbers, not bytes) where runs start,
+    followed by the end of the file: [0, end of run 0, ..., N]. Runs are
+    merged with merge.merge_k_inplace.
+
+    Complexity:
+        - O(N lg k) time, for k runs
+        - O(sqrt(N)) memory
+    """
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, "r+b") as f, mmap.mmap(f.fileno(), 0) as mapped:
+        if hasattr(mapped, "madvise"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        with memoryview(mapped).cast(typecode) as A:
+            assert boundaries[0] == 0 and boundaries[-1] == len(A)
+            merge.merge_k_inplace(A, boundaries)
+        mapped.flush()
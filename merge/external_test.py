@@ -0,0 +1,61 @@
+import array
+import os
+import random
+import tempfile
+import unittest
+from external import merge_sorted_files, merge_runs_inplace
+
+
+class ExternalMergeTests(unittest.TestCase):
+    def setUp(self):
+        random.seed(1337)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def _write(self, name, values, typecode="d"):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "wb") as f:
+            array.array(typecode, values).tofile(f)
+        return path
+
+    def _read(self, path, typecode="d"):
+        values = array.array(typecode)
+        with open(path, "rb") as f:
+            values.frombytes(f.read())
+        return values.tolist()
+
+    def test_two_files(self):
+        xs = sorted(random.random() for _ in range(3000))
+        ys = sorted(random.random() for _ in range(2000))
+        output = os.path.join(self.directory.name, "merged.bin")
+        merge_sorted_files([self._write("xs.bin", xs),
+                            self._write("ys.bin", ys)], output)
+        self.assertEqual(self._read(output), sorted(xs + ys))
+        self.assertEqual(self._read(os.path.join(self.directory.name,
+                                                 "xs.bin")), xs)
+
+    def test_k_files_with_empty(self):
+        runs = [sorted(random.randrange(100) for _ in range(length))
+                for length in [500, 0, 1, 1500, 30, 800]]
+        paths = [self._write("run%d.bin" % i, run, typecode="q")
+                 for i, run in enumerate(runs)]
+        output = os.path.join(self.directory.name, "merged.bin")
+        merge_sorted_files(paths, output, typecode="q")
+        self.assertEqual(self._read(output, typecode="q"),
+                         sorted(sum(runs, [])))
+
+    def test_empty(self):
+        output = os.path.join(self.directory.name, "merged.bin")
+        merge_sorted_files([self._write("empty.bin", [])], output)
+        self.assertEqual(self._read(output), [])
+
+    def test_runs_file(self):
+        runs = [sorted(random.random() for _ in range(length))
+                for length in [700, 300, 1000]]
+        path = self._write("runs.bin", sum(runs, []))
+        merge_runs_inplace(path, [0, 700, 1000, 2000])
+        self.assertEqual(self._read(path), sorted(sum(runs, [])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+"""Opt-in counters of the comparisons and moves done by the in-place merges.
+
+Example:
+    stats = MergeStats()
+    merge.merge_inplace(A, 0, len(A), stats=stats)
+    stats.as_dict()  # {"1.0_move_biggest": {"comparisons": 4, "moves": 12},
+                     #  ..., "total": {...}}
+
+Phases of merge_inplace (see merge.py for the steps):
+    0_setup, fast_path, 1.0_move_biggest, 1.1_make_multiples, 2_sort_blocks,
+    3_merge_blocks, 4_sort_buffer
+of merge_inplace_kronrad:
+    kronrad_prepare, kronrad_merge, kronrad_cleanup
+and of the k-way merges of merge_k_inplace (see merge._kway_merge):
+    kway_move_biggest, kway_make_multiples, kway_sort_blocks,
+    kway_merge_blocks, kway_sort_buffer
+Sortedness checks (asserts) are counted under 'checks'.
+
+When no stats are given, the merges run on the array directly, and entering a
+phase is a no-op context: disabled instrumentation costs O(1) per unit of work
+that enters a phase (a contextlib.nullcontext), e.g. O(sqrt(N)) per block
+merge, which is small next to the O(N) element operations.
+
+Counts are of the operations done on a CountingArray, which doesn't support
+slices: rotations of a CountingArray are done by following cycles
+(array_utils._rotate_by_cycles), while lists and arrays are rotated with block
+swaps and slices. So the moves counted for the rotations are those of the
+cycle algorithm, one per element, not those of uninstrumented runs.
+"""
+
+import collections
+import contextlib
+
+
+class MergeStats:
+    """Comparisons and moves (element assignments) per phase."""
+    def __init__(self):
+        self.phase = "other"
+        self.comparisons = collections.Counter()
+        self.moves = collections.Counter()
+
+    @contextlib.contextmanager
+    def measure(self, phase):
+        """Attributes the operations done in the 'with' block to 'phase'."""
+        previous, self.phase = self.phase, phase
+        try:
+            yield
+        finally:
+            self.phase = previous
+
+    def as_dict(self):
+        """Returns {phase: {"comparisons": c, "moves": m}}, with a "total"."""
+        phases = list(dict.fromkeys(list(self.comparisons) + list(self.moves)))
+        counts = {phase: {"comparisons": self.comparisons[phase],
+                          "moves": self.moves[phase]}
+                  for phase in phases}
+        counts["total"] = {"comparisons": sum(self.comparisons.values()),
+                           "moves": sum(self.moves.values())}
+        return counts
+
+
+class CountingArray:
+    """View of an array that counts the moves and comparisons of its elements.
+
+    It doesn't support slices, so the merges move its elements one at a time,
+    e.g. rotating by cycles rather than block swaps (see the module docstring).
+
+    Elements are wrapped (to count their comparisons) when read, and unwrapped
+    when written back, so the underlying array only ever has its own elements.
+    """
+    def __init__(self, A, stats):
+        self.array = A
+        self.stats = stats
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [_CountedElement(a, self.stats) for a in self.array[index]]
+        return _CountedElement(self.array[index], self.stats)
+
+    def __setitem__(self, index, value):
+        assert not isinstance(index, slice)
+        self.stats.moves[self.stats.phase] += 1
+        self.array[index] = _unwrap(value)
+
+
+class _CountedElement:
+    __slots__ = ("value", "stats")
+
+    def __init__(self, value, stats):
+        self.value = value
+        self.stats = stats
+
+    def __repr__(self):
+        return repr(self.value)
+
+    def _compare(self):
+        self.stats.comparisons[self.stats.phase] += 1
+
+    def __lt__(self, other):
+        self._compare()
+        return self.value < _unwrap(other)
+
+    def __gt__(self, other):
+        self._compare()
+        return self.value > _unwrap(other)
+
+    def __le__(self, other):
+        self._compare()
+        return self.value <= _unwrap(other)
+
+    def __ge__(self, other):
+        self._compare()
+        return self.value >= _unwrap(other)
+
+    def __eq__(self, other):
+        self._compare()
+        return self.value == _unwrap(other)
+
+    __hash__ = None
+
+
+def _unwrap(value):
+    return value.value if isinstance(value, _CountedElement) else value
+
+
+def count_operations(A, stats):
+    """Returns A itself if 'stats' is None, or a CountingArray view of A."""
+    if stats is None or (isinstance(A, CountingArray) and A.stats is stats):
+        return A
+    return CountingArray(A, stats)
+
+
+def measure(stats, phase):
+    """stats.measure(phase), or a no-op context if 'stats' is None."""
+    if stats is None:
+        return contextlib.nullcontext()
+    return stats.measure(phase)
@@ -0,0 +1,79 @@
+import random
+import unittest
+from instrumentation import MergeStats, CountingArray, count_operations
+from merge import merge_inplace, merge_sort_inplace
+
+
+class CountingArrayTests(unittest.TestCase):
+    def test_swap_is_two_moves(self):
+        stats = MergeStats()
+        A = [1, 2, 3]
+        view = CountingArray(A, stats)
+        view[0], view[2] = view[2], view[0]
+        self.assertEqual(A, [3, 2, 1])
+        self.assertEqual(stats.as_dict(), {
+            "other": {"comparisons": 0, "moves": 2},
+            "total": {"comparisons": 0, "moves": 2}})
+
+    def test_comparisons(self):
+        stats = MergeStats()
+        view = CountingArray([1, 2, 3], stats)
+        with stats.measure("phase"):
+            self.assertTrue(view[0] < view[1])
+            self.assertFalse(view[2] <= view[1])
+        self.assertEqual(stats.as_dict()["phase"],
+                         {"comparisons": 2, "moves": 0})
+
+    def test_count_operations_disabled(self):
+        A = [1, 2, 3]
+        self.assertIs(count_operations(A, None), A)
+
+
+class MergeStatsTests(unittest.TestCase):
+    def setUp(self):
+        random.seed(1337)
+        N = 1000
+        values = random.sample(range(10 * N), N)
+        self.A = sorted(values[:N // 2]) + sorted(values[N // 2:])
+
+    def test_merge_inplace_phases(self):
+        stats = MergeStats()
+        merge_inplace(self.A, 0, len(self.A), adaptive=False, stats=stats)
+        self.assertEqual(self.A, sorted(self.A))
+        self.assertTrue(all(type(a) is int for a in self.A))
+        counts = stats.as_dict()
+        for phase in ["0_setup", "1.0_move_biggest", "2_sort_blocks",
+                      "3_merge_blocks", "4_sort_buffer"]:
+            self.assertGreater(counts[phase]["comparisons"], 0, phase)
+        self.assertEqual(counts["checks"]["moves"], 0)
+        self.assertEqual(counts["total"]["moves"],
+                         sum(c["moves"] for p, c in counts.items()
+                             if p != "total"))
+
+    def test_kronrad_phases(self):
+        stats = MergeStats()
+        merge_inplace(self.A, 0, len(self.A), adaptive=False, kronrad=True,
+                      stats=stats)
+        self.assertEqual(self.A, sorted(self.A))
+        counts = stats.as_dict()
+        for phase in ["kronrad_prepare", "kronrad_merge", "kronrad_cleanup"]:
+            self.assertGreater(counts[phase]["moves"], 0, phase)
+
+    def test_fast_path(self):
+        stats = MergeStats()
+        A = [1, 3, 5, 2, 4, 6]
+        merge_inplace(A, 0, len(A), stats=stats)
+        self.assertEqual(A, [1, 2, 3, 4, 5, 6])
+        self.assertEqual(list(stats.as_dict()),
+                         ["0_setup", "fast_path", "total"])
+
+    def test_merge_sort_inplace(self):
+        stats = MergeStats()
+        A = list(reversed(range(100)))
+        merge_sort_inplace(A, stats=stats)
+        self.assertEqual(A, list(range(100)))
+        self.assertGreater(stats.as_dict()["total"]["comparisons"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""View of an array whose elements are compared by a key function.
+
+The key of each element is computed once and cached in a list that is moved
+along with the elements, so that the merges can keep comparing elements with
+'<' without building decorated (key, element) tuples.
+"""
+
+
+class KeyedArray:
+    """View of A[start:start+length), comparing elements by key(element).
+
+    Indices are those of A. Elements read through the view are
+    (key, element) pairs, and writing them back moves both the element in A
+    and its cached key.
+
+    Complexity:
+        - O(length) time to compute the keys
+        - O(length) space for the keys (one reference per element)
+    """
+    def __init__(self, A, key, start=0, length=None):
+        if length is None:
+            length = len(A) - start
+        self.array = A
+        self.start = start
+        self.keys = [key(A[i]) for i in range(start, start + length)]
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.array)))]
+        return _KeyedElement(self.keys[index - self.start], self.array[index])
+
+    def __setitem__(self, index, element):
+        assert not isinstance(index, slice)
+        self.keys[index - self.start] = element.key
+        self.array[index] = element.value
+
+
+class _KeyedElement:
+    __slots__ = ("key", "value")
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+    def __repr__(self):
+        return repr(self.value)
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+    def __gt__(self, other):
+        return self.key > other.key
+
+    def __le__(self, other):
+        return self.key <= other.key
+
+    def __ge__(self, other):
+        return self.key >= other.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    __hash__ = None
+
+
+def keyed_view(A, key, start=0, length=None):
+    """Returns A itself if 'key' is None, or a KeyedArray view of A."""
+    if key is None:
+        return A
+    return KeyedArray(A, key, start, length)
@@ -0,0 +1,32 @@
+import unittest
+from keyed import KeyedArray, keyed_view
+
+
+class KeyedArrayTests(unittest.TestCase):
+    def test_compares_keys(self):
+        A = ["ccc", "a", "bb"]
+        view = KeyedArray(A, key=len)
+        self.assertTrue(view[1] < view[2] < view[0])
+        self.assertFalse(view[0] < view[1])
+
+    def test_moves_keys_with_elements(self):
+        calls = []
+
+        def key(a):
+            calls.append(a)
+            return -a
+        A = [0, 1, 2, 3]
+        view = KeyedArray(A, key, start=1, length=3)
+        view[1], view[3] = view[3], view[1]
+        self.assertEqual(A, [0, 3, 2, 1])
+        self.assertEqual(view.keys, [-3, -2, -1])
+        self.assertTrue(view[1] < view[2] < view[3])
+        self.assertEqual(calls, [1, 2, 3])  # Computed once per element.
+
+    def test_no_key(self):
+        A = [1, 2]
+        self.assertIs(keyed_view(A, None), A)
+
+
+if __name__ == "__main__":
+    unittest.main()
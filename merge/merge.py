@@ -12,7 +12,37 @@ General notation:
 """
 
 import array_utils
+import bisect
+import heapq
+import instrumentation
+import keyed
 import math
+import merge_validation as validation
+import vectorized
+import warnings
+
+
+# Cutoffs for merge_inplace's fast paths, chosen with benchmark.py (see
+# benchmark_cutoffs). Up to this many elements, insertion wins:
+INSERTION_MERGE_MAX_LENGTH = 64
+# When the shorter subarray has at most this many times sqrt(N) elements,
+# merging with rotations (O(min(n, m)^2 + N)) wins over the block merge:
+ROTATION_MERGE_MAX_SQRT_FACTOR = 4
+# When xs or ys has at most this many distinct elements, merging with rotations
+# takes O(FEW_KEYS_MAX_DISTINCT * N) time and wins over the block merge (see
+# benchmark_keys):
+FEW_KEYS_MAX_DISTINCT = 16
+# merge_sort_natural_inplace extends runs shorter than this (or a value in
+# [MIN_RUN_LENGTH/2, MIN_RUN_LENGTH], see _min_run_length) with insertion.
+MIN_RUN_LENGTH = 64
+# _merge_into_target starts galloping (finding whole stretches of elements with
+# exponential searches) once a side wins this many times in a row. As in
+# TimSort, the threshold then adapts to the data, see _merge_into_target.
+MIN_GALLOP = 7
+# The *_steps generators rotate and sort at least this many operations per
+# step, so that the small merges of merge_sort_natural_inplace don't pay for
+# a step per few elements (see _rotation_unit):
+MIN_STEP_OPERATIONS = 256
 
 
 class SubarrayPointers:
@@ -50,141 +80,1014 @@ class SubarrayPointers:
                 A[self.buffer_start:self.buffer_start + self.buffer_length])
 
 
-def merge_inplace(A, start, length, verbose=False, kronrad=False):
+def merge_inplace(A, start, length, verbose=False, kronrad=False,
+                  adaptive=True, stats=None, key=None, stable=False, mid=None,
+                  validate=None):
     """Sorts, in-place, a subarray within A that contains 2 sorted subarrays.
 
+    If 'mid' is given, the subarrays are [start, mid) and [mid, start+length),
+    otherwise the start of the second one is found with a linear scan.
+
+    If 'adaptive' is set, small inputs are merged with insertion, and inputs
+    where one subarray is much shorter than the other (|xs| or |ys| at most
+    ~sqrt(N)) or has few distinct elements (at most FEW_KEYS_MAX_DISTINCT)
+    are merged with rotations. The block merge (or Kronrad's, if 'kronrad' is
+    set) is only used when none applies.
+
+    Elements are compared with '<', or by key(element) if 'key' is given (keys
+    are computed once per element, see keyed.KeyedArray).
+
+    The block merges are not stable. If 'stable' is set, equal elements keep
+    their order, merging with _sym_merge instead (O(N lg N) time).
+
+    If 'stats' (an instrumentation.MergeStats) is given, the comparisons and
+    moves of each step are counted in it. 'verbose' is deprecated and
+    ignored: 'stats' replaces its prints of each step.
+
+    'validate' is the policy for checking that the subarrays and the result
+    are sorted (see merge_validation.py), the global policy by default.
+
     Complexity:
         - O(length) time
-        - O(1) space
+        - O(1) space (O(length) for the keys, with 'key')
     """
+    _warn_verbose(verbose)
+    A = keyed.keyed_view(A, key, start, length)
+    A = instrumentation.count_operations(A, stats)
+    N = length
+    with instrumentation.measure(stats, "0_setup"):
+        ys_start = _find_mid(A, start, N, mid)
+    if ys_start is None:
+        return  # already sorted!
+    if adaptive:
+        with instrumentation.measure(stats, "fast_path"):
+            if _merge_small_or_skewed(A, start, ys_start, start + N):
+                return
+    if stable:
+        with instrumentation.measure(stats, "sym_merge"):
+            _sym_merge(A, start, ys_start, start + N)
+        return
     if kronrad:
-        merge_inplace_kronrad(A, start, length, verbose=verbose)
+        merge_inplace_kronrad(A, start, length, stats=stats, mid=ys_start)
+        return
+    _run_steps(_block_merge_steps(A, start, N, ys_start, stats, validate))
+
+
+def merge_inplace_kronrad(R, start, N, verbose=False, stats=None, key=None,
+                          mid=None):
+    """As described in TAOCP Vol 3, 5.2.4. exercise #18.
+
+    Elements are compared by key(element) if 'key' is given, and 'mid' is the
+    start of the second subarray if known, see merge_inplace. If 'stats' (an
+    instrumentation.MergeStats) is given, the comparisons and moves of each
+    step are counted in it.
+
+    'verbose' is deprecated and ignored, see merge_inplace.
+    """
+    _warn_verbose(verbose)
+    # Note: using the same terminology as TAOCP here.
+    R = keyed.keyed_view(R, key, start, N)
+    R = instrumentation.count_operations(R, stats)
+    with instrumentation.measure(stats, "0_setup"):
+        M = _find_mid(R, start, N, mid)
+    if M is None:
+        return  # Already sorted.
+    _run_steps(_kronrad_merge_steps(R, start, N, M, stats))
+
+
+def merge_sort_inplace(A, stats=None, key=None, stable=False, validate=None):
+    """Merge sort 'A' in-place, using a bottom-up approach.
+
+    'key', 'stable' and 'validate' are as in merge_inplace (keys are computed
+    once for the whole sort). If 'stats' (an instrumentation.MergeStats) is
+    given, the comparisons and moves of all merges are counted in it.
+    """
+    A = keyed.keyed_view(A, key)
+    size = 1  # powers of 2
+    while size < len(A):  # lg N iterations
+        for xs_start in range(0, len(A), size * 2):  # goes over N elements
+            ys_start = xs_start + size
+            length = min(len(A), ys_start + size) - xs_start
+            if ys_start < xs_start + length:
+                merge_inplace(A, start=xs_start, length=length, stats=stats,
+                              stable=stable, mid=ys_start, validate=validate)
+        size *= 2
+    with instrumentation.measure(stats, "checks"):
+        validation.check_sorted(A, 0, len(A), validate)
+
+
+def merge_sort_buffered_inplace(A, stats=None, key=None, validate=None):
+    """Merge sort 'A' in-place, bottom-up, setting a buffer aside only once.
+
+    merge_inplace moves its own 3Z-2 biggest elements to a buffer and sorts
+    them back at each merge. Instead, like WikiSort or GrailSort, the last Z
+    elements of A (Z a power of 2, about sqrt(N)) are the buffer of all the
+    merges of the rest of A (see _merge_with_buffer). The buffer's order is
+    lost along the way: it is sorted at the end, and merged with the rest with
+    rotations (it is short).
+
+    'key' and 'validate' are as in merge_inplace, and the sort is not stable.
+    If 'stats' (an instrumentation.MergeStats) is given, the comparisons and
+    moves are counted in it.
+
+    Complexity:
+        - O(N lg N) time
+        - O(1) space (O(N) for the keys, with 'key')
+    """
+    A = keyed.keyed_view(A, key)
+    A = instrumentation.count_operations(A, stats)
+    N = len(A)
+    if N <= INSERTION_MERGE_MAX_LENGTH:
+        _binary_insertion_sort(A, 0, min(1, N), N)
         return
+    Z = 1 << (math.isqrt(N).bit_length() - 1)
+    M = N - Z  # [M, N) is the buffer.
+    size = 1  # powers of 2
+    while size < M:
+        for start in range(0, M - size, 2 * size):
+            _merge_with_buffer(A, start, start + size,
+                               min(start + 2 * size, M), M, Z, stats)
+        size *= 2
+    with instrumentation.measure(stats, "4_sort_buffer"):
+        _sort_buffer(A, M, Z)
+        _rotation_merge(A, 0, M, N)
+    with instrumentation.measure(stats, "checks"):
+        validation.check_sorted(A, 0, N, validate)
+
+
+def merge_sort_natural_inplace(A, stats=None, key=None, stable=False,
+                               validate=None):
+    """Merge sort 'A' in-place, merging the runs that it already has.
+
+    Like TimSort: ascending runs (and strictly descending runs, which are
+    reversed) are found from left to right, short runs are extended to a
+    minimum length with binary insertion, and runs are merged with
+    merge_inplace as they are pushed on a stack, keeping the stack invariants
+    (see _merge_collapse) so that merges stay balanced.
+
+    'key', 'stable' and 'validate' are as in merge_inplace (keys are computed
+    once for the whole sort). If 'stats' (an instrumentation.MergeStats) is
+    given, the comparisons and moves are counted in it.
+
+    Complexity:
+        - O(N lg r) time, for r runs (O(N) if A is already sorted)
+        - O(lg N) space for the stack of runs
+    """
+    A = keyed.keyed_view(A, key)
+    A = instrumentation.count_operations(A, stats)
+    N = len(A)
+    min_run = _min_run_length(N)
+    runs = []  # Stack of [start, length] of sorted runs.
+    start = 0
+    while start < N:
+        with instrumentation.measure(stats, "runs"):
+            end = _find_run(A, start, N)
+            forced_end = min(N, start + min_run)
+            if end < forced_end:
+                _binary_insertion_sort(A, start, end, forced_end)
+                end = forced_end
+        runs.append([start, end - start])
+        _merge_collapse(A, runs, stats, stable, validate)
+        start = end
+    _merge_force_collapse(A, runs, stats, stable, validate)
+    with instrumentation.measure(stats, "checks"):
+        validation.check_sorted(A, 0, N, validate)
+
+
+def merge_k_inplace(A, boundaries, stats=None, key=None, stable=False,
+                    validate=None):
+    """Sorts, in-place, a subarray of A made of k adjacent sorted runs.
+
+    'boundaries' are the indices where the runs start, followed by the end of
+    the last run: [start, start of run 1, ..., end]. Runs that are already in
+    order are joined without moving anything. The k runs left are then merged
+    at once with a k-way merge of blocks when k^2 sqrt(N) <= N (see
+    _kway_merge), which moves each element O(1) times instead of O(lg k)
+    times for lg k passes of pairwise merges. Otherwise, the runs are split
+    in two halves (of about N/2 elements each, so that long runs are not
+    merged again and again with short ones), which are merged recursively,
+    then together with merge_inplace.
+
+    'key', 'stable', 'stats' and 'validate' are as in merge_inplace. The k-way
+    merge is not stable: with 'stable', runs are only merged two at a time.
+
+    Complexity:
+        - O(N lg k) time
+        - O(sqrt(N)) space (for the block heads or the buffer sort of
+          numeric arrays, and the heap of k runs)
+    """
+    assert boundaries, "Expected at least the start of the subarray."
+    start, end = boundaries[0], boundaries[-1]
+    A = keyed.keyed_view(A, key, start, end - start)
+    A = instrumentation.count_operations(A, stats)
+    runs = []  # [start, length] of the sorted runs.
+    for run_start, run_end in zip(boundaries, boundaries[1:]):
+        assert run_start <= run_end
+        if run_start == run_end:
+            continue
+        with instrumentation.measure(stats, "runs"):
+            in_order = runs and not A[run_start] < A[run_start-1]
+        if in_order:  # Continues the previous run.
+            runs[-1][1] += run_end - run_start
+        else:
+            runs.append([run_start, run_end - run_start])
+    _merge_runs(A, runs, stats, stable, validate)
+
+
+def _merge_runs(A, runs, stats=None, stable=False, validate=None):
+    """Merges adjacent sorted runs ([start, length] each), see merge_k_inplace.
+    """
+    if len(runs) < 2:
+        return
+    start = runs[0][0]
+    N = runs[-1][0] + runs[-1][1] - start
+    k = len(runs)
+    if not stable and k >= 3 and k * k * math.isqrt(N) <= N:
+        _kway_merge(A, runs, stats, validate)
+        return
+    # Split where the first half has about N/2 elements (at least one run).
+    half = bisect.bisect_left([run_start for run_start, _ in runs],
+                              start + N // 2, 1, k - 1)
+    mid = runs[half][0]
+    _merge_runs(A, runs[:half], stats, stable, validate)
+    _merge_runs(A, runs[half:], stats, stable, validate)
+    _merge_at(A, [[start, mid - start], [mid, start + N - mid]], 0, stats,
+              stable, validate)
+
+
+def _kway_merge(A, runs, stats=None, validate=None):
+    """Merges k adjacent sorted runs ([start, length] each) at once.
+
+    Same idea as merge_inplace, with k runs instead of xs and ys:
+    1) Move the m = kZ + k(Z-1) biggest elements after the runs, as a buffer:
+       the ends of the runs (counted with _count_k_biggest) are gathered with
+       one rotation per run, carrying the buffer to the right:
+       |-run 0-:-big-|-run 1-:-big-|  ->  |-run 0-|-big-:-run 1-|-big-|
+                                                  |--rotate==>|
+       Then the buffer is sorted, and its smallest elements pad each run to a
+       multiple of Z elements (with one rotation per run, from the right).
+    2) Sort the blocks by their first element, see _sort_blocks.
+    3) Merge the blocks, see _merge_blocks_by_selection: the blocks are
+       taken in order to k slots of the buffer, and their elements are
+       selected with a heap, back to the start of A.
+    4) Sort the buffer (still the biggest elements).
+    Moving the buffer to the right at each of the k runs takes O(k m) =
+    O(k^2 Z) moves, so this is O(N) when k^2 Z <= N (see _merge_runs). Each
+    element is then moved a constant number of times: about 2 times for the
+    block sort, 2 for the block that takes it to a slot and 2 for its
+    selection, instead of that many times per pass of pairwise merges.
+
+    Complexity:
+        - O(N lg k + k^2 sqrt(N)) time (O(N) moves)
+        - O(k) space for the heap (O(sqrt(N)) for numeric arrays, see
+          _sort_blocks)
+    """
+    start = runs[0][0]
+    end = runs[-1][0] + runs[-1][1]
+    N = end - start
+    k = len(runs)
+    Z = math.isqrt(N)
+    with instrumentation.measure(stats, "checks"):
+        for run_start, length in runs:
+            validation.check_sorted(A, run_start, length, validate,
+                                    "Expected an array of sorted runs.")
+
+    # 1) Move the m biggest elements after the runs, and pad them to
+    # multiples of Z.
+    m = k * Z + k * (Z - 1)
+    with instrumentation.measure(stats, "kway_move_biggest"):
+        counts = _count_k_biggest(A, runs, m)
+        lengths = _gather_run_ends(A, runs, counts)
+    buffer_start = end - m
+    with instrumentation.measure(stats, "kway_make_multiples"):
+        _sort_buffer(A, buffer_start, m)
+        lengths = _pad_runs(A, start, lengths, Z)
+    length = sum(lengths)
+    buffer_start = start + length
+
+    # 2) Sort the blocks according to their first elements.
+    with instrumentation.measure(stats, "kway_sort_blocks"):
+        _sort_blocks(A, start, length, Z)
+
+    # 3) Select the elements of the blocks, in order.
+    with instrumentation.measure(stats, "kway_merge_blocks"):
+        _merge_blocks_by_selection(A, start, length, Z, buffer_start)
+
+    # 4) Sort our buffer of "large" elements.
+    with instrumentation.measure(stats, "kway_sort_buffer"):
+        _sort_buffer(A, buffer_start, end - buffer_start)
+    with instrumentation.measure(stats, "checks"):
+        validation.check_sorted(A, start, N, validate)
+
+
+def _count_k_biggest(A, runs, k):
+    """How many of the k biggest elements of the runs are at the end of each.
+
+    Goes down from the ends of the runs, taking, from the run whose end is
+    the biggest, all the elements that are not smaller than the end of every
+    other run (found with a binary search).
+
+    Complexity:
+        - O(r (len(runs) + lg N)) time, for r <= k alternations between runs
+        - O(len(runs)) space
+    """
+    counts = [0] * len(runs)
+    while k > 0:
+        # (run, last element) of the runs with the two biggest ends.
+        biggest = second = None
+        for i, (run_start, length) in enumerate(runs):
+            if counts[i] < length:
+                last = A[run_start+length-counts[i]-1]
+                if biggest is None or biggest[1] < last:
+                    biggest, second = (i, last), biggest
+                elif second is None or second[1] < last:
+                    second = (i, last)
+        i = biggest[0]
+        run_start, length = runs[i]
+        run_end = run_start + length - counts[i]
+        taken = k
+        if second is not None:
+            taken = min(k, run_end - bisect.bisect_left(A, second[1],
+                                                        run_start, run_end))
+        counts[i] += taken
+        k -= taken
+    return counts
+
+
+def _gather_run_ends(A, runs, counts):
+    """Moves the last counts[i] elements of each run after the runs.
+
+    The elements moved so far are carried to the right, one rotation per run.
+    Returns the lengths of the runs left, which start at runs[0][0].
+
+    Complexity:
+        - O(N + len(runs) * sum(counts)) time
+        - O(1) space
+    """
+    position = runs[0][0]  # Where the next run goes.
+    moved = 0  # Elements moved so far, at 'position'.
+    lengths = []
+    for (run_start, length), count in zip(runs, counts):
+        kept = length - count
+        # |-moved-|-run-:-count-| -> |-run-|-moved-:-count-|
+        array_utils.rotate_k_left(A, start=position, length=moved + kept,
+                                  k=moved)
+        lengths.append(kept)
+        position += kept
+        moved += count
+    return lengths
+
+
+def _pad_runs(A, start, lengths, Z):
+    """Pads each run with the smallest elements of the buffer after the runs.
+
+    The runs have 'lengths' and start at 'start', followed by a sorted buffer
+    of elements that are not smaller than any of theirs. The first elements of
+    the buffer are rotated into the runs, from the right, so that each run has
+    a multiple of Z elements. Returns the new lengths of the runs.
+
+    Complexity:
+        - O(sum(lengths) + len(lengths)^2 Z) time
+        - O(1) space
+    """
+    pads = [(-length) % Z for length in lengths]
+    run_end = start + sum(lengths)
+    pool = sum(pads)  # Pads left to move, at run_end.
+    for length, pad in zip(reversed(lengths), reversed(pads)):
+        # |-run-|-pads of the previous runs-:-pad-| ->
+        # |-pads of the previous runs-|-run-:-pad-|
+        pool -= pad
+        array_utils.rotate_k_right(A, start=run_end - length,
+                                   length=length + pool, k=pool)
+        run_end -= length
+    return [length + pad for length, pad in zip(lengths, pads)]
+
+
+def _merge_blocks_by_selection(A, start, length, Z, buffer_start):
+    """Merges blocks of Z elements from k sorted runs, sorted by _sort_blocks.
+
+    Step 3) of _kway_merge. Elements are selected one at a time, back to
+    'start', from the blocks in slots of Z elements of the buffer at
+    'buffer_start' (whose order is lost), with a heap of the next element of
+    each slot (see _Cursor). Blocks are swapped to a free slot in order, as
+    soon as their first element is smaller than every element in the slots:
+    the elements selected are then never bigger than those of the blocks
+    left. A block only goes to a slot once the previous block of its run is
+    done (its last element is not bigger than the first of the next one), so
+    there are at most k slots in use. Selected elements are swapped into the
+    positions of the blocks already taken to the slots, which are free.
+
+    Complexity:
+        - O(length lg k) time
+        - O(k) space for the heap
+    """
+    num_blocks = length // Z
+    free_slots = []
+    heap = []  # _Cursor of each slot in use.
+    next_block = 0
+    for target in range(start, start + length):
+        while next_block < num_blocks and (
+                not heap or A[start+next_block*Z] < heap[0].value):
+            slot = free_slots.pop() if free_slots else \
+                buffer_start + len(heap) * Z
+            array_utils.swap_k_elements(A, start=start+next_block*Z, k=Z,
+                                        target=slot)
+            heapq.heappush(heap, _Cursor(A[slot], slot))
+            next_block += 1
+        cursor = heap[0]
+        i = cursor.index
+        A[target], A[i] = A[i], A[target]
+        i += 1
+        if (i - buffer_start) % Z:
+            cursor.value, cursor.index = A[i], i
+            heapq.heapreplace(heap, cursor)
+        else:  # The slot is done.
+            heapq.heappop(heap)
+            free_slots.append(i - Z)
+
+
+class _Cursor:
+    """Next element of a slot (and its index), ordered by the element."""
+    __slots__ = ("value", "index")
+
+    def __init__(self, value, index):
+        self.value = value
+        self.index = index
+
+    def __lt__(self, other):
+        return self.value < other.value
+
+
+def _block_merge_steps(A, start, length, ys_start, stats=None, validate=None):
+    """Steps 1) to 4) of merge_inplace, as a generator of units of work.
+
+    Yields after each unit (e.g. placing or merging one block, or moving
+    O(sqrt(N)) elements of a rotation) its phase (see instrumentation.py) and
+    an estimate of the element operations it did, at most O(sqrt(N)) except
+    for the checks (O(N) with the "full" validation policy) and the buffer
+    sorts of numeric arrays (O(sqrt(N) lg N), see vectorized.sort_buffer).
+    Operations are attributed to the phase in 'stats' only while a unit runs.
+    Between units, A[start:start+length) is a permutation of the input, and
+    the steps resume from the next unit.
+    """
     N = length
     Z = int(math.sqrt(N))
-    ys_start = array_utils.find_first_unsorted_index(A, start, N)
-    if ys_start is None:
-        return  # already sorted!
     pointers = SubarrayPointers(xs_start=start,
                                 xs_length=ys_start - start,
                                 ys_start=ys_start,
                                 ys_length=start + N - ys_start,
                                 buffer_start=start + N,
                                 buffer_length=0)
-    assert array_utils.is_sorted(A, pointers.xs_start,
-                                 pointers.xs_length) and \
-           array_utils.is_sorted(A, pointers.ys_start,
-                                 pointers.ys_length), \
-           "Expected an array with two sorted subarrays."
-
-    if verbose:
-        print(f"Start: {pointers.show(A)} Z={Z}")
+    with instrumentation.measure(stats, "checks"):
+        for subarray_start, subarray_length in [
+                (pointers.xs_start, pointers.xs_length),
+                (pointers.ys_start, pointers.ys_length)]:
+            validation.check_sorted(
+                A, subarray_start, subarray_length, validate,
+                "Expected an array with two sorted subarrays.")
+    yield "checks", N
 
     # 1) Move (at least) the 'Z' biggest elements to 'buffer'.
     # We need to pad xs and ys with the biggest elements to become multiples of
     # Z while keeping a resulting buffer of at least Z elements, so take Z
     # largest elements (buffer) + (Z-1) (max xs padding) + (Z-1) (max ys
     # padding) = 3Z-2.
-    _move_k_biggest_elements_to_end(A, pointers, k=3*Z-2)
-    if verbose:
-        print(f"1.0) move 3Z-2 to end: {pointers.show(A)}")
-    _make_multiples_of_k(A, pointers, k=Z)
-    if verbose:
-        print(f"1.1) make multiples of Z: {pointers.show(A)}")
+    move_biggest = _move_k_biggest_elements_to_end_steps(A, pointers,
+                                                         k=3*Z-2)
+    yield from _measure_steps(stats, "1.0_move_biggest", move_biggest)
+    make_multiples = _make_multiples_of_k_steps(A, pointers, k=Z)
+    yield from _measure_steps(stats, "1.1_make_multiples", make_multiples)
 
     # 2) Sort the blocks according to their first elements.
-    _sort_blocks(A,
-                 pointers.xs_start, pointers.xs_length + pointers.ys_length,
-                 Z)
-    if verbose:
-        print(f"2) sort blocks based on first elements: {pointers.show(A)}")
+    sort_blocks = _sort_blocks_steps(
+        A, pointers.xs_start, pointers.xs_length + pointers.ys_length, Z,
+        xs_blocks=pointers.xs_length // Z)
+    yield from _measure_steps(stats, "2_sort_blocks", sort_blocks)
 
     # 3) Fully sort a block at a time.
-    for i in range(pointers.xs_start, pointers.buffer_start - Z, Z):
-        current_block = i
-        next_block = i + Z
-        if A[next_block-1] < A[next_block]:
-            # Optimization: if the last element of the current block is smaller
-            # than the first element of the next block, there is no work to do
-            # (blocks are already sorted).
-            continue
-
-        # Move first block to our buffer to make space for the output of
-        # merging the two blocks.
-        array_utils.swap_k_elements(A, start=current_block,
-                                    target=pointers.buffer_start, k=Z)
-        _merge_into_target(A, xs_start=pointers.buffer_start,
-                           ys_start=next_block, target=current_block, length=Z)
-        if verbose:
-            print(f"3.{i}) sort block #{i}: {pointers.show(A)}")
-    if verbose:
-        print(f"3) sort blocks one at a time : {pointers.show(A)}")
+    merge_blocks = _merge_sorted_blocks_steps(
+        A, pointers.xs_start, pointers.xs_length + pointers.ys_length, Z,
+        pointers.buffer_start)
+    yield from _measure_steps(stats, "3_merge_blocks", merge_blocks)
 
     # 4) Sort our buffer of "large" elements.
-    _selection_sort(A, pointers.buffer_start, pointers.buffer_length)
-    if verbose:
-        print(f"4) sort buffer: {pointers.show(A)}")
-    assert array_utils.is_sorted(A, start, length)
+    sort_buffer = _sort_buffer_steps(A, pointers.buffer_start,
+                                     pointers.buffer_length)
+    yield from _measure_steps(stats, "4_sort_buffer", sort_buffer)
+    with instrumentation.measure(stats, "checks"):
+        validation.check_sorted(A, start, length, validate)
+    yield "checks", N
 
 
-def merge_inplace_kronrad(R, start, N, verbose=False):
-    """As described in TAOCP Vol 3, 5.2.4. exercise #18."""
-    # Note: using the same terminology as TAOCP here.
-    M = array_utils.find_first_unsorted_index(R, start, N)
-    if M is None:
-        return  # Already sorted.
+def _kronrad_merge_steps(R, start, N, M, stats=None):
+    """merge_inplace_kronrad once M is known, as a generator of units of work.
+
+    Same as _block_merge_steps: yields the phase and operations of each unit
+    (preparing the auxiliary storage, placing or merging one block, cleaning
+    up), at most O(sqrt(N)) each, except for the buffer sorts of numeric
+    arrays (O(sqrt(N) lg N)).
+    """
     n = int(math.sqrt(N))
     s = n + N % n  # length of auxiliary area
+    if 2 * s > N:  # Too small for the cleanup below (N = 5).
+        yield from _measure_steps(stats, "kronrad_cleanup",
+                                  _sort_buffer_steps(R, start, N))
+        return
 
     # Prepare auxiliary storage.
     aux_start = start + N - s
     zone_R_M = (M-start-1) // n  # zone that contains R_M (when indexed by 1).
     # If R_M turns out to be in the last mod n zone, swap only mod n.
     swap_len = min(n, N - (zone_R_M * n + n))
-    array_utils.swap_k_elements(R, start=start+zone_R_M*n, k=swap_len,
-                                target=aux_start)
+    with instrumentation.measure(stats, "kronrad_prepare"):
+        array_utils.swap_k_elements(R, start=start+zone_R_M*n, k=swap_len,
+                                    target=aux_start)
+    yield "kronrad_prepare", 2 * swap_len
 
     # Sort & merge blocks.
-    _sort_blocks(R, start, N-s, n)
-    for i in range(start, N-s-n, n):
-        # Swap block to auxiliary storage
-        array_utils.swap_k_elements(R, start=i, target=aux_start, k=n)
-        _merge_into_target(R, xs_start=aux_start, ys_start=i+n, target=i,
-                           length=n)
+    yield from _measure_steps(stats, "kronrad_merge",
+                              _sort_blocks_steps(R, start, N-s, n))
+    min_gallop = MIN_GALLOP
+    for i in range(start, aux_start-n, n):
+        with instrumentation.measure(stats, "kronrad_merge"):
+            # Swap block to auxiliary storage
+            array_utils.swap_k_elements(R, start=i, target=aux_start, k=n)
+            min_gallop = _merge_into_target(R, xs_start=aux_start,
+                                            ys_start=i+n, target=i, length=n,
+                                            min_gallop=min_gallop)
+        yield "kronrad_merge", 6 * n
 
     # Cleanup
-    _selection_sort(R, start=aux_start-s, length=2*s)  # Move s biggest to aux.
-    # Same idea as our other merge, but a bit different; going from right to
-    # left (grabbing bigger elements) and not assuming that both sides are the
-    # same length.
-    array_utils.swap_k_elements(R, start=aux_start-s, target=aux_start, k=s)
+    # Move s biggest to aux.
+    yield from _measure_steps(stats, "kronrad_cleanup",
+                              _sort_buffer_steps(R, aux_start - s, 2 * s))
+    with instrumentation.measure(stats, "kronrad_cleanup"):
+        # Same idea as our other merge, but a bit different; going from right
+        # to left (grabbing bigger elements) and not assuming that both sides
+        # are the same length.
+        array_utils.swap_k_elements(R, start=aux_start-s, target=aux_start,
+                                    k=s)
+    yield "kronrad_cleanup", 2 * s
     x, y = aux_start-s-1, aux_start+s-1
-    for i in reversed(range(start, aux_start)):
-        if y < aux_start:
-            break  # Swapped the last auxiliary element, we are done.
-        if x >= start and R[x] > R[y]:
-            R[x], R[i] = R[i], R[x]
-            x -= 1
+    i = aux_start
+    while y >= aux_start and i > start:  # n elements at a time.
+        with instrumentation.measure(stats, "kronrad_cleanup"):
+            for i in reversed(range(max(start, i - n), i)):
+                if y < aux_start:
+                    break  # Swapped the last auxiliary element, we are done.
+                if x >= start and R[x] > R[y]:
+                    R[x], R[i] = R[i], R[x]
+                    x -= 1
+                else:
+                    R[y], R[i] = R[i], R[y]
+                    y -= 1
+        yield "kronrad_cleanup", 2 * n
+    yield from _measure_steps(stats, "kronrad_cleanup",
+                              _sort_buffer_steps(R, aux_start, s))
+
+
+def _warn_verbose(verbose):
+    if verbose:
+        warnings.warn("'verbose' is ignored: count the comparisons and moves "
+                      "of each step with 'stats' "
+                      "(instrumentation.MergeStats).",
+                      DeprecationWarning, stacklevel=3)
+
+
+def _merge_with_buffer(A, start, mid, end, buffer_start, Z, stats=None):
+    """Merges [start, mid) and [mid, end) using Z elements at 'buffer_start'.
+
+    The buffer is outside [start, end), and its elements are only swapped
+    around (their order is lost):
+        - if |xs| <= Z, xs are swapped to the buffer, then merged with ys;
+        - otherwise |xs| is a multiple of Z (see merge_sort_buffered_inplace),
+          and the first multiple of Z elements of ys are merged with steps 2)
+          and 3) of merge_inplace, then the rest of ys (< Z) with rotations.
+
+    Complexity:
+        - O(end - start) time
+        - O(1) space
+    """
+    if not A[mid] < A[mid-1]:
+        return  # Already sorted.
+    if mid - start <= Z:
+        with instrumentation.measure(stats, "buffered_merge"):
+            array_utils.swap_k_elements(A, start=start, k=mid - start,
+                                        target=buffer_start)
+            _merge_into_target(A, xs_start=buffer_start, ys_start=mid,
+                               target=start, length=mid - start,
+                               ys_length=end - mid)
+        return
+    assert (mid - start) % Z == 0
+    blocks_end = end - (end - mid) % Z
+    with instrumentation.measure(stats, "2_sort_blocks"):
+        _sort_blocks(A, start, blocks_end - start, Z,
+                     xs_blocks=(mid - start) // Z)
+    with instrumentation.measure(stats, "3_merge_blocks"):
+        _merge_sorted_blocks(A, start, blocks_end - start, Z, buffer_start)
+    with instrumentation.measure(stats, "rotation_merge"):
+        _rotation_merge(A, start, blocks_end, end)
+
+
+def _min_run_length(N):
+    """Minimum run length, so that N / min_run is (close to) a power of 2.
+
+    As in TimSort: takes the MIN_RUN_LENGTH.bit_length()-1 most significant
+    bits of N, plus one if any of the remaining bits is set.
+    """
+    bits = MIN_RUN_LENGTH.bit_length() - 1
+    remainder = 0
+    while N >= 2**bits:
+        remainder |= N & 1
+        N >>= 1
+    return N + remainder
+
+
+def _find_run(A, start, end):
+    """Returns the end of the run starting at 'start', making it ascending.
+
+    A strictly descending run is reversed (strictly, so that reversing it
+    doesn't reorder equal elements).
+    """
+    i = start + 1
+    if i >= end:
+        return end
+    if A[i] < A[start]:
+        while i < end and A[i] < A[i-1]:
+            i += 1
+        array_utils.invert(A, start, i - start)
+    else:
+        while i < end and not A[i] < A[i-1]:
+            i += 1
+    return i
+
+
+def _binary_insertion_sort(A, start, sorted_end, end):
+    """Sorts [start, end), where [start, sorted_end) is already sorted.
+
+    Complexity:
+        - O(N lg N) comparisons, O(N^2) moves
+        - O(1) space
+    """
+    for i in range(sorted_end, end):
+        x = A[i]
+        position = bisect.bisect_right(A, x, start, i)
+        for j in range(i, position, -1):
+            A[j] = A[j-1]
+        A[position] = x
+
+
+def _merge_collapse(A, runs, stats=None, stable=False, validate=None):
+    """Merges runs at the top of the stack until its invariants hold.
+
+    With run lengths ... W, X, Y, Z (Z at the top):
+        - X > Y + Z and W > X + Y;
+        - Y > Z.
+    Run lengths then grow at least as fast as the Fibonacci numbers going down
+    the stack, so it has O(lg N) runs and merges are of similar lengths. Y is
+    merged with the shortest of X and Z. Also checking W is the fix to
+    TimSort's original invariant (de Gouw et al., 2015).
+    """
+    while len(runs) > 1:
+        n = len(runs) - 2  # Y
+        if ((n > 0 and runs[n-1][1] <= runs[n][1] + runs[n+1][1]) or
+                (n > 1 and runs[n-2][1] <= runs[n-1][1] + runs[n][1])):
+            if runs[n-1][1] < runs[n+1][1]:
+                n -= 1
+        elif runs[n][1] > runs[n+1][1]:
+            return  # Invariants hold.
+        _merge_at(A, runs, n, stats, stable, validate)
+
+
+def _merge_force_collapse(A, runs, stats=None, stable=False, validate=None):
+    """Merges all the runs of the stack, shortest neighbors first."""
+    while len(runs) > 1:
+        n = len(runs) - 2
+        if n > 0 and runs[n-1][1] < runs[n+1][1]:
+            n -= 1
+        _merge_at(A, runs, n, stats, stable, validate)
+
+
+def _merge_at(A, runs, i, stats=None, stable=False, validate=None):
+    """Merges the runs i and i+1 of the stack (which are adjacent in A).
+
+    Elements of the first run that are not bigger than the first element of
+    the second run are already in place, as are the elements of the second run
+    that are not smaller than the last element of the first run: those are
+    skipped with binary searches before merging in-place.
+    """
+    start, length = runs[i]
+    mid, mid_length = runs[i+1]
+    end = mid + mid_length
+    runs[i][1] = length + mid_length
+    del runs[i+1]
+    with instrumentation.measure(stats, "runs"):
+        start = bisect.bisect_right(A, A[mid], start, mid)
+        if start < mid:
+            end = bisect.bisect_left(A, A[mid-1], mid, end)
+    if start < mid < end:
+        merge_inplace(A, start, end - start, stats=stats, stable=stable,
+                      mid=mid, validate=validate)
+
+
+def _find_mid(A, start, length, mid=None):
+    """Start of the second sorted subarray of [start, start+length).
+
+    Returns None if there is nothing to merge: if 'mid' is None, when the
+    subarray is already sorted (found with a linear scan), otherwise when
+    either side is empty or A[mid-1] <= A[mid].
+    """
+    if mid is None:
+        return array_utils.find_first_unsorted_index(A, start, length)
+    assert start <= mid <= start + length
+    if start < mid < start + length and A[mid] < A[mid-1]:
+        return mid
+    return None
+
+
+def _merge_small_or_skewed(A, start, ys_start, end):
+    """Merges [start, ys_start) and [ys_start, end) if a fast path applies.
+
+    Returns whether the subarrays were merged.
+    """
+    return _run_steps(_merge_small_or_skewed_steps(A, start, ys_start, end))
+
+
+def _merge_small_or_skewed_steps(A, start, ys_start, end):
+    """Same as _merge_small_or_skewed, yielding the operations per rotation.
+
+    The generator returns whether the subarrays were merged.
+    """
+    N = end - start
+    shortest = min(ys_start - start, end - ys_start)
+    if N <= INSERTION_MERGE_MAX_LENGTH:
+        _insertion_merge(A, start, ys_start, end)
+        yield N * N
+        return True
+    if (shortest <= ROTATION_MERGE_MAX_SQRT_FACTOR * math.isqrt(N) or
+            _count_distinct(A, start, ys_start, FEW_KEYS_MAX_DISTINCT) <=
+            FEW_KEYS_MAX_DISTINCT or
+            _count_distinct(A, ys_start, end, FEW_KEYS_MAX_DISTINCT) <=
+            FEW_KEYS_MAX_DISTINCT):
+        yield from _rotation_merge_steps(A, start, ys_start, end)
+        return True
+    return False
+
+
+def _run_steps(steps):
+    """Runs a generator of units of work to completion, returns its result."""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+def _measure_steps(stats, phase, steps):
+    """Runs the units of work of 'steps' within measure(stats, phase).
+
+    Yields (phase, operations) per unit, and returns the result of 'steps'.
+    The phase is only entered while a unit runs, not while the generator is
+    paused between two units, so that the operations done in between (e.g. by
+    another merge with the same 'stats') are not counted in it.
+    """
+    while True:
+        with instrumentation.measure(stats, phase):
+            try:
+                operations = next(steps)
+            except StopIteration as stop:
+                return stop.value
+        yield phase, operations
+
+
+def _rotation_unit(N):
+    """Elements moved per step by the rotations of the *_steps generators.
+
+    sqrt(N), as for the blocks of the block merge, so that the rotations
+    (O(N) moves each) are paused as often as the other steps, see
+    array_utils.rotate_k_left_steps. At least MIN_STEP_OPERATIONS.
+    """
+    return max(MIN_STEP_OPERATIONS, math.isqrt(N))
+
+
+def _count_distinct(A, start, end, limit):
+    """Counts the distinct elements of sorted [start, end), up to limit+1.
+
+    Gallops over each stretch of equal elements, so this stays cheap when
+    there are many distinct elements: it stops after limit+1 stretches.
+
+    Complexity:
+        - O(d lg(N/d)) time, for d=min(distinct elements, limit+1)
+        - O(1) space
+    """
+    count = 0
+    while start < end and count <= limit:
+        start = _gallop_right(A, A[start], start, end)
+        count += 1
+    return count
+
+
+def _insertion_merge(A, start, ys_start, end):
+    """Merges sorted [start, ys_start) and [ys_start, end) with insertion.
+
+    Complexity:
+        - O(N^2) time
+        - O(1) space
+    """
+    for i in range(ys_start, end):
+        j = i
+        while j > start and A[j] < A[j-1]:
+            A[j], A[j-1] = A[j-1], A[j]
+            j -= 1
+
+
+def _rotation_merge(A, start, ys_start, end):
+    """Merges sorted xs=[start, ys_start) and ys=[ys_start, end) by rotations.
+
+    Going through the shorter subarray, binary search where its next stretch
+    of elements belongs in the other subarray, and rotate it there, e.g. with
+    a shorter xs:
+    |--xs-done--|--x-stretch--:--xs-rest--|--ys-before-x--|--ys-rest--|
+                <==========rotate---------|
+    All the ys that are smaller than the first x are rotated before it, then
+    all the xs that are not bigger than the new first y stay in place.
+    Equal elements keep their order (xs before ys).
+
+    Each rotation moves what remains of the shorter subarray, plus a stretch
+    of the longer one that is then in its final place. Stretches end where the
+    elements change, so there are at most d rotations when xs or ys has d
+    distinct elements: each run of equal elements is moved as a block, like in
+    a three-way partition.
+
+    Complexity:
+        - O(min(n, m) * min(n, m, d) + N) time
+        - O(1) space
+    """
+    _run_steps(_rotation_merge_steps(A, start, ys_start, end))
+
+
+def _rotation_merge_steps(A, start, ys_start, end):
+    """Same as _rotation_merge, yielding the elements moved per step.
+
+    Rotations are done O(sqrt(N)) moves at a time, see _rotation_unit.
+    """
+    unit = _rotation_unit(end - start)
+    if ys_start - start <= end - ys_start:
+        x, y = start, ys_start
+        while x < y < end:
+            # xs that are not bigger than the first y are already in place.
+            x = bisect.bisect_right(A, A[y], x, y)
+            if x == y:
+                break
+            # ys that are smaller than the first x go before it.
+            y_end = bisect.bisect_left(A, A[x], y, end)
+            yield from array_utils.rotate_k_left_steps(
+                A, start=x, length=y_end - x, k=y - x, unit=unit)
+            x += y_end - y
+            y = y_end
+    else:  # Same, from the right, going through ys.
+        x_end, y_end = ys_start, end
+        while start < x_end < y_end:
+            # ys that are not smaller than the last x are already in place.
+            y_end = bisect.bisect_left(A, A[x_end-1], x_end, y_end)
+            if y_end == x_end:
+                break
+            # xs that are bigger than the last y go after it.
+            x = bisect.bisect_right(A, A[y_end-1], start, x_end)
+            yield from array_utils.rotate_k_left_steps(
+                A, start=x, length=y_end - x, k=x_end - x, unit=unit)
+            y_end = x + y_end - x_end
+            x_end = x
+
+
+def _sym_merge(A, start, ys_start, end):
+    """Stable merge of sorted [start, ys_start) and [ys_start, end).
+
+    SymMerge (Kim & Kutzner, 2004): binary search how to split xs and ys so
+    that rotating the end of xs with the start of ys puts their boundary at the
+    middle 'mid' of [start, end), leaving two smaller, independent merges:
+    |---xs-left---:--xs-right--|--ys-left--:---ys-right---|
+                  |<=========rotate========|
+    |---xs-left---:--ys-left--|--xs-right--:---ys-right---|
+     merge [start, mid)       ^ mid         merge [mid, end)
+    Every y of ys-left is smaller than every x of xs-right, and each side keeps
+    its xs before its ys, so equal elements keep their order.
+
+    Complexity:
+        - O(N lg N) time (O(m lg(n/m + 1)) comparisons, m <= n)
+        - O(lg N) space for the recursion
+    """
+    if start >= ys_start or ys_start >= end:
+        return
+    if ys_start - start == 1:  # Insert the only x after the smaller ys.
+        i = bisect.bisect_left(A, A[start], ys_start, end)
+        array_utils.rotate_k_left(A, start=start, length=i - start, k=1)
+        return
+    if end - ys_start == 1:  # Insert the only y before the xs bigger than it.
+        i = bisect.bisect_right(A, A[ys_start], start, ys_start)
+        array_utils.rotate_k_right(A, start=i, length=end - i, k=1)
+        return
+    mid, split, ys_split = _sym_merge_split(A, start, ys_start, end)
+    array_utils.rotate_k_left(A, start=split, length=ys_split - split,
+                              k=ys_start - split)
+    _sym_merge(A, start, split, mid)
+    _sym_merge(A, mid, ys_split, end)
+
+
+def _sym_merge_split(A, start, ys_start, end):
+    """Binary searches the split of a _sym_merge, returning
+    (mid, split, ys_split): the xs from 'split' go after the ys up to
+    'ys_split'.
+    """
+    mid = (start + end) // 2
+    n = mid + ys_start
+    if ys_start > mid:
+        lo, hi = n - end, mid
+    else:
+        lo, hi = start, ys_start
+    while lo < hi:
+        c = (lo + hi) // 2
+        if not A[n-1-c] < A[c]:
+            lo = c + 1
         else:
-            R[y], R[i] = R[i], R[y]
-            y -= 1
-    _selection_sort(R, start=aux_start, length=s)
+            hi = c
+    return mid, lo, n - lo
 
 
-def merge_sort_inplace(A):
-    """Merge sort 'A' in-place, using a bottom-up approach."""
-    size = 1  # powers of 2
-    while size < len(A):  # lg N iterations
-        for xs_start in range(0, len(A), size * 2):  # goes over N elements
-            ys_start = xs_start + size
-            length = min(len(A), ys_start + size) - xs_start
-            merge_inplace(A, start=xs_start, length=length)
-        size *= 2
-    assert array_utils.is_sorted(A, 0, len(A))
+def _sym_merge_steps(A, start, ys_start, end, unit=None):
+    """Same as _sym_merge, yielding the operations done per step.
 
+    Rotations are done 'unit' moves at a time (_rotation_unit(N) by default),
+    each split yields the comparisons of its binary search, and merges of
+    O(unit) operations are one step.
+    """
+    if start >= ys_start or ys_start >= end:
+        return
+    if unit is None:
+        unit = _rotation_unit(end - start)
+    length = end - start
+    if length * length.bit_length() <= unit:
+        _sym_merge(A, start, ys_start, end)
+        yield length * length.bit_length()
+        return
+    if ys_start - start == 1:  # Insert the only x after the smaller ys.
+        i = bisect.bisect_left(A, A[start], ys_start, end)
+        yield from array_utils.rotate_k_left_steps(
+            A, start=start, length=i - start, k=1, unit=unit)
+        return
+    if end - ys_start == 1:  # Insert the only y before the xs bigger than it.
+        i = bisect.bisect_right(A, A[ys_start], start, ys_start)
+        yield from array_utils.rotate_k_right_steps(
+            A, start=i, length=end - i, k=1, unit=unit)
+        return
+    mid, split, ys_split = _sym_merge_split(A, start, ys_start, end)
+    yield length.bit_length()
+    yield from array_utils.rotate_k_left_steps(
+        A, start=split, length=ys_split - split, k=ys_start - split,
+        unit=unit)
+    yield from _sym_merge_steps(A, start, split, mid, unit)
+    yield from _sym_merge_steps(A, mid, ys_split, end, unit)
+
+
+def _co_rank(A, xs_start, xs_length, ys_start, ys_length, k):
+    """Number of xs among the k smallest elements of sorted xs and ys.
+
+    Merging xs and ys, the first k elements would be the first 'a' xs and
+    the first k-a ys, with a = _co_rank(...). Equal elements are taken from
+    xs first.
+
+    Complexity:
+        - O(lg min(n, m)) time
+        - O(1) space
+    """
+    assert 0 <= k <= xs_length + ys_length
+    lo, hi = max(0, k - ys_length), min(k, xs_length)
+    while lo < hi:
+        a = (lo + hi) // 2
+        # Too few xs if the next x goes before the last y taken.
+        if not A[ys_start+k-a-1] < A[xs_start+a]:
+            lo = a + 1
+        else:
+            hi = a
+    return lo
+
+
+def _merge_into_target(A, xs_start, ys_start, target, length,
+                       ys_length=None, min_gallop=MIN_GALLOP):
+    """Merges sorted xs&ys, swapping with 'target' elements.
 
-def _merge_into_target(A, xs_start, ys_start, target, length):
-    """Merges sorted xs&ys (both same length), swapping with 'target' elements.
+    xs have 'length' elements, as do ys unless 'ys_length' is given.
+
+    Elements are picked one at a time until a side wins 'min_gallop' times in
+    a row. The merge then gallops, as in TimSort: exponential searches find
+    how many elements in a row each side wins, and those stretches are swapped
+    to 'target' at once (see array_utils.swap_k_elements). Galloping stops when
+    stretches get shorter than MIN_GALLOP. 'min_gallop' is lowered while
+    galloping pays off, and raised when it stops, so that data with long
+    stretches (e.g. xs mostly before ys) gallop sooner.
+
+    Returns:
+        - The 'min_gallop' to use for the next merge of similar data.
 
     Note that this works even if ys_start (or xs_start) equals target+length,
     e.g.:
@@ -193,32 +1096,135 @@ def _merge_into_target(A, xs_start, ys_start, target, length):
     <=======================>
            2 * length
 
+    Stretches of elements are moved at once for numeric arrays, see
+    vectorized.merge_into_target.
+
     Whenever 'target' reaches ys_start during the merge, the current y pointer
     is, in the worst case, still at ys_start (if all xs are smaller than
     all ys). From there, we can't overwrite values from ys, because we'd
     essentially swap y elements with themselves (i.e. current target is always
     <= current y pointer).
 
+    Once xs are exhausted, the ys left are already in place if ys_start is
+    target+length, and are not moved.
+
     Assumptions:
-        - 'target' has enough space to hold 2*length elements;
+        - 'target' has enough space to hold length+ys_length elements;
         - [target, target+length) does not overlap with xs or ys.
 
     Complexity:
-        - O(length) time
+        - O(length + ys_length) time (O(lg k) comparisons for a stretch of k
+          elements while galloping)
         - O(1) space (using 'target' as temporary space)
     """
-    x, y = xs_start, ys_start
-    for i in range(length * 2):
-        xs_exhausted = x >= xs_start + length
-        ys_exhausted = y >= ys_start + length
-        # Either we're forced to read x or y (all that's left), or pick the
-        # smallest.
-        if ys_exhausted or (not xs_exhausted and A[x] < A[y]):
-            A[x], A[target+i] = A[target+i], A[x]
-            x += 1
+    if ys_length is None:
+        ys_length = length
+    if vectorized.is_vectorizable(A):
+        vectorized.merge_into_target(A, xs_start, ys_start, target, length,
+                                     ys_length)
+        return min_gallop
+    x, xs_end = xs_start, xs_start + length
+    y, ys_end = ys_start, ys_start + ys_length
+    xs_wins = ys_wins = 0  # Elements in a row taken from each side.
+    while x < xs_end and y < ys_end:
+        if xs_wins < min_gallop and ys_wins < min_gallop:
+            # Pick the smallest (ys first on ties).
+            if A[x] < A[y]:
+                A[x], A[target] = A[target], A[x]
+                x += 1
+                xs_wins, ys_wins = xs_wins + 1, 0
+            else:
+                A[y], A[target] = A[target], A[y]
+                y += 1
+                xs_wins, ys_wins = 0, ys_wins + 1
+            target += 1
+            continue
+        # Gallop: all the ys not bigger than the next x, then all the xs
+        # smaller than the next y.
+        ys_run = _gallop_right(A, A[x], y, ys_end) - y
+        array_utils.swap_k_elements(A, start=y, k=ys_run, target=target)
+        target += ys_run
+        y += ys_run
+        if y == ys_end:
+            break
+        xs_run = _gallop_left(A, A[y], x, xs_end) - x
+        array_utils.swap_k_elements(A, start=x, k=xs_run, target=target)
+        target += xs_run
+        x += xs_run
+        if max(xs_run, ys_run) < MIN_GALLOP:
+            min_gallop += 1  # Back to one element at a time.
+            xs_wins = ys_wins = 0
         else:
-            A[y], A[target+i] = A[target+i], A[y]
-            y += 1
+            min_gallop = max(1, min_gallop - 1)
+    # Either side is exhausted: move what's left of the other.
+    array_utils.swap_k_elements(A, start=x, k=xs_end - x, target=target)
+    if y != target:  # Otherwise, the ys left are in place.
+        array_utils.swap_k_elements(A, start=y, k=ys_end - y, target=target)
+    return min_gallop
+
+
+def _gallop_right(A, value, lo, hi):
+    """Same as bisect.bisect_right(A, value, lo, hi), searching from 'lo'.
+
+    Checks lo, lo+1, lo+3, lo+7, ... until an element is bigger than 'value',
+    then binary searches the last gap.
+
+    Complexity:
+        - O(lg k) time, for a result of lo+k
+        - O(1) space
+    """
+    previous, step = 0, 1
+    while lo + step <= hi and not value < A[lo+step-1]:
+        previous, step = step, 2 * step
+    return bisect.bisect_right(A, value, lo + previous, min(lo + step, hi))
+
+
+def _gallop_left(A, value, lo, hi):
+    """Same as bisect.bisect_left(A, value, lo, hi), searching from 'lo'.
+
+    See _gallop_right.
+    """
+    previous, step = 0, 1
+    while lo + step <= hi and A[lo+step-1] < value:
+        previous, step = step, 2 * step
+    return bisect.bisect_left(A, value, lo + previous, min(lo + step, hi))
+
+
+def _merge_sorted_blocks(A, start, length, Z, buffer_start):
+    """Merges blocks of Z elements, sorted by _sort_blocks, one at a time.
+
+    Step 3) of merge_inplace: each block is swapped to the buffer (Z elements
+    at 'buffer_start', outside [start, start+length), whose order is lost) and
+    merged with the next block, see _merge_into_target.
+
+    Complexity:
+        - O(length) time
+        - O(1) space
+    """
+    _run_steps(_merge_sorted_blocks_steps(A, start, length, Z, buffer_start))
+
+
+def _merge_sorted_blocks_steps(A, start, length, Z, buffer_start):
+    """Same as _merge_sorted_blocks, yielding the operations done per block."""
+    min_gallop = MIN_GALLOP
+    for current_block in range(start, start + length - Z, Z):
+        next_block = current_block + Z
+        if A[next_block-1] < A[next_block]:
+            # Optimization: if the last element of the current block is
+            # smaller than the first element of the next block, there is no
+            # work to do (blocks are already sorted).
+            yield 1
+            continue
+
+        # Move first block to our buffer to make space for the output of
+        # merging the two blocks.
+        array_utils.swap_k_elements(A, start=current_block,
+                                    target=buffer_start, k=Z)
+        min_gallop = _merge_into_target(A, xs_start=buffer_start,
+                                        ys_start=next_block,
+                                        target=current_block, length=Z,
+                                        min_gallop=min_gallop)
+        yield 6 * Z
 
 
 def _point_to_kth_biggest(A, pointers, k):
@@ -238,22 +1244,17 @@ def _point_to_kth_biggest(A, pointers, k):
           subarray.
 
     Complexity:
-        - O(|ys| + |xs|) time
+        - O(lg min(|xs|, |ys|)) time
         - O(1) space
     """
     assert k <= pointers.xs_length + pointers.ys_length
-    x_pointer = pointers.xs_start + pointers.xs_length
-    y_pointer = pointers.ys_start + pointers.ys_length
-    for _ in range(k):
-        xs_exhausted = x_pointer <= pointers.xs_start
-        ys_exhausted = y_pointer <= pointers.ys_start
-        # ys next largest
-        if xs_exhausted or (not ys_exhausted and
-                            A[y_pointer-1] > A[x_pointer-1]):
-            y_pointer -= 1
-        else:  # xs next largest
-            x_pointer -= 1
-    return (x_pointer, y_pointer)
+    # Going down from the ends, xs are taken first on ties: the elements left
+    # are the N-k smallest, taking ys first on ties, found by co-ranking.
+    ys_left = _co_rank(A, pointers.ys_start, pointers.ys_length,
+                       pointers.xs_start, pointers.xs_length,
+                       k=pointers.xs_length + pointers.ys_length - k)
+    xs_left = pointers.xs_length + pointers.ys_length - k - ys_left
+    return (pointers.xs_start + xs_left, pointers.ys_start + ys_left)
 
 
 def _move_last_elements_to_end(A, pointers, xs_to_move, ys_to_move):
@@ -266,8 +1267,20 @@ def _move_last_elements_to_end(A, pointers, xs_to_move, ys_to_move):
         - O(|ys| + |xs|) time
         - O(1) space
     """
+    _run_steps(_move_last_elements_to_end_steps(A, pointers, xs_to_move,
+                                                ys_to_move))
+
+
+def _move_last_elements_to_end_steps(A, pointers, xs_to_move, ys_to_move):
+    """Same as _move_last_elements_to_end, yielding the moves per step.
+
+    The pointers are updated first, and the rotation is done O(sqrt(N))
+    moves at a time, see _rotation_unit.
+    """
     assert pointers.xs_length >= xs_to_move and \
            pointers.ys_length >= ys_to_move
+    unit = _rotation_unit(pointers.xs_length + pointers.ys_length +
+                          pointers.buffer_length)
     # Rotate the last elements of 'xs' that belong in 'buffer' so that they're
     # on the right of the new 'ys', starting from:
     # |-----xs-----:--big-xs--|-----ys-----:--big-ys--|
@@ -280,9 +1293,9 @@ def _move_last_elements_to_end(A, pointers, xs_to_move, ys_to_move):
     pointers.ys_length -= ys_to_move
     pointers.buffer_start -= xs_to_move + ys_to_move
     pointers.buffer_length += xs_to_move + ys_to_move
-    array_utils.rotate_k_left(A, start=pointers.ys_start,
-                              length=xs_to_move + pointers.ys_length,
-                              k=xs_to_move)
+    yield from array_utils.rotate_k_left_steps(
+        A, start=pointers.ys_start, length=xs_to_move + pointers.ys_length,
+        k=xs_to_move, unit=unit)
 
 
 def _move_k_biggest_elements_to_end(A, pointers, k):
@@ -302,14 +1315,21 @@ def _move_k_biggest_elements_to_end(A, pointers, k):
         - O(|ys| + |xs|) time
         - O(1) space
     """
+    _run_steps(_move_k_biggest_elements_to_end_steps(A, pointers, k))
+
+
+def _move_k_biggest_elements_to_end_steps(A, pointers, k):
+    """Same as _move_k_biggest_elements_to_end, yielding the moves per step.
+    """
     assert pointers.xs_length + pointers.ys_length >= k
     # How many elements from 'xs' and 'ys' must we move?
     xs_biggest_start, ys_biggest_start = _point_to_kth_biggest(A, pointers, k)
     xs_biggest_length = pointers.ys_start - xs_biggest_start
     ys_biggest_length = (pointers.ys_start + pointers.ys_length
                          - ys_biggest_start)
-    _move_last_elements_to_end(A, pointers, xs_biggest_length,
-                               ys_biggest_length)
+    yield from _move_last_elements_to_end_steps(A, pointers,
+                                                xs_biggest_length,
+                                                ys_biggest_length)
 
 
 def _make_multiples_of_k(A, pointers, k):
@@ -318,7 +1338,19 @@ def _make_multiples_of_k(A, pointers, k):
     Takes from buffer to pad 'xs' and 'ys' with extra elements to each have a
     size of '0 mod k'. Does so by first sorting 'buffer', then rotating.
     """
-    _selection_sort(A, pointers.buffer_start, pointers.buffer_length)
+    _run_steps(_make_multiples_of_k_steps(A, pointers, k))
+
+
+def _make_multiples_of_k_steps(A, pointers, k):
+    """Same as _make_multiples_of_k, yielding the operations per step.
+
+    The buffer is sorted a sift-down of its heap sort at a time, and the
+    rotation O(sqrt(N)) moves at a time, see _rotation_unit.
+    """
+    unit = _rotation_unit(pointers.xs_length + pointers.ys_length +
+                          pointers.buffer_length)
+    yield from _sort_buffer_steps(A, pointers.buffer_start,
+                                  pointers.buffer_length)
     # How many more elements do we need to reach %k==0?
     xs_needs = (-pointers.xs_length) % k
     ys_needs = (-pointers.ys_length) % k
@@ -332,9 +1364,10 @@ def _make_multiples_of_k(A, pointers, k):
     # to get:
     # |-----xs-----|--xs_needs--|-----ys-----|--ys_needs--|-buffer-remainder-|
     #                                                      ^^^^^ buffer ^^^^^
-    array_utils.rotate_k_right(A, start=pointers.ys_start,
-                               length=pointers.ys_length + xs_needs + ys_needs,
-                               k=xs_needs)
+    yield from array_utils.rotate_k_right_steps(
+        A, start=pointers.ys_start,
+        length=pointers.ys_length + xs_needs + ys_needs, k=xs_needs,
+        unit=unit)
     pointers.xs_length += xs_needs
     pointers.ys_start += xs_needs
     pointers.ys_length += ys_needs
@@ -342,26 +1375,91 @@ def _make_multiples_of_k(A, pointers, k):
     pointers.buffer_length -= xs_needs + ys_needs
 
 
-def _selection_sort(A, start, length):
-    """O(length^2)"""
+def _sort_buffer(A, start, length):
+    """Sorts [start, start+length) in-place, O(length lg length)."""
+    _run_steps(_sort_buffer_steps(A, start, length))
+
+
+def _sort_buffer_steps(A, start, length):
+    """Same as _sort_buffer, yielding the operations done per step.
+
+    Steps are sift-downs of the heap sort, about max(length,
+    MIN_STEP_OPERATIONS) operations of them at a time. Arrays sorted by
+    vectorized.sort_buffer are sorted in one step.
+    """
+    if vectorized.is_vectorizable(A):
+        vectorized.sort_buffer(A, start, length)
+        yield length * max(1, length.bit_length())
+        return
+
     def compare_buffer_elem(i, j): return A[start+i] < A[start+j]
     def swap_buffer_elem(i, j): A[start+i], A[start+j] = A[start+j], A[start+i]
 
-    array_utils.selection_sort(length=length,
-                               compare_fn=compare_buffer_elem,
-                               swap_fn=swap_buffer_elem)
+    # 3 operations (2 comparisons and a swap) per level of a sift-down.
+    sifts = max(length, MIN_STEP_OPERATIONS) // (3 * length.bit_length() + 3)
+    for swaps in array_utils.heap_sort_steps(length=length,
+                                             compare_fn=compare_buffer_elem,
+                                             swap_fn=swap_buffer_elem,
+                                             sifts=max(1, sifts)):
+        yield 3 * swaps
 
 
-def _sort_blocks(A, start, length, Z):
-    """Sorts blocks of Z elements based on their first element."""
+def _sort_blocks(A, start, length, Z, xs_blocks=None):
+    """Sorts blocks of Z elements based on their first element.
+
+    Blocks with the same first element are sorted based on their last element,
+    as in Kronrod's algorithm. Otherwise, with duplicates, selection sort (not
+    stable) could swap blocks that came from the same subarray, e.g. put
+    [1, 1, 1, 2, 2] before [1, 1, 1, 1, 1], and step 3 would then leave a 2
+    before a 1.
+
+    Does at most length/Z block swaps. If 'xs_blocks' is given, the first
+    'xs_blocks' blocks and the remaining ones must each already be sorted
+    (e.g. blocks of xs and ys), which saves most comparisons.
+    """
+    _run_steps(_sort_blocks_steps(A, start, length, Z, xs_blocks))
+
+
+def _sort_blocks_steps(A, start, length, Z, xs_blocks=None):
+    """Same as _sort_blocks, yielding the operations done per placed block.
+
+    Arrays sorted by vectorized.sort_blocks are sorted in one step.
+    """
+    if vectorized.is_vectorizable(A):
+        vectorized.sort_blocks(A, start, length, Z, xs_blocks)
+        yield length
+        return
     assert length % Z == 0
     num_blocks = length // Z
 
-    def compare_first_elem(i, j): return A[start+i*Z] < A[start+j*Z]
+    def compare_blocks(i, j):
+        first_i, first_j = A[start+i*Z], A[start+j*Z]
+        if first_i < first_j or first_j < first_i:
+            return first_i < first_j
+        return A[start+i*Z+Z-1] < A[start+j*Z+Z-1]
 
     def swap_block(i, j):
         array_utils.swap_k_elements(A, start=start+i*Z, k=Z, target=start+j*Z)
 
-    array_utils.selection_sort(length=num_blocks,
-                               compare_fn=compare_first_elem,
-                               swap_fn=swap_block)
+    # Selection sort, where the smallest block is either the next ys block or
+    # the smallest of the xs blocks. Before placing the ith block, the xs
+    # blocks left to place are in [i, y), and the ys blocks left to place were
+    # never moved, so they are still in order in [y, num_blocks):
+    # - if we place an xs block, it is swapped with the xs block at i;
+    # - if we place the ys block at y, the xs block at i moves to y.
+    # So we only need to look for the smallest block among the xs blocks.
+    # Without 'xs_blocks', all blocks are "xs": a plain selection sort.
+    y = num_blocks if xs_blocks is None else xs_blocks
+    for i in range(num_blocks):
+        if i == y:
+            break  # Only ys blocks are left, in order.
+        smallest_x = i
+        for j in range(i + 1, y):
+            if compare_blocks(j, smallest_x):
+                smallest_x = j
+        if y < num_blocks and compare_blocks(y, smallest_x):
+            swap_block(i, y)
+            y += 1
+        elif smallest_x != i:
+            swap_block(i, smallest_x)
+        yield y - i + 2 * Z
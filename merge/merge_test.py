@@ -1,11 +1,40 @@
+import bisect
+import contextlib
+import io
 import random
+import tracemalloc
 import unittest
+from unittest import mock
+import array_utils
+import instrumentation
+import merge
 from merge import (_point_to_kth_biggest, _merge_into_target,
                    _move_k_biggest_elements_to_end, _move_last_elements_to_end,
-                   _make_multiples_of_k, merge_inplace, merge_sort_inplace,
+                   _make_multiples_of_k, _insertion_merge, _rotation_merge,
+                   _sym_merge, _co_rank, _sort_blocks, _count_distinct,
+                   FEW_KEYS_MAX_DISTINCT,
+                   merge_inplace, merge_inplace_kronrad, merge_sort_inplace,
+                   merge_sort_buffered_inplace, _gallop_left, _gallop_right,
+                   MIN_GALLOP,
+                   merge_sort_natural_inplace, merge_k_inplace,
+                   _min_run_length, _count_k_biggest, _gather_run_ends,
+                   _pad_runs,
                    SubarrayPointers)
 
 
+class Keyed:
+    """Element compared only on its key, to check stability."""
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+    def __gt__(self, other):
+        return self.key > other.key
+
+
 class PointToKthBiggestTests(unittest.TestCase):
     def test_kth_biggest_in_xs(self):
         xs = [5, 7, 9, 10]
@@ -61,6 +90,27 @@ class PointToKthBiggestTests(unittest.TestCase):
                                     buffer_start=8, buffer_length=0)
         self.assertEqual(_point_to_kth_biggest(A, pointers, k=2), (3, 8))
 
+    def test_same_as_walking_down(self):
+        random.seed(1337)
+        for _ in range(200):
+            xs = sorted(random.randrange(10)
+                        for _ in range(random.randrange(20)))
+            ys = sorted(random.randrange(10)
+                        for _ in range(random.randrange(20)))
+            A = xs + ys
+            pointers = SubarrayPointers(xs_start=0, xs_length=len(xs),
+                                        ys_start=len(xs), ys_length=len(ys),
+                                        buffer_start=len(A), buffer_length=0)
+            k = random.randrange(len(A) + 1)
+            # Move the pointers down one at a time, xs first on ties.
+            x, y = len(xs), len(A)
+            for _ in range(k):
+                if x == 0 or (y > len(xs) and A[y-1] > A[x-1]):
+                    y -= 1
+                else:
+                    x -= 1
+            self.assertEqual(_point_to_kth_biggest(A, pointers, k), (x, y))
+
 
 class MoveLastElementsToEndTests(unittest.TestCase):
     def test_move_both_xs_ys(self):
@@ -332,45 +382,313 @@ class MergeIntoTargetTests(unittest.TestCase):
         _merge_into_target(A, xs_start=8, ys_start=4, length=4, target=0)
         self.assertEqual(A, [1, 2, 3, 4, 5, 6, 7, 8] + [99] * 4)
 
+    def test_longer_ys(self):
+        A = [99] * 2 + [3, 4, 6, 7, 9] + [5, 8]
+        _merge_into_target(A, xs_start=7, ys_start=2, length=2, target=0,
+                           ys_length=5)
+        self.assertEqual(A, [3, 4, 5, 6, 7, 8, 9] + [99] * 2)
+
+    def test_ys_left_in_place(self):
+        stats = instrumentation.MergeStats()
+        A = [99] * 2 + [5, 6, 7, 8] + [1, 2]
+        _merge_into_target(instrumentation.CountingArray(A, stats),
+                           xs_start=6, ys_start=2, length=2, target=0,
+                           ys_length=4)
+        self.assertEqual(A, [1, 2, 5, 6, 7, 8] + [99] * 2)
+        self.assertEqual(stats.moves["other"], 4)  # Only xs were swapped.
+
+    def test_gallop_stretches(self):
+        # ys mostly before xs, in long stretches.
+        xs = list(range(100, 200)) + list(range(300, 400))
+        ys = list(range(0, 100)) + list(range(200, 300))
+        A = [-1] * 200 + ys + xs
+        stats = instrumentation.MergeStats()
+        counting = instrumentation.CountingArray(A, stats)
+        min_gallop = _merge_into_target(counting, xs_start=400, ys_start=200,
+                                        length=200, target=0)
+        self.assertEqual(A, list(range(400)) + [-1] * 200)
+        self.assertLess(stats.comparisons["other"], 60)
+        self.assertLess(min_gallop, MIN_GALLOP)
+
+    def test_gallop_interleaved(self):
+        random.seed(1337)
+        for length in [1, 5, 20, 100]:
+            for stretch in [1, 3, 10, 50]:
+                values = list(range(2 * length))
+                xs, ys = [], []
+                for i in range(0, 2 * length, stretch):
+                    random.choice([xs, ys]).extend(values[i:i+stretch])
+                A = [-1] * len(xs) + ys + xs
+                _merge_into_target(A, xs_start=len(A) - len(xs),
+                                   ys_start=len(xs), length=len(xs),
+                                   target=0, ys_length=len(ys), min_gallop=2)
+                self.assertEqual(A, values + [-1] * len(xs))
+
+
+class GallopTests(unittest.TestCase):
+    def test_same_as_bisect(self):
+        A = [0, 1, 1, 1, 2, 3, 3, 5, 8, 8, 8, 8, 9]
+        for lo in range(len(A)):
+            for hi in range(lo, len(A) + 1):
+                for value in range(-1, 11):
+                    self.assertEqual(_gallop_right(A, value, lo, hi),
+                                     bisect.bisect_right(A, value, lo, hi))
+                    self.assertEqual(_gallop_left(A, value, lo, hi),
+                                     bisect.bisect_left(A, value, lo, hi))
+
+    def test_few_comparisons_near_lo(self):
+        stats = instrumentation.MergeStats()
+        A = instrumentation.CountingArray(list(range(10000)), stats)
+        self.assertEqual(_gallop_right(A, 3, 0, 10000), 4)
+        # Checks A[0], A[1], A[3], A[7], then bisects [4, 8): bisect alone
+        # would do ~lg(10000) = 14 comparisons.
+        self.assertLessEqual(stats.comparisons["other"], 7)
+
+
+class SortBlocksTests(unittest.TestCase):
+    def test_sort_blocks(self):
+        A = [99, 7, 8, 1, 2, 5, 6, 3, 4, 99]
+        _sort_blocks(A, start=1, length=8, Z=2)
+        self.assertEqual(A, [99, 1, 2, 3, 4, 5, 6, 7, 8, 99])
+
+    def test_two_runs_of_blocks(self):
+        for xs_blocks in range(6):
+            for ys_blocks in range(6):
+                xs = [(x, x) for x in range(0, 3 * xs_blocks, 3)]
+                ys = [(y, y) for y in range(1, 2 * ys_blocks, 2)]
+                A = [v for block in xs + ys for v in block]
+                with mock.patch("array_utils.swap_k_elements",
+                                wraps=array_utils.swap_k_elements) as swap:
+                    _sort_blocks(A, start=0, length=len(A), Z=2,
+                                 xs_blocks=xs_blocks)
+                self.assertEqual(A, sorted(A))
+                self.assertLessEqual(swap.call_count, xs_blocks + ys_blocks)
+
+
+class InsertionMergeTests(unittest.TestCase):
+    def test_interleaved(self):
+        A = [99, 1, 3, 5, 7, 2, 4, 6, 8, 99]
+        _insertion_merge(A, start=1, ys_start=5, end=9)
+        self.assertEqual(A, [99, 1, 2, 3, 4, 5, 6, 7, 8, 99])
+
+
+class RotationMergeTests(unittest.TestCase):
+    def test_short_xs(self):
+        A = [99, 4, 9, 0, 1, 2, 3, 5, 6, 7, 8, 10, 99]
+        _rotation_merge(A, start=1, ys_start=3, end=12)
+        self.assertEqual(A, [99, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 99])
+
+    def test_short_ys(self):
+        A = [99, 0, 1, 2, 3, 5, 6, 7, 8, 10, 4, 9, 99]
+        _rotation_merge(A, start=1, ys_start=10, end=12)
+        self.assertEqual(A, [99, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 99])
+
+    def test_stable(self):
+        xs = [(1, "x0"), (2, "x1"), (2, "x2"), (5, "x3")]
+        ys = [(0, "y0"), (2, "y1"), (5, "y2"), (5, "y3"), (6, "y4")]
+        for left, right in [(xs, ys), (xs[:2], ys), (xs, ys[:2])]:
+            A = [Keyed(k, v) for k, v in left + right]
+            _rotation_merge(A, start=0, ys_start=len(left), end=len(A))
+            self.assertEqual([(a.key, a.value) for a in A],
+                             sorted(left + right, key=lambda kv: kv[0]))
+
+    def test_all_sizes(self):
+        for n in range(12):
+            for m in range(12):
+                xs, ys = list(range(0, 2 * n, 2)), list(range(1, 2 * m, 2))
+                A = xs + ys
+                _rotation_merge(A, start=0, ys_start=n, end=n + m)
+                self.assertEqual(A, sorted(xs + ys))
+
+
+class FewKeysTests(unittest.TestCase):
+    def test_count_distinct(self):
+        A = [9, 0, 0, 1, 2, 2, 2, 5, 9]
+        self.assertEqual(_count_distinct(A, 1, 8, limit=10), 4)
+        self.assertEqual(_count_distinct(A, 1, 8, limit=1), 2)
+        self.assertEqual(_count_distinct(A, 4, 7, limit=10), 1)
+        self.assertEqual(_count_distinct(A, 4, 4, limit=10), 0)
+
+    def merge(self, keys, N=10000):
+        values = [random.randrange(keys) for _ in range(N)]
+        A = sorted(values[:N // 2]) + sorted(values[N // 2:])
+        stats = instrumentation.MergeStats()
+        with mock.patch("merge._rotation_merge_steps",
+                        side_effect=merge._rotation_merge_steps) as rotations:
+            merge_inplace(A, 0, N, stats=stats, mid=N // 2)
+        self.assertEqual(A, sorted(values))
+        return rotations.called, stats.as_dict()
+
+    def test_rotations_up_to_max_distinct(self):
+        random.seed(1337)
+        for keys in [2, 3, FEW_KEYS_MAX_DISTINCT]:
+            rotated, _ = self.merge(keys)
+            self.assertTrue(rotated)
+        rotated, _ = self.merge(4 * FEW_KEYS_MAX_DISTINCT)
+        self.assertFalse(rotated)
+
+    def test_linear_moves(self):
+        random.seed(1337)
+        N = 10000
+        _, counts = self.merge(2, N)
+        self.assertLessEqual(counts["fast_path"]["moves"], 2 * N)
+
+
+class CoRankTests(unittest.TestCase):
+    def test_all_k(self):
+        xs, ys = [1, 3, 3, 5, 7], [2, 3, 4, 8]
+        A = [99] + xs + ys
+        expected = [0, 1, 1, 2, 3, 3, 3, 4, 5, 5]
+        for k in range(len(xs) + len(ys) + 1):
+            self.assertEqual(_co_rank(A, 1, len(xs), 6, len(ys), k),
+                             expected[k], k)
+
+    def test_empty(self):
+        A = [1, 2, 3]
+        self.assertEqual(_co_rank(A, 0, 0, 0, 3, 2), 0)
+        self.assertEqual(_co_rank(A, 0, 3, 3, 0, 2), 2)
+
+
+class SymMergeTests(unittest.TestCase):
+    def test_interleaved(self):
+        A = [99, 1, 3, 5, 7, 2, 4, 6, 8, 99]
+        _sym_merge(A, start=1, ys_start=5, end=9)
+        self.assertEqual(A, [99, 1, 2, 3, 4, 5, 6, 7, 8, 99])
+
+    def test_stable_all_sizes(self):
+        random.seed(1337)
+        for n in range(12):
+            for m in range(12):
+                xs = sorted((random.randrange(4), "x%d" % i) for i in range(n))
+                ys = sorted((random.randrange(4), "y%d" % i) for i in range(m))
+                A = [Keyed(k, v) for k, v in xs + ys]
+                _sym_merge(A, start=0, ys_start=n, end=n + m)
+                self.assertEqual([(a.key, a.value) for a in A],
+                                 sorted(xs + ys, key=lambda kv: kv[0]))
+
+
+class KeyAndStableMergeTests(unittest.TestCase):
+    def setUp(self):
+        random.seed(1337)
+        N = 3000
+        self.records = [(random.randrange(50), i) for i in range(N)]
+        self.xs = sorted(self.records[:N // 3], key=lambda r: r[0])
+        self.ys = sorted(self.records[N // 3:], key=lambda r: r[0])
+        self.expected = sorted(self.xs + self.ys, key=lambda r: r[0])
+
+    def test_key(self):
+        for kronrad in [False, True]:
+            A = self.xs + self.ys
+            merge_inplace(A, 0, len(A), key=lambda r: r[0], kronrad=kronrad,
+                          adaptive=False)
+            self.assertEqual([r[0] for r in A], [r[0] for r in self.expected])
+            self.assertEqual(sorted(A), sorted(self.records))
+
+    def test_key_middle(self):
+        A = [(9, "a"), (1, "b"), (3, "c"), (2, "d"), (4, "e"), (0, "f")]
+        merge_inplace(A, start=1, length=4, key=lambda r: r[0])
+        self.assertEqual(A, [(9, "a"), (1, "b"), (2, "d"), (3, "c"), (4, "e"),
+                             (0, "f")])
+
+    def test_stable(self):
+        for adaptive in [False, True]:
+            A = self.xs + self.ys
+            merge_inplace(A, 0, len(A), key=lambda r: r[0], stable=True,
+                          adaptive=adaptive)
+            self.assertEqual(A, self.expected)
+
+    def test_stable_sorts(self):
+        for sort in [merge_sort_inplace, merge_sort_natural_inplace]:
+            A = list(self.records)
+            sort(A, key=lambda r: r[0], stable=True)
+            self.assertEqual(A, sorted(self.records, key=lambda r: r[0]))
+
+    def test_key_memory(self):
+        # Keys are cached in a list (a reference per element, ~8 bytes), while
+        # decorated (key, element) tuples would take ~70 bytes per element.
+        A = self.xs + self.ys
+        tracemalloc.start()
+        merge_inplace(A, 0, len(A), key=lambda r: r[0], adaptive=False)
+        _, key_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertLess(key_peak, 10 * len(A) + 4096)
+
+    def test_stable_memory(self):
+        # Without keys, O(lg N) for the recursion, far from a copy of A.
+        A = sorted(self.xs) + sorted(self.ys)
+        tracemalloc.start()
+        merge_inplace(A, 0, len(A), stable=True, adaptive=False)
+        _, stable_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertLess(stable_peak, 8192)
+
 
 class MergeInplaceTests(unittest.TestCase):
 
     def setUp(self):
         self.kronrad = False
+        self.adaptive = True
+
+    def test_duplicate_blocks(self):
+        # Blocks with the same first element: [1, 1, 1, 1, 1] and
+        # [1, 1, 1, 2, 2] must stay in that order when sorting blocks.
+        A = [0] * 9 + [1] * 9 + [2] * 11 + [0, 2, 2, 2, 2]
+        expected = sorted(A)
+        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad,
+                      adaptive=self.adaptive)
+        self.assertEqual(A, expected)
+
+    def test_duplicates_many_sizes(self):
+        random.seed(1337)
+        for N in range(2, 300, 7):
+            for keys in [2, 3, 5]:
+                n = random.randrange(1, N)
+                values = [random.randrange(keys) for _ in range(N)]
+                A = sorted(values[:n]) + sorted(values[n:])
+                merge_inplace(A, start=0, length=N, kronrad=self.kronrad,
+                              adaptive=self.adaptive)
+                self.assertEqual(A, sorted(values))
 
     def test_evens_left_odds_right(self):
         A = [0, 2, 4, 6, 8, 1, 3, 5, 7, 9]
-        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad)
+        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad,
+                      adaptive=self.adaptive)
         self.assertEqual(A, [0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
 
     def test_already_sorted(self):
         A = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
-        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad)
+        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad,
+                      adaptive=self.adaptive)
         self.assertEqual(A, [0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
 
     def test_evens_right_odds_left(self):
         A = [1, 3, 5, 7, 9, 0, 2, 4, 6, 8]
-        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad)
+        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad,
+                      adaptive=self.adaptive)
         self.assertEqual(A, [0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
 
     def test_one_big_elem_left(self):
         A = [9, 0, 1, 2, 3, 4, 5, 6, 7, 8]
-        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad)
+        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad,
+                      adaptive=self.adaptive)
         self.assertEqual(A, [0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
 
     def test_one_small_elem_right(self):
         A = [1, 2, 3, 4, 5, 6, 7, 8, 9, 0]
-        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad)
+        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad,
+                      adaptive=self.adaptive)
         self.assertEqual(A, [0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
 
     def test_one_small_elem_left(self):
         A = [4, 0, 1, 2, 3, 5, 6, 7, 8, 9]
-        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad)
+        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad,
+                      adaptive=self.adaptive)
         self.assertEqual(A, [0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
 
     def test_empty_array(self):
         A = []
-        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad)
+        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad,
+                      adaptive=self.adaptive)
         self.assertEqual(A, [])
 
     def test_odds_left_evens_right_many_sizes(self):
@@ -380,7 +698,8 @@ class MergeInplaceTests(unittest.TestCase):
                 left = list(range(1, left_length * 2, 2))
                 right = list(range(0, right_length * 2, 2))
                 A = list(left + right)
-                merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad)
+                merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad,
+                              adaptive=self.adaptive)
                 self.assertEqual(A, sorted(left + right))
 
     def test_with_offset(self):
@@ -389,35 +708,110 @@ class MergeInplaceTests(unittest.TestCase):
         xs, ys = [7, 10, 12], [8, 9, 11, 13, 14]
         A = prefix + xs + ys + suffix
         merge_inplace(A, start=len(prefix), length=len(xs) + len(ys),
-                      kronrad=self.kronrad)
+                      kronrad=self.kronrad, adaptive=self.adaptive)
         self.assertEqual(A, prefix + [7, 8, 9, 10, 11, 12, 13, 14] + suffix)
 
+    def test_mid(self):
+        random.seed(1337)
+        for N in range(0, 200, 3):
+            mid = random.randrange(N + 1)
+            values = [random.randrange(N // 2 + 1) for _ in range(N)]
+            A = [-1] + sorted(values[:mid]) + sorted(values[mid:]) + [-1]
+            merge_inplace(A, start=1, length=N, kronrad=self.kronrad,
+                          adaptive=self.adaptive, mid=1 + mid)
+            self.assertEqual(A, [-1] + sorted(values) + [-1])
+
+    def test_large_offset(self):
+        random.seed(1337)
+        for N in range(10, 300, 7):
+            values = [random.randrange(1000) for _ in range(N)]
+            n = random.randrange(1, N)
+            A = [-1] * 50 + sorted(values[:n]) + sorted(values[n:])
+            merge_inplace(A, start=50, length=N, kronrad=self.kronrad,
+                          adaptive=self.adaptive)
+            self.assertEqual(A, [-1] * 50 + sorted(values))
+
+    def test_mid_skips_scan(self):
+        stats = instrumentation.MergeStats()
+        A = list(range(0, 400, 2)) + list(range(1, 400, 2))
+        merge_inplace(A, start=0, length=len(A), kronrad=self.kronrad,
+                      adaptive=self.adaptive, stats=stats, mid=200)
+        self.assertEqual(A, list(range(400)))
+        # One comparison to check that there is something to merge (again in
+        # merge_inplace_kronrad).
+        self.assertLessEqual(stats.as_dict()["0_setup"]["comparisons"], 2)
+
 
 class MergeInplaceKronradTests(MergeInplaceTests):
 
     def setUp(self):
         self.kronrad = True
+        self.adaptive = True
+
+
+class MergeInplaceBlockTests(MergeInplaceTests):
+
+    def setUp(self):
+        self.kronrad = False
+        self.adaptive = False
+
+
+class MergeInplaceKronradBlockTests(MergeInplaceTests):
+
+    def setUp(self):
+        self.kronrad = True
+        self.adaptive = False
+
+
+class VerboseTests(unittest.TestCase):
+    def test_verbose_is_deprecated(self):
+        for kronrad in [False, True]:
+            A = list(range(0, 200, 2)) + list(range(1, 200, 2))
+            output = io.StringIO()
+            with self.assertWarns(DeprecationWarning), \
+                    contextlib.redirect_stdout(output):
+                merge_inplace(A, 0, len(A), verbose=True, kronrad=kronrad,
+                              adaptive=False)
+            self.assertEqual(A, list(range(200)))
+            self.assertEqual(output.getvalue(), "")
+
+
+class MergeInplaceKronradSmallTests(unittest.TestCase):
+    def test_auxiliary_area_overlaps_start(self):
+        # For N = 5, s = 2 + 5 % 2 = 3 and the cleanup (which sorts the last
+        # 2s elements) would start before the subarray: it falls back to a
+        # sort instead.
+        for N in range(1, 13):
+            for mid in range(N + 1):
+                for values in [list(range(N)), list(reversed(range(N))),
+                               [i % 2 for i in range(N)]]:
+                    A = sorted(values[:mid]) + sorted(values[mid:])
+                    merge_inplace_kronrad(A, 0, N, mid=mid)
+                    self.assertEqual(A, sorted(values), (N, mid, values))
 
 
 class MergeSortInplaceTests(unittest.TestCase):
+    def setUp(self):
+        self.sort = merge_sort_inplace
+
     def test_already_sorted(self):
         A = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
-        merge_sort_inplace(A)
+        self.sort(A)
         self.assertEqual(A, [0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
 
     def test_descending(self):
         A = [9, 8, 7, 6, 5, 4, 3, 2, 1, 0]
-        merge_sort_inplace(A)
+        self.sort(A)
         self.assertEqual(A, [0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
 
     def test_swapped(self):
         A = [1, 0, 3, 2, 5, 4, 7, 6, 9, 8]
-        merge_sort_inplace(A)
+        self.sort(A)
         self.assertEqual(A, [0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
 
     def test_shuffled(self):
         A = [4, 0, 8, 1, 2, 5, 9, 3, 7, 6]
-        merge_sort_inplace(A)
+        self.sort(A)
         self.assertEqual(A, [0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
 
     def test_multiple_sizes(self):
@@ -426,9 +820,219 @@ class MergeSortInplaceTests(unittest.TestCase):
         for length in range(N):
             A = list(range(length))
             random.shuffle(A)
-            merge_sort_inplace(A)
+            self.sort(A)
             self.assertEqual(A, list(range(length)))
 
 
+class MergeSortBufferedInplaceTests(MergeSortInplaceTests):
+    def setUp(self):
+        self.sort = merge_sort_buffered_inplace
+
+    def test_many_sizes(self):
+        random.seed(1337)
+        for N in [65, 100, 257, 1000, 1023, 1024, 1025, 3000]:
+            for keys in [3, N]:
+                A = [random.randrange(keys) for _ in range(N)]
+                expected = sorted(A)
+                self.sort(A)
+                self.assertEqual(A, expected)
+
+    def test_key(self):
+        random.seed(1337)
+        A = [(random.randrange(100), i) for i in range(500)]
+        merge_sort_buffered_inplace(A, key=lambda r: -r[0])
+        self.assertEqual([r[0] for r in A],
+                         sorted((r[0] for r in A), reverse=True))
+
+    def test_fewer_moves_than_merge_sort_inplace(self):
+        random.seed(1337)
+        values = random.sample(range(10000), 2000)
+        counts = []
+        for sort in [merge_sort_inplace, merge_sort_buffered_inplace]:
+            stats = instrumentation.MergeStats()
+            A = list(values)
+            sort(A, stats=stats)
+            self.assertEqual(A, sorted(values))
+            counts.append(stats.as_dict()["total"]["moves"])
+        self.assertLess(counts[1], counts[0])
+
+
+class MergeSortNaturalInplaceTests(MergeSortInplaceTests):
+    def setUp(self):
+        self.sort = merge_sort_natural_inplace
+
+    def test_min_run_length(self):
+        self.assertEqual(_min_run_length(10), 10)
+        self.assertEqual(_min_run_length(64), 32)
+        self.assertEqual(_min_run_length(65), 33)
+        self.assertEqual(_min_run_length(2**20), 32)
+        self.assertEqual(_min_run_length(2**20 + 1), 33)
+
+    def test_runs(self):
+        random.seed(1337)
+        for num_runs in [1, 2, 3, 7, 40]:
+            A = []
+            for _ in range(num_runs):
+                run = sorted(random.sample(range(10**6),
+                                           random.randrange(300)))
+                A += run if random.random() < 0.5 else run[::-1]
+            expected = sorted(A)
+            self.sort(A)
+            self.assertEqual(A, expected)
+
+    def test_descending_duplicates(self):
+        A = [5, 5, 4, 3, 3, 3, 2, 1, 1] * 20
+        expected = sorted(A)
+        self.sort(A)
+        self.assertEqual(A, expected)
+
+    def test_presorted_is_linear(self):
+        stats = instrumentation.MergeStats()
+        N = 10000
+        A = list(range(N))
+        merge_sort_natural_inplace(A, stats=stats)
+        self.assertEqual(A, list(range(N)))
+        counts = stats.as_dict()
+        self.assertLess(counts["runs"]["comparisons"], 2 * N)
+        self.assertEqual(counts["total"]["moves"], 0)
+
+    def test_descending_is_linear(self):
+        stats = instrumentation.MergeStats()
+        N = 10000
+        A = list(reversed(range(N)))
+        merge_sort_natural_inplace(A, stats=stats)
+        self.assertEqual(A, list(range(N)))
+        self.assertLessEqual(stats.as_dict()["total"]["moves"], N)
+
+
+class MergeKInplaceTests(unittest.TestCase):
+    def setUp(self):
+        random.seed(1337)
+
+    def _runs(self, lengths, keys=1000):
+        A, boundaries = [], [0]
+        for length in lengths:
+            A += sorted(random.randrange(keys) for _ in range(length))
+            boundaries.append(len(A))
+        return A, boundaries
+
+    def test_k_runs(self):
+        for lengths in [[10], [5, 7], [100, 0, 3, 250, 40, 1, 1, 90],
+                        [1] * 50, [300, 2, 300, 2, 300]]:
+            A, boundaries = self._runs(lengths)
+            expected = sorted(A)
+            merge_k_inplace(A, boundaries)
+            self.assertEqual(A, expected)
+
+    def test_middle(self):
+        A = [99, 1, 4, 2, 5, 0, 3, -1]
+        merge_k_inplace(A, [1, 3, 5, 7])
+        self.assertEqual(A, [99, 0, 1, 2, 3, 4, 5, -1])
+
+    def test_runs_in_order_do_not_move(self):
+        stats = instrumentation.MergeStats()
+        A = list(range(1000))
+        merge_k_inplace(A, list(range(0, 1001, 100)), stats=stats)
+        self.assertEqual(A, list(range(1000)))
+        self.assertEqual(stats.as_dict()["total"]["moves"], 0)
+
+    def test_no_boundaries(self):
+        with self.assertRaises(AssertionError):
+            merge_k_inplace([], [])
+        A = [3, 1, 2]
+        merge_k_inplace(A, [1])
+        self.assertEqual(A, [3, 1, 2])
+
+    def _balanced_passes(self, A, boundaries, stats):
+        """Merges pairs of adjacent runs, pass after pass."""
+        while len(boundaries) > 2:
+            for i in range(0, len(boundaries) - 2, 2):
+                start, mid, end = boundaries[i:i+3]
+                merge_inplace(A, start, end - start, stats=stats, mid=mid)
+            boundaries = boundaries[::2] + (
+                [boundaries[-1]] if len(boundaries) % 2 == 0 else [])
+
+    def test_kway_merge(self):
+        # k^2 sqrt(N) <= N: the runs are merged at once.
+        for lengths, keys in [([600] * 8, 1000), ([600] * 8, 3),
+                              ([2000, 10, 500, 1, 700, 300], 10**6),
+                              ([100, 3000, 50, 1000], 50)]:
+            A, boundaries = self._runs(lengths, keys)
+            expected = sorted(A)
+            stats = instrumentation.MergeStats()
+            merge_k_inplace(A, boundaries, stats=stats)
+            self.assertEqual(A, expected)
+            self.assertIn("kway_merge_blocks", stats.as_dict())
+
+    def test_kway_merge_of_disjoint_runs(self):
+        # Runs in reverse order: each block is taken alone.
+        A = list(range(3000, 4000)) + list(range(2000, 3000)) + \
+            list(range(1000, 2000)) + list(range(1000))
+        merge_k_inplace(A, [0, 1000, 2000, 3000, 4000])
+        self.assertEqual(A, list(range(4000)))
+
+    def test_kway_merge_with_key(self):
+        A, boundaries = self._runs([400] * 6)
+        A = [(-a, str(a)) for a in A]
+        expected = sorted(A, key=lambda a: -a[0])
+        merge_k_inplace(A, boundaries, key=lambda a: -a[0])
+        self.assertEqual([a[0] for a in A], [a[0] for a in expected])
+
+    def test_fewer_moves_than_balanced_passes(self):
+        # Each element is moved O(1) times by the k-way merges, instead of
+        # once per pass. Runs of 100 elements are only merged 4 at a time
+        # (k^2 sqrt(N) <= N), then in pairs, and the long run is merged once.
+        for lengths, margin in [([100] * 64, 1), ([2000] + [50] * 40, 0.8),
+                                ([1000] * 8, 0.6), ([10000] * 5, 0.5)]:
+            A, boundaries = self._runs(lengths)
+            expected = sorted(A)
+            passes = instrumentation.MergeStats()
+            B = list(A)
+            self._balanced_passes(B, boundaries, passes)
+            k_way = instrumentation.MergeStats()
+            merge_k_inplace(A, boundaries, stats=k_way)
+            self.assertEqual(A, expected)
+            self.assertEqual(B, expected)
+            passes, k_way = passes.as_dict(), k_way.as_dict()
+            self.assertLess(k_way["total"]["moves"],
+                            passes["total"]["moves"] * margin, lengths[:2])
+            # The heap takes about lg k comparisons per element too.
+            self.assertLess(k_way["total"]["comparisons"],
+                            passes["total"]["comparisons"] * 1.5, lengths[:2])
+
+    def test_key_stable(self):
+        records = [(random.randrange(5), i) for i in range(500)]
+        A, boundaries = [], [0]
+        for i in range(0, 500, 60):
+            A += sorted(records[i:i+60], key=lambda r: r[0])
+            boundaries.append(len(A))
+        merge_k_inplace(A, boundaries, key=lambda r: r[0], stable=True)
+        self.assertEqual(A, sorted(records, key=lambda r: r[0]))
+
+
+class KWayMergeStepsTests(unittest.TestCase):
+    def test_count_k_biggest(self):
+        A = [1, 5, 9, 2, 3, 8, 4, 6, 7]
+        runs = [[0, 3], [3, 3], [6, 3]]
+        self.assertEqual(_count_k_biggest(A, runs, 4), [1, 1, 2])
+        self.assertEqual(_count_k_biggest(A, runs, 9), [3, 3, 3])
+        # Ties are taken from either run.
+        self.assertEqual(sum(_count_k_biggest([1, 2, 2, 2], [[0, 2], [2, 2]],
+                                              3)), 3)
+
+    def test_gather_run_ends(self):
+        A = [1, 5, 9, 2, 3, 8, 4, 6, 7]
+        lengths = _gather_run_ends(A, [[0, 3], [3, 3], [6, 3]], [1, 1, 2])
+        self.assertEqual(lengths, [2, 2, 1])
+        self.assertEqual(A[:5], [1, 5, 2, 3, 4])
+        self.assertEqual(sorted(A[5:]), [6, 7, 8, 9])
+
+    def test_pad_runs(self):
+        # Runs of 3, 1 and 2 elements, then the sorted buffer.
+        A = [1, 5, 6, 2, 3, 4, 10, 11, 12, 13, 14]
+        self.assertEqual(_pad_runs(A, 0, [3, 1, 2], 2), [4, 2, 2])
+        self.assertEqual(A, [1, 5, 6, 10, 2, 11, 3, 4, 12, 13, 14])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,76 @@
+"""How much to check that the merges' inputs and outputs are sorted.
+
+Checking that an array is sorted is a whole extra pass over it, which adds up:
+merge_inplace checks its inputs and output, so a bottom-up merge sort would do
+lg N extra passes. The validation policy says how much to check:
+    - "off": no checks;
+    - "sampled" (default): a few random windows of adjacent elements, O(1) per
+      check (arrays that are not longer than the windows are fully checked);
+    - "full": every element, O(N) per check.
+The policy is set for all calls with set_policy, or per call with the
+'validate' argument of the merges (which takes precedence). It is the same
+policy as for ../cube-suffix's root checks: both re-export
+../shared/validation_policy.py, which _import_policy imports once by path.
+
+Example:
+    merge_validation.set_policy(merge_validation.FULL)  # e.g. debugging
+    merge.merge_sort_inplace(A, validate=merge_validation.OFF)
+"""
+
+import importlib.util
+import os
+import random
+import sys
+
+import array_utils
+
+
+def _import_policy():
+    """Imports ../shared/validation_policy.py, once for both trees.
+
+    It is imported by path as the "validation_policy" module, so that the
+    merge/ and cube-suffix/ checks share the same one in a process, without
+    adding ../shared to sys.path.
+    """
+    module = sys.modules.get("validation_policy")
+    if module is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            os.pardir, "shared", "validation_policy.py")
+        spec = importlib.util.spec_from_file_location("validation_policy",
+                                                      path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["validation_policy"] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+_policy = _import_policy()
+OFF, SAMPLED, FULL = _policy.OFF, _policy.SAMPLED, _policy.FULL
+POLICIES = _policy.POLICIES
+set_policy, get_policy = _policy.set_policy, _policy.get_policy
+
+# Windows checked per call with the "sampled" policy, and their length.
+SAMPLED_WINDOWS = 4
+SAMPLED_WINDOW_LENGTH = 16
+
+# Own generator, so that sampling doesn't change the random module's sequence.
+_random = random.Random()
+
+
+def check_sorted(A, start, length, validate=None,
+                 message="Expected a sorted subarray."):
+    """Asserts that A[start:start+length) is sorted, as the policy says.
+
+    Complexity:
+        - O(1) time for "sampled", O(length) for "full"
+        - O(1) space
+    """
+    policy = get_policy(validate)
+    if policy == OFF:
+        return
+    if policy == FULL or length <= SAMPLED_WINDOWS * SAMPLED_WINDOW_LENGTH:
+        assert array_utils.is_sorted(A, start, length), message
+        return
+    for _ in range(SAMPLED_WINDOWS):
+        window = start + _random.randrange(length - SAMPLED_WINDOW_LENGTH + 1)
+        assert array_utils.is_sorted(A, window, SAMPLED_WINDOW_LENGTH), message
@@ -0,0 +1,93 @@
+import random
+import sys
+import unittest
+import instrumentation
+import merge_validation as validation
+from merge import merge_inplace, merge_sort_inplace
+
+
+class PolicyTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(validation.set_policy, validation.get_policy())
+
+    def test_default_is_sampled(self):
+        self.assertEqual(validation.get_policy(), validation.SAMPLED)
+
+    def test_set_policy(self):
+        self.assertEqual(validation.set_policy(validation.OFF),
+                         validation.SAMPLED)
+        self.assertEqual(validation.get_policy(), validation.OFF)
+        self.assertEqual(validation.get_policy(validation.FULL),
+                         validation.FULL)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(AssertionError):
+            validation.set_policy("sometimes")
+
+    def test_policy_is_shared(self):
+        shared = sys.modules["validation_policy"]
+        self.assertIs(validation._policy, shared)
+        validation.set_policy(validation.FULL)
+        self.assertEqual(shared.get_policy(), validation.FULL)
+        shared.set_policy(validation.OFF)
+        self.assertEqual(validation.get_policy(), validation.OFF)
+
+
+class CheckSortedTests(unittest.TestCase):
+    def setUp(self):
+        self.A = list(range(10000))
+        self.A[5000], self.A[5001] = self.A[5001], self.A[5000]
+
+    def test_full(self):
+        with self.assertRaises(AssertionError):
+            validation.check_sorted(self.A, 0, len(self.A), validation.FULL)
+        validation.check_sorted(self.A, 0, 5001, validation.FULL)
+
+    def test_off(self):
+        validation.check_sorted(self.A, 0, len(self.A), validation.OFF)
+
+    def test_sampled_is_constant_time(self):
+        stats = instrumentation.MergeStats()
+        A = instrumentation.CountingArray(list(range(10000)), stats)
+        validation.check_sorted(A, 0, 10000, validation.SAMPLED)
+        self.assertLessEqual(
+            stats.comparisons["other"],
+            validation.SAMPLED_WINDOWS * validation.SAMPLED_WINDOW_LENGTH)
+
+    def test_sampled_short_is_full(self):
+        A = [0, 1, 2, 4, 3, 5]
+        with self.assertRaises(AssertionError):
+            validation.check_sorted(A, 0, len(A), validation.SAMPLED)
+
+
+class MergeValidationTests(unittest.TestCase):
+    def setUp(self):
+        random.seed(1337)
+        values = random.sample(range(10000), 2000)
+        self.A = sorted(values[:1000]) + sorted(values[1000:])
+
+    def test_full_detects_unsorted_input(self):
+        # ys are not sorted.
+        self.A[1500], self.A[1501] = self.A[1501], self.A[1500]
+        with self.assertRaises(AssertionError):
+            merge_inplace(self.A, 0, len(self.A), adaptive=False, mid=1000,
+                          validate=validation.FULL)
+
+    def test_off_has_no_checks(self):
+        stats = instrumentation.MergeStats()
+        merge_sort_inplace(self.A, stats=stats, validate=validation.OFF)
+        self.assertEqual(self.A, sorted(self.A))
+        self.assertNotIn("checks", stats.as_dict())
+
+    def test_sampled_checks_less_than_full(self):
+        comparisons = {}
+        for policy in [validation.SAMPLED, validation.FULL]:
+            stats = instrumentation.MergeStats()
+            merge_sort_inplace(list(self.A), stats=stats, validate=policy)
+            comparisons[policy] = stats.as_dict()["checks"]["comparisons"]
+        self.assertLess(comparisons[validation.SAMPLED],
+                        comparisons[validation.FULL] / 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Read-only view of two sorted subarrays in merged order, without merging.
+
+When A only needs to be read in order, or its i-th smallest element looked up,
+merging it first (O(N) moves) isn't needed: the i-th element of the merge is
+found with a co-rank binary search over xs and ys, and iterating walks both
+subarrays at once. merge_inplace is then only worth it for read-heavy
+workloads, see MergedView.materialize.
+
+Example:
+    view = MergedView(A, 0, n, len(A))
+    view[0], view[-1], view[10:20]  # Smallest, biggest, 10th to 19th.
+    for a in view: ...
+"""
+
+import itertools
+
+import merge
+import merge_validation as validation
+
+
+class MergedView:
+    """View of sorted A[start:mid) and A[mid:end) as if they were merged.
+
+    Elements are in the order of a stable merge: equal elements from xs go
+    before those from ys. The view reads A on each access, so A[start:end)
+    must not be modified while the view is used (other than by materialize).
+
+    'validate' is the policy for checking that the subarrays are sorted (see
+    merge_validation.py), the global policy by default.
+
+    Complexity:
+        - O(lg N) time per element accessed by index
+        - O(lg N + k) time for a slice of k elements, O(1) per iterated element
+        - O(1) space
+    """
+    def __init__(self, A, start, mid, end, validate=None):
+        self.array = A
+        self.pointers = merge.SubarrayPointers(xs_start=start,
+                                               xs_length=mid - start,
+                                               ys_start=mid,
+                                               ys_length=end - mid,
+                                               buffer_start=end,
+                                               buffer_length=0)
+        for subarray_start, subarray_length in [(start, mid - start),
+                                                (mid, end - mid)]:
+            validation.check_sorted(
+                A, subarray_start, subarray_length, validate,
+                "Expected an array with two sorted subarrays.")
+
+    def __len__(self):
+        return self.pointers.xs_length + self.pointers.ys_length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return list(itertools.islice(self._iter_from(start),
+                                         max(0, stop - start)))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("MergedView index out of range")
+        return next(self._iter_from(index))
+
+    def __iter__(self):
+        return self._iter_from(0)
+
+    def materialize(self, stable=True):
+        """Merges A[start:end) in-place, with merge.merge_inplace.
+
+        Afterwards, the view reads A[start+i] directly for its i-th element.
+        Worth it when the view is read more than ~lg N times per element.
+
+        The merge is stable by default, so that the view keeps the same order.
+        With stable=False, the merge is faster but equal elements can end up
+        in any order, which the view then returns them in.
+
+        Complexity:
+            - O(N lg N) time (O(N) if not 'stable')
+            - O(1) space
+        """
+        p = self.pointers
+        N = len(self)
+        merge.merge_inplace(self.array, p.xs_start, N, stable=stable,
+                            mid=p.ys_start, validate=validation.OFF)
+        # All of A[start:end) is now xs, which _co_rank then skips through.
+        self.pointers = merge.SubarrayPointers(xs_start=p.xs_start,
+                                               xs_length=N,
+                                               ys_start=p.xs_start + N,
+                                               ys_length=0,
+                                               buffer_start=p.xs_start + N,
+                                               buffer_length=0)
+
+    def _iter_from(self, index):
+        """Yields the elements in merged order, from the index-th one."""
+        A, p = self.array, self.pointers
+        xs_end = p.xs_start + p.xs_length
+        ys_end = p.ys_start + p.ys_length
+        a = merge._co_rank(A, p.xs_start, p.xs_length, p.ys_start,
+                           p.ys_length, index)
+        x, y = p.xs_start + a, p.ys_start + index - a
+        while x < xs_end and y < ys_end:
+            if A[y] < A[x]:
+                yield A[y]
+                y += 1
+            else:
+                yield A[x]
+                x += 1
+        for i in range(x, xs_end):
+            yield A[i]
+        for i in range(y, ys_end):
+            yield A[i]
@@ -0,0 +1,93 @@
+import random
+import unittest
+import instrumentation
+import merge_validation as validation
+from merged_view import MergedView
+
+
+class MergedViewTests(unittest.TestCase):
+    def setUp(self):
+        random.seed(1337)
+        values = [random.randrange(100) for _ in range(300)]
+        self.xs, self.ys = sorted(values[:120]), sorted(values[120:])
+        self.A = [-1] + self.xs + self.ys + [-1]
+        self.view = MergedView(self.A, 1, 121, 301)
+        self.merged = sorted(self.xs + self.ys)
+
+    def test_getitem(self):
+        self.assertEqual(len(self.view), len(self.merged))
+        self.assertEqual([self.view[i] for i in range(len(self.view))],
+                         self.merged)
+        self.assertEqual(self.view[-1], self.merged[-1])
+        with self.assertRaises(IndexError):
+            self.view[len(self.merged)]
+        with self.assertRaises(IndexError):
+            self.view[-len(self.merged) - 1]
+
+    def test_slices(self):
+        for s in [slice(None), slice(10, 20), slice(290, 400), slice(20, 10),
+                  slice(-5, None), slice(None, None, 7),
+                  slice(None, None, -1)]:
+            self.assertEqual(self.view[s], self.merged[s])
+
+    def test_iter(self):
+        self.assertEqual(list(self.view), self.merged)
+        self.assertEqual(self.A[1:-1], self.xs + self.ys)  # Not merged.
+
+    def test_stable(self):
+        # Equal elements from xs go before those from ys.
+        A = [(1, "x0"), (2, "x1"), (2, "x2"), (1, "y0"), (2, "y1"), (3, "y2")]
+        view = MergedView([(k, v) for k, v in A], 0, 3, 6)
+        self.assertEqual(list(view), sorted(A, key=lambda kv: kv[0]))
+        self.assertEqual([view[i] for i in range(6)], list(view))
+
+    def test_empty_sides(self):
+        A = [1, 2, 3]
+        for mid in range(4):
+            view = MergedView(A, 0, mid, 3)
+            self.assertEqual(list(view), A)
+            self.assertEqual([view[i] for i in range(3)], A)
+        self.assertEqual(list(MergedView([], 0, 0, 0)), [])
+
+    def test_logarithmic_getitem(self):
+        stats = instrumentation.MergeStats()
+        A = instrumentation.CountingArray(self.xs + self.ys, stats)
+        view = MergedView(A, 0, 120, 300, validate=validation.OFF)
+        for i in range(0, 300, 10):
+            stats.comparisons.clear()
+            self.assertEqual(view[i], self.merged[i])
+            # Binary search over at most 120 xs, then picks the x or the y.
+            self.assertLessEqual(stats.comparisons["other"], 8 + 1)
+        self.assertEqual(stats.moves["other"], 0)
+
+    def test_unsorted(self):
+        with self.assertRaises(AssertionError):
+            MergedView([2, 1, 0, 1], 0, 2, 4, validate=validation.FULL)
+
+    def test_materialize(self):
+        self.view.materialize()
+        self.assertEqual(self.A, [-1] + self.merged + [-1])
+        self.assertEqual(list(self.view), self.merged)
+        self.assertEqual(self.view[5:50:3], self.merged[5:50:3])
+
+    def test_materialize_keeps_order(self):
+        # Records compare by key only: materialize keeps them in view order.
+        A = [Record(random.randrange(50), i) for i in range(1000)]
+        A[:400], A[400:] = sorted(A[:400]), sorted(A[400:])
+        view = MergedView(A, 0, 400, 1000)
+        expected = [record.value for record in view]
+        view.materialize()
+        self.assertEqual([record.value for record in view], expected)
+        self.assertEqual([record.value for record in A], expected)
+
+
+class Record:
+    def __init__(self, key, value):
+        self.key, self.value = key, value
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+"""Parallel merge sort of numeric arrays, with a pool of processes.
+
+The array is placed in shared memory (multiprocessing.shared_memory), that
+every worker sees as a memoryview, so that no elements are sent between
+processes:
+    1. Each worker sorts a chunk of the array (merge_sort_natural_inplace);
+    2. Pairs of adjacent sorted runs are merged in parallel, pass after pass.
+When there are fewer merges than workers in a pass (the last passes), each
+merge is split in independent merges: co-ranking (a binary search) finds how
+many elements of each run go in the first half of the output, and a rotation
+moves them there, around the middle:
+    |---xs-left---:--xs-right--|--ys-left--:---ys-right---|
+                  |<=========rotate========|
+    |---xs-left---:--ys-left--|--xs-right--:---ys-right---|
+This is repeated until there is a merge per worker. The splits are done by the
+workers too, a round at a time: the rotations of a round are over disjoint
+ranges, so each worker rotates its own piece of the shared memory.
+
+Example:
+    A = array.array("d", values)
+    parallel.parallel_merge_sort_inplace(A, processes=8)
+"""
+
+import array
+import multiprocessing
+from multiprocessing import shared_memory
+
+import array_utils
+import merge
+
+
+# Below this length, sorting in a single process is faster than starting a
+# pool of processes.
+PARALLEL_MIN_LENGTH = 1 << 14
+# Merges are not split into pieces shorter than this.
+PARALLEL_MIN_MERGE_LENGTH = 1 << 12
+
+
+def parallel_merge_sort_inplace(A, processes=None):
+    """Sorts the numeric array A in-place, with a pool of 'processes'.
+
+    A can be anything that exports a 1-D buffer of numbers, such as an
+    array.array or a NumPy array. It is copied to shared memory, sorted there,
+    and copied back.
+
+    Complexity:
+        - O(N lg N / processes) time, O(N) to copy to shared memory and back
+        - O(N) space for the shared memory
+    """
+    source = memoryview(A)
+    assert source.ndim == 1, "Expected a 1-D array of numbers."
+    N, fmt = len(source), source.format
+    shm = shared_memory.SharedMemory(create=True,
+                                     size=max(1, N * source.itemsize))
+    view = shm.buf[:N * source.itemsize].cast(fmt)
+    try:
+        view[:] = source
+        merge_sort_shared(shm.name, fmt, N, processes=processes)
+        source[:] = view
+    finally:
+        view.release()
+        source.release()
+        shm.close()
+        shm.unlink()
+
+
+def merge_sort_shared(name, fmt, length, processes=None):
+    """Sorts, in-place, 'length' elements of format 'fmt' in shared memory.
+
+    'name' is the name of an existing multiprocessing.shared_memory block,
+    whose first 'length' elements are sorted, with a pool of 'processes'
+    (os.cpu_count() by default).
+    """
+    processes = processes or multiprocessing.cpu_count()
+    shm = shared_memory.SharedMemory(name=name)
+    view = shm.buf[:length * array.array(fmt).itemsize].cast(fmt)
+    try:
+        if processes == 1 or length < PARALLEL_MIN_LENGTH:
+            merge.merge_sort_natural_inplace(view)
+        else:
+            _parallel_merge_sort(view, name, fmt, processes)
+    finally:
+        view.release()
+        shm.close()
+
+
+def _parallel_merge_sort(view, name, fmt, processes):
+    N = len(view)
+    runs = sorted(set(N * i // processes for i in range(processes + 1)))
+    with multiprocessing.Pool(processes, initializer=_attach,
+                              initargs=(name, fmt, N)) as pool:
+        pool.map(_sort_range, list(zip(runs, runs[1:])))
+        while len(runs) > 2:
+            # Merge pairs of runs, splitting merges to keep workers busy.
+            merges = [(runs[i], runs[i+1], runs[i+2])
+                      for i in range(0, len(runs) - 2, 2)]
+            pieces = max(1, processes // len(merges))
+            tasks = _split_merges(
+                merges, pieces, lambda splits: pool.map(_split_range, splits))
+            pool.map(_merge_range, tasks)
+            runs = runs[::2] + ([N] if len(runs) % 2 == 0 else [])
+
+
+def _split_merges(merges, pieces, split_all):
+    """Splits each of 'merges' in at most 'pieces' independent merges.
+
+    'merges' is a list of (start, mid, end) merges over disjoint ranges.
+    'split_all' maps _split_merge over a list of (start, mid, end, pieces),
+    e.g. with a pool of processes: each round splits every merge in two, and
+    the rotations of a round move disjoint ranges, so they can run in
+    parallel. Returns the list of (start, mid, end) merges, that sort the
+    ranges once all done.
+
+    Complexity:
+        - O(lg pieces) rounds, of O(max(end-start) / 2**round) time each with
+          a process per split
+        - O(len(merges) * pieces) space
+    """
+    tasks = []
+    splits = [(start, mid, end, pieces) for start, mid, end in merges]
+    while splits:
+        halves = [half for split in split_all(splits) for half in split]
+        tasks += [half[:3] for half in halves if half[3] <= 1]
+        splits = [half for half in halves if half[3] > 1]
+    return tasks
+
+
+def _split_merge(A, start, mid, end, pieces):
+    """Splits the merge of [start, mid) and [mid, end) in two, with a rotation.
+
+    Returns a list of (start, mid, end, pieces): the two independent merges
+    of each half of [start, end), to split in 'pieces' merges between them.
+    The merge is returned with 'pieces' of 1 if it is too short to split, and
+    the list is empty if [start, end) is already sorted.
+
+    Complexity:
+        - O(end-start) time, for the rotation
+        - O(1) space
+    """
+    if pieces <= 1 or end - start < 2 * PARALLEL_MIN_MERGE_LENGTH:
+        return [(start, mid, end, 1)]
+    if start == mid or mid == end:
+        return []  # Already sorted.
+    k = (end - start) // 2
+    a = merge._co_rank(A, start, mid - start, mid, end - mid, k)
+    split, ys_split = start + a, mid + k - a
+    # |xs[:a]|xs[a:]|ys[:k-a]|ys[k-a:]| -> |xs[:a]|ys[:k-a]|xs[a:]|ys[k-a:]|
+    array_utils.rotate_k_left(A, start=split, length=ys_split - split,
+                              k=mid - split)
+    middle = start + k
+    return [(start, split, middle, pieces // 2),
+            (middle, middle + mid - split, end, pieces - pieces // 2)]
+
+
+# Worker state: the shared memory block and its view, attached once.
+_shared = None
+
+
+def _attach(name, fmt, length):
+    global _shared
+    shm = shared_memory.SharedMemory(name=name)
+    _shared = (shm, shm.buf[:length * array.array(fmt).itemsize].cast(fmt))
+
+
+def _sort_range(bounds):
+    start, end = bounds
+    with _shared[1][start:end] as chunk:
+        merge.merge_sort_natural_inplace(chunk)
+
+
+def _split_range(bounds):
+    return _split_merge(_shared[1], *bounds)
+
+
+def _merge_range(bounds):
+    start, mid, end = bounds
+    merge.merge_inplace(_shared[1], start, end - start, mid=mid)
@@ -0,0 +1,94 @@
+import array
+import random
+import unittest
+from unittest import mock
+from parallel import parallel_merge_sort_inplace, _split_merge, _split_merges
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class SplitMergeTests(unittest.TestCase):
+    def test_split_merge(self):
+        random.seed(1337)
+        for n, m in [(100, 100), (150, 50), (1, 199), (200, 0), (64, 64)]:
+            values = random.sample(range(1000), n + m)
+            A = array.array("i", sorted(values[:n]) + sorted(values[n:]))
+            with mock.patch("parallel.PARALLEL_MIN_MERGE_LENGTH", 8):
+                merges = _split_merges(
+                    [(0, n, n + m)], 4,
+                    lambda splits: [_split_merge(A, *s) for s in splits])
+            self.assertLessEqual(len(merges), 4)
+            for start, mid, end in merges:
+                self.assertEqual(A[start:mid].tolist(),
+                                 sorted(A[start:mid]))
+                self.assertEqual(A[mid:end].tolist(), sorted(A[mid:end]))
+                A[start:end] = array.array("i", sorted(A[start:end]))
+            self.assertEqual(A.tolist(), sorted(values))
+
+    def test_short_merge_not_split(self):
+        A = array.array("i", [1, 3, 2, 4])
+        self.assertEqual(_split_merge(A, 0, 2, 4, pieces=8), [(0, 2, 4, 1)])
+
+    def test_splits_in_rounds_of_disjoint_ranges(self):
+        A = array.array("i", list(range(0, 400, 2)) + list(range(1, 400, 2)))
+        rounds = []
+
+        def split_all(splits):
+            rounds.append(splits)
+            return [_split_merge(A, *split) for split in splits]
+
+        with mock.patch("parallel.PARALLEL_MIN_MERGE_LENGTH", 8):
+            merges = _split_merges([(0, 200, 400)], 8, split_all)
+        self.assertEqual([len(splits) for splits in rounds], [1, 2, 4])
+        for splits in rounds:
+            ranges = sorted((start, end) for start, _, end, _ in splits)
+            for (_, end), (start, _) in zip(ranges, ranges[1:]):
+                self.assertLessEqual(end, start)
+        self.assertEqual(len(merges), 8)
+        for start, mid, end in merges:
+            A[start:end] = array.array("i", sorted(A[start:end]))
+        self.assertEqual(A.tolist(), list(range(400)))
+
+
+class ParallelMergeSortInplaceTests(unittest.TestCase):
+    def setUp(self):
+        random.seed(1337)
+        # Small arrays still go through the pool and split merges.
+        for name, value in [("PARALLEL_MIN_LENGTH", 16),
+                            ("PARALLEL_MIN_MERGE_LENGTH", 8)]:
+            patcher = mock.patch("parallel." + name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_random(self):
+        for processes in [1, 2, 3]:
+            values = [random.randrange(10**6) for _ in range(2000)]
+            A = array.array("q", values)
+            parallel_merge_sort_inplace(A, processes=processes)
+            self.assertEqual(A.tolist(), sorted(values))
+
+    def test_duplicates_floats(self):
+        values = [float(random.randrange(5)) for _ in range(3001)]
+        A = array.array("d", values)
+        parallel_merge_sort_inplace(A, processes=4)
+        self.assertEqual(A.tolist(), sorted(values))
+
+    def test_small(self):
+        for length in range(5):
+            A = array.array("i", reversed(range(length)))
+            parallel_merge_sort_inplace(A, processes=2)
+            self.assertEqual(A.tolist(), list(range(length)))
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed.")
+    def test_numpy(self):
+        A = numpy.random.default_rng(1337).random(5000)
+        expected = numpy.sort(A)
+        parallel_merge_sort_inplace(A, processes=3)
+        self.assertTrue(numpy.array_equal(A, expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+"""Merges that run a bounded amount of work at a time, e.g. in an event loop.
+
+merge_inplace runs to completion in one call, which at N = 10^7 in pure Python
+blocks the caller for seconds. StepwiseMerge runs the same steps (merge.py's
+*_steps generators) a few units of work at a time: finding the start of ys a
+chunk at a time, placing or merging one block, moving O(sqrt(N)) elements of a
+rotation, ...
+
+Being in-place, the merges never hold elements outside of A, so between two
+steps A[start:start+length) is always a permutation of its elements: pausing
+is only keeping the generator around. A must not be modified until the merge
+is done (reading it is fine, but it is only sorted at the end).
+
+Example:
+    merger = StepwiseMerge(A, 0, len(A), mid=n)
+    while not merger.step(budget_ops=10000):
+        handle_requests()
+or, in a coroutine:
+    await StepwiseMerge(A, 0, len(A), mid=n).run(yield_every=10000)
+"""
+
+import asyncio
+
+import array_utils
+import instrumentation
+import merge
+
+
+# Elements compared per unit of work when scanning for the start of ys.
+SCAN_LENGTH = 4096
+# Default operations between two yields to the event loop in
+# StepwiseMerge.run, about 1ms of work on lists.
+YIELD_EVERY = 20000
+
+
+class StepwiseMerge:
+    """merge_inplace, a unit of work at a time.
+
+    Arguments are as in merge.merge_inplace (without 'key', whose keys are
+    computed up front, in O(N)). 'phase' is the phase of the last unit of
+    work (see instrumentation.py): "0_setup", "fast_path", a step of the block
+    merge ("1.0_move_biggest", "1.1_make_multiples", "2_sort_blocks",
+    "3_merge_blocks", "4_sort_buffer", "checks"), of Kronrad's
+    ("kronrad_prepare", "kronrad_merge", "kronrad_cleanup") or "sym_merge"
+    with 'stable', and "done" once the merge is done. With 'stats',
+    operations are attributed to the phase only while a unit of work runs, so
+    merges can share 'stats' and be interleaved.
+
+    Units of work are of O(sqrt(N)) operations (moves and comparisons): the
+    rotations, of the block merge's step 1, of the fast path or of SymMerge,
+    move O(sqrt(N)) elements per unit (see array_utils.rotate_k_left_steps),
+    and the buffer sorts do O(sqrt(N)) operations of sift-downs of their heap
+    sort per unit. The exceptions are the buffer sorts of numeric arrays (one
+    O(sqrt(N) lg N) unit each, see vectorized.sort_buffer) and, with the
+    "full" validation policy, the checks (O(N)).
+
+    Complexity:
+        - Same as merge_inplace overall, O(1) extra time per unit of work
+        - O(1) space
+    """
+    def __init__(self, A, start, length, kronrad=False, adaptive=True,
+                 stats=None, stable=False, mid=None, validate=None):
+        self.phase = "0_setup"
+        self._steps = self._merge_steps(
+            instrumentation.count_operations(A, stats), start, length,
+            kronrad, adaptive, stats, stable, mid, validate)
+
+    @property
+    def done(self):
+        return self.phase == "done"
+
+    def step(self, budget_ops):
+        """Runs units of work until about 'budget_ops' operations are done.
+
+        The last unit may go over the budget. Returns whether the merge is
+        done.
+        """
+        assert budget_ops > 0
+        ops = 0
+        while ops < budget_ops and not self.done:
+            try:
+                self.phase, unit_ops = next(self._steps)
+                ops += unit_ops
+            except StopIteration:
+                self.phase = "done"
+        return self.done
+
+    async def run(self, yield_every=YIELD_EVERY):
+        """Runs the merge to completion, yielding to the event loop every
+        'yield_every' operations (see step)."""
+        while not self.step(yield_every):
+            await asyncio.sleep(0)
+
+    def _merge_steps(self, A, start, length, kronrad, adaptive, stats, stable,
+                     mid, validate):
+        """Same as merge_inplace, as a generator of (phase, operations) per
+        unit of work."""
+        ys_start = yield from merge._measure_steps(
+            stats, "0_setup", _find_mid_steps(A, start, length, mid))
+        if ys_start is None:
+            return  # Already sorted.
+        if adaptive:
+            fast_path = merge._merge_small_or_skewed_steps(
+                A, start, ys_start, start + length)
+            if (yield from merge._measure_steps(stats, "fast_path",
+                                                fast_path)):
+                return
+        if stable:
+            yield from merge._measure_steps(
+                stats, "sym_merge",
+                merge._sym_merge_steps(A, start, ys_start, start + length))
+            return
+        if kronrad:
+            yield from merge._kronrad_merge_steps(A, start, length, ys_start,
+                                                  stats=stats)
+        else:
+            yield from merge._block_merge_steps(A, start, length, ys_start,
+                                                stats=stats, validate=validate)
+
+
+def _find_mid_steps(A, start, length, mid=None):
+    """Same as merge._find_mid, scanning SCAN_LENGTH elements per unit."""
+    if mid is not None:
+        return merge._find_mid(A, start, length, mid)
+    end = start + length
+    for chunk_start in range(start, end, SCAN_LENGTH):
+        # Chunks overlap by one element, to compare across their boundaries.
+        ys_start = array_utils.find_first_unsorted_index(
+            A, chunk_start, min(SCAN_LENGTH + 1, end - chunk_start))
+        yield SCAN_LENGTH
+        if ys_start is not None:
+            return ys_start
+    return None
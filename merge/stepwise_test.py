@@ -0,0 +1,164 @@
+import asyncio
+import math
+import random
+import unittest
+import instrumentation
+from merge import merge_inplace
+from stepwise import StepwiseMerge
+
+
+class Keyed:
+    """Element compared only on its key, to check stability."""
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+class StepwiseMergeTests(unittest.TestCase):
+    def setUp(self):
+        random.seed(1337)
+
+    def runs(self, N, n):
+        values = random.sample(range(10 * N), N)
+        return sorted(values[:n]) + sorted(values[n:]), sorted(values)
+
+    def test_merges(self):
+        for N in [0, 1, 2, 10, 100, 1000, 2000]:
+            for n in {0, 1, N // 10, N // 2, N - 1} & set(range(N + 1)):
+                for kronrad in [False, True]:
+                    for adaptive in [False, True]:
+                        for mid in [None, n]:
+                            A, expected = self.runs(N, n)
+                            merger = StepwiseMerge(A, 0, N, kronrad=kronrad,
+                                                   adaptive=adaptive, mid=mid)
+                            while not merger.step(budget_ops=100):
+                                # Always a permutation of the input.
+                                self.assertEqual(sorted(A), expected)
+                            self.assertEqual(A, expected)
+                            self.assertTrue(merger.done)
+
+    def test_subarray(self):
+        A, expected = self.runs(1000, 300)
+        A = [-1] + A + [-1]
+        StepwiseMerge(A, 1, 1000).step(budget_ops=10**9)
+        self.assertEqual(A, [-1] + expected + [-1])
+
+    def unit_ops(self, A, N, **kwargs):
+        """Operations of each unit of work of StepwiseMerge(A, 0, N, ...).
+
+        Returns ({phase: [operations per unit]}, stats).
+        """
+        stats = instrumentation.MergeStats()
+        merger = StepwiseMerge(A, 0, N, stats=stats, **kwargs)
+        ops, previous = {}, 0
+        while not merger.step(budget_ops=1):
+            total = stats.as_dict()["total"]
+            ops.setdefault(merger.phase, []).append(
+                total["comparisons"] + total["moves"] - previous)
+            previous = total["comparisons"] + total["moves"]
+        return ops, stats
+
+    def test_bounded_steps(self):
+        N = 10000
+        A, expected = self.runs(N, N // 2)
+        ops, _ = self.unit_ops(A, N, mid=N // 2)
+        self.assertEqual(A, expected)
+        self.assertEqual(set(ops), {"checks", "1.0_move_biggest",
+                                    "1.1_make_multiples", "2_sort_blocks",
+                                    "3_merge_blocks", "4_sort_buffer"})
+        self.assertGreater(sum(map(len, ops.values())), math.isqrt(N))
+        # Step 1's rotations are done O(sqrt(N)) elements at a time, and the
+        # buffer sorts a sift-down at a time: all units are O(sqrt(N)).
+        self.assertGreater(len(ops["1.0_move_biggest"]), 10)
+        self.assertLessEqual(max(sum(ops.values(), [])), 10 * math.isqrt(N))
+
+    def test_bounded_fast_path_steps(self):
+        # Rotations of the fast path: a short xs, or few distinct elements.
+        N = 10000
+        for A, expected in [self.runs(N, 50),
+                            (sorted(random.choices(range(5), k=N // 2)) +
+                             sorted(random.choices(range(5), k=N // 2)),
+                             None)]:
+            expected = expected or sorted(A)
+            ops, _ = self.unit_ops(A, N)
+            self.assertEqual(A, expected)
+            self.assertGreater(len(ops["fast_path"]), 10)
+            self.assertLessEqual(max(ops["fast_path"]), 10 * math.isqrt(N))
+
+    def test_stable(self):
+        N = 3000
+        A = [Keyed(random.randrange(50), i) for i in range(N)]
+        A = (sorted(A[:N // 3], key=lambda a: a.key) +
+             sorted(A[N // 3:], key=lambda a: a.key))
+        expected = sorted(A, key=lambda a: a.key)
+        ops, _ = self.unit_ops(A, N, stable=True, adaptive=False)
+        self.assertEqual([(a.key, a.value) for a in A],
+                         [(a.key, a.value) for a in expected])
+        self.assertEqual(set(ops), {"0_setup", "sym_merge"})
+        self.assertLessEqual(max(ops["sym_merge"]), 10 * math.isqrt(N))
+
+    def test_kronrad_phases(self):
+        N = 1000
+        A, expected = self.runs(N, N // 3)
+        merger = StepwiseMerge(A, 0, N, kronrad=True, adaptive=False)
+        phases = []
+        while not merger.step(budget_ops=1):
+            phases.append(merger.phase)
+        self.assertEqual(A, expected)
+        self.assertEqual(list(dict.fromkeys(phases)),
+                         ["0_setup", "kronrad_prepare", "kronrad_merge",
+                          "kronrad_cleanup"])
+
+    def test_phase_left_between_steps(self):
+        N = 1000
+        A, expected = self.runs(N, N // 2)
+        B = list(A)
+        stats = instrumentation.MergeStats()
+        merger = StepwiseMerge(A, 0, N, stats=stats)
+        while not merger.step(budget_ops=100):
+            self.assertEqual(stats.phase, "other")
+        self.assertEqual(A, expected)
+        # Same counts per phase as merging in one call.
+        one_call = instrumentation.MergeStats()
+        merge_inplace(B, 0, N, stats=one_call)
+        self.assertEqual(stats.as_dict(), one_call.as_dict())
+
+    def test_interleaved_merges_share_stats(self):
+        N = 1000
+        runs = [self.runs(N, n) for n in [N // 2, N // 3]]
+        separate = instrumentation.MergeStats()
+        for A, _ in runs:
+            merge_inplace(list(A), 0, N, stats=separate)
+        shared = instrumentation.MergeStats()
+        mergers = [StepwiseMerge(A, 0, N, stats=shared) for A, _ in runs]
+        while not all([merger.step(budget_ops=50) for merger in mergers]):
+            pass
+        for A, expected in runs:
+            self.assertEqual(A, expected)
+        self.assertEqual(shared.as_dict(), separate.as_dict())
+
+    def test_run_yields_to_event_loop(self):
+        N = 10000
+        A, expected = self.runs(N, N // 2)
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(len(ticks))
+                await asyncio.sleep(0)
+
+        async def main():
+            ticker = asyncio.create_task(tick())
+            await StepwiseMerge(A, 0, N).run(yield_every=1000)
+            ticker.cancel()
+
+        asyncio.run(main())
+        self.assertEqual(A, expected)
+        self.assertGreater(len(ticks), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
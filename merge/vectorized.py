@@ -0,0 +1,204 @@
+"""Vectorized versions of the merge helpers, for numeric arrays.
+
+array.array, 1-D NumPy arrays and 1-D memoryviews of numbers (e.g. of shared
+memory, see parallel.py) support slice assignment, which moves whole stretches
+of elements at once instead of one element at a time in Python.
+array_utils.py and merge.py dispatch here when is_vectorizable(A).
+
+Lists and bytearrays support slice assignment too: array_utils.py also uses
+the helpers that only move elements (swaps and invertions) for them, with its
+own chunk length, see array_utils.supports_slices(A).
+
+The merges stay in-place: temporary copies are of at most CHUNK_LENGTH
+elements, except for the block heads and the buffer sort, which copy O(sqrt(N))
+elements (the size of the buffer).
+
+NumPy is optional, array.array is always supported.
+"""
+
+import array
+import bisect
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Most elements copied at once when moving stretches of elements.
+CHUNK_LENGTH = 4096
+# Stretches up to this length are cheaper to move one element at a time.
+SHORT_STRETCH_LENGTH = 8
+
+
+def is_vectorizable(A):
+    """Whether A is an array.array, a 1-D NumPy array or memoryview."""
+    return (isinstance(A, array.array) or is_numpy_array(A) or
+            (isinstance(A, memoryview) and A.ndim == 1 and
+             A.format in array.typecodes))
+
+
+def is_numpy_array(A):
+    """Whether A is a 1-D NumPy array."""
+    return numpy is not None and isinstance(A, numpy.ndarray) and A.ndim == 1
+
+
+def copy_slice(A, start, end, step=1):
+    """Copy of A[start:end:step] (NumPy and memoryview slices are views)."""
+    values = A[start:end:step]
+    if is_numpy_array(A):
+        return values.copy()
+    if isinstance(A, memoryview):
+        return array.array(A.format, values.tobytes())
+    return values
+
+
+def _bisect_left(A, value, lo, hi):
+    if is_numpy_array(A):
+        return lo + int(numpy.searchsorted(A[lo:hi], value, side="left"))
+    return bisect.bisect_left(A, value, lo, hi)
+
+
+def _bisect_right(A, value, lo, hi):
+    if is_numpy_array(A):
+        return lo + int(numpy.searchsorted(A[lo:hi], value, side="right"))
+    return bisect.bisect_right(A, value, lo, hi)
+
+
+def find_first_unsorted_index(A, start, length):
+    """Same as array_utils.find_first_unsorted_index, for NumPy arrays."""
+    assert is_numpy_array(A)
+    end = start + length
+    for i in range(start + 1, end, CHUNK_LENGTH):
+        chunk_end = min(i + CHUNK_LENGTH, end)
+        descents = numpy.flatnonzero(A[i-1:chunk_end-1] > A[i:chunk_end])
+        if len(descents) > 0:
+            return i + int(descents[0])
+    return None
+
+
+def swap_k_elements(A, start, k, target, chunk=None):
+    """Same as array_utils.swap_k_elements, a chunk at a time.
+
+    Chunks are of at most 'chunk' elements (CHUNK_LENGTH by default), and
+    never longer than the distance between 'start' and 'target', so
+    overlapping regions give the same result as swapping element by element
+    from left to right.
+    """
+    if k <= SHORT_STRETCH_LENGTH:
+        for i in range(k):
+            A[start+i], A[target+i] = A[target+i], A[start+i]
+        return
+    if start == target:
+        return
+    step = min(CHUNK_LENGTH if chunk is None else chunk, abs(target - start))
+    for i in range(0, k, step):
+        count = min(step, k - i)
+        s, t = start + i, target + i
+        values = copy_slice(A, s, s + count)
+        A[s:s+count] = A[t:t+count]
+        A[t:t+count] = values
+
+
+def invert(A, start, length, chunk=None):
+    """Same as array_utils.invert, swapping reversed chunks from both ends.
+
+    Chunks are of 'chunk' elements, CHUNK_LENGTH by default.
+    """
+    chunk = CHUNK_LENGTH if chunk is None else chunk
+    i, j = start, start + length  # Inverting [i, j).
+    while j - i >= 2 * chunk:
+        head = copy_slice(A, i, i + chunk)
+        A[i:i+chunk] = A[j-chunk:j][::-1]
+        A[j-chunk:j] = head[::-1]
+        i += chunk
+        j -= chunk
+    if j - i > 1:
+        A[i:j] = copy_slice(A, i, j)[::-1]
+
+
+def merge_into_target(A, xs_start, ys_start, target, length, ys_length=None):
+    """Same as merge._merge_into_target, moving stretches at a time.
+
+    Binary searches find how many ys go before the next x (and vice versa),
+    and those are swapped to 'target' together. As in the element by element
+    merge, ys go first on ties.
+
+    Complexity:
+        - O(length + ys_length) time (O(lg length) per stretch)
+        - O(1) space
+    """
+    if ys_length is None:
+        ys_length = length
+    x, xs_end = xs_start, xs_start + length
+    y, ys_end = ys_start, ys_start + ys_length
+    while x < xs_end and y < ys_end:
+        run = _bisect_right(A, A[x], y, ys_end) - y
+        swap_k_elements(A, start=y, k=run, target=target)
+        target += run
+        y += run
+        if y == ys_end:
+            break
+        run = _bisect_left(A, A[y], x, xs_end) - x
+        swap_k_elements(A, start=x, k=run, target=target)
+        target += run
+        x += run
+    swap_k_elements(A, start=x, k=xs_end - x, target=target)
+    target += xs_end - x
+    swap_k_elements(A, start=y, k=ys_end - y, target=target)
+
+
+def sort_blocks(A, start, length, Z, xs_blocks=None):
+    """Same as merge._sort_blocks, comparing a copy of the block heads.
+
+    The first and last elements of each block (O(sqrt(N)) of them) are copied
+    once and kept in sync with block swaps, so the smallest block is found with
+    a vectorized minimum.
+    """
+    assert length % Z == 0
+    num_blocks = length // Z
+    heads = copy_slice(A, start, start + length, Z)
+    tails = copy_slice(A, start + Z - 1, start + length, Z)
+
+    def swap_block(i, j):
+        swap_k_elements(A, start=start+i*Z, k=Z, target=start+j*Z)
+        heads[i], heads[j] = heads[j], heads[i]
+        tails[i], tails[j] = tails[j], tails[i]
+
+    def is_smaller(i, j):
+        if heads[i] != heads[j]:
+            return heads[i] < heads[j]
+        return tails[i] < tails[j]
+
+    # See merge._sort_blocks: without 'xs_blocks', all blocks are "xs".
+    y = num_blocks if xs_blocks is None else xs_blocks
+    for i in range(num_blocks):
+        if i == y:
+            break
+        smallest_x = i + _argmin(heads, tails, i, y)
+        if y < num_blocks and is_smaller(y, smallest_x):
+            swap_block(i, y)
+            y += 1
+        elif smallest_x != i:
+            swap_block(i, smallest_x)
+
+
+def _argmin(heads, tails, start, end):
+    """Offset from 'start' of the first smallest (head, tail) in [start, end).
+    """
+    if is_numpy_array(heads):
+        smallest_head = heads[start:end].min()
+        candidates = numpy.flatnonzero(heads[start:end] == smallest_head)
+        return int(candidates[numpy.argmin(tails[start:end][candidates])])
+    return min(range(start, end),
+               key=lambda i: (heads[i], tails[i])) - start
+
+
+def sort_buffer(A, start, length):
+    """Same as merge._sort_buffer, with a copy of the (O(sqrt(N))) buffer."""
+    if is_numpy_array(A):
+        A[start:start+length].sort()
+    else:
+        typecode = A.format if isinstance(A, memoryview) else A.typecode
+        A[start:start+length] = array.array(
+            typecode, sorted(A[start:start+length]))
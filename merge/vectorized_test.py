@@ -0,0 +1,151 @@
+import array
+import random
+import unittest
+from unittest import mock
+import array_utils
+import merge
+import vectorized
+from merge import (merge_inplace, merge_sort_inplace,
+                   merge_sort_buffered_inplace)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _random_runs(n, m):
+    values = random.sample(range(10 * (n + m)), n + m)
+    return sorted(values[:n]) + sorted(values[n:])
+
+
+class VectorizedPrimitivesTests(unittest.TestCase):
+    """Compares each vectorized helper with its element by element version."""
+    def setUp(self):
+        random.seed(1337)
+        # Small chunks, to go through the chunking logic on small arrays.
+        for name in ["vectorized.CHUNK_LENGTH",
+                     "array_utils.LIST_CHUNK_LENGTH"]:
+            patcher = mock.patch(name, 3)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_is_vectorizable(self):
+        self.assertTrue(vectorized.is_vectorizable(array.array("i", [1])))
+        self.assertFalse(vectorized.is_vectorizable([1]))
+        self.assertTrue(array_utils.supports_slices([1]))
+        self.assertTrue(array_utils.supports_slices(bytearray(1)))
+
+    def test_swap_k_elements_overlaps(self):
+        for start, target, k in [(0, 10, 8), (0, 2, 12), (5, 1, 9), (3, 3, 4),
+                                 (2, 8, 0)]:
+            expected = list(range(20))
+            for i in range(k):
+                expected[start+i], expected[target+i] = \
+                    expected[target+i], expected[start+i]
+            A = array.array("i", range(20))
+            vectorized.swap_k_elements(A, start=start, k=k, target=target)
+            self.assertEqual(A.tolist(), expected)
+
+    def test_invert(self):
+        for start in range(4):
+            for length in range(17):
+                A = array.array("i", range(20))
+                vectorized.invert(A, start, length)
+                expected = list(range(20))
+                expected[start:start+length] = \
+                    expected[start:start+length][::-1]
+                self.assertEqual(A.tolist(), expected)
+
+    def test_merge_into_target(self):
+        for length in range(1, 12):
+            for _ in range(10):
+                values = random.sample(range(4 * length), 2 * length)
+                xs, ys = sorted(values[:length]), sorted(values[length:])
+                # target, ys, then xs, with ys right after target.
+                expected = [-1] * length + ys + xs
+                merge._merge_into_target(expected, xs_start=2 * length,
+                                         ys_start=length, target=0,
+                                         length=length)
+                A = array.array("i", [-1] * length + ys + xs)
+                vectorized.merge_into_target(A, xs_start=2 * length,
+                                             ys_start=length, target=0,
+                                             length=length)
+                self.assertEqual(A.tolist(), expected)
+
+    def test_merge_into_target_duplicates(self):
+        xs, ys = [1, 1, 2, 2, 3], [1, 2, 2, 2, 4]
+        A = array.array("i", [-1] * 5 + ys + xs)
+        vectorized.merge_into_target(A, xs_start=10, ys_start=5, target=0,
+                                     length=5)
+        self.assertEqual(A[:10].tolist(), sorted(xs + ys))
+
+    def test_sort_blocks(self):
+        A = array.array("i", [9, 9, 1, 1, 5, 5, 1, 0, 3, 3, 7, 7])
+        expected = A.tolist()
+        merge._sort_blocks(expected, 0, len(expected), 2)
+        vectorized.sort_blocks(A, 0, len(A), 2)
+        self.assertEqual(A.tolist(), expected)
+        A = array.array("i", [1, 1, 4, 4, 6, 6, 2, 2, 3, 3, 5, 5])
+        vectorized.sort_blocks(A, 0, len(A), 2, xs_blocks=3)
+        self.assertEqual(A.tolist(), sorted(A))
+
+    def test_sort_buffer(self):
+        A = array.array("d", [5.0, 3.0, 2.0, 1.0, 0.0])
+        vectorized.sort_buffer(A, 1, 3)
+        self.assertEqual(A.tolist(), [5.0, 1.0, 2.0, 3.0, 0.0])
+
+
+class VectorizedMergeInplaceTests(unittest.TestCase):
+    def setUp(self):
+        random.seed(1337)
+
+    def test_merge_inplace_array(self):
+        for n, m in [(500, 500), (1000, 24), (3, 2000), (1500, 1300)]:
+            for kronrad in [False, True]:
+                A = array.array("q", _random_runs(n, m))
+                merge_inplace(A, 0, len(A), kronrad=kronrad)
+                self.assertEqual(A.tolist(), sorted(A))
+
+    def test_merge_inplace_block_array(self):
+        A = array.array("d", _random_runs(2000, 1000))
+        merge_inplace(A, 0, len(A), adaptive=False)
+        self.assertEqual(A.tolist(), sorted(A))
+
+    def test_merge_sort_inplace_array(self):
+        A = array.array("i", [random.randrange(100) for _ in range(1000)])
+        merge_sort_inplace(A)
+        self.assertEqual(A.tolist(), sorted(A))
+
+    def test_merge_sort_buffered_inplace_array(self):
+        A = array.array("i", [random.randrange(100) for _ in range(1000)])
+        merge_sort_buffered_inplace(A)
+        self.assertEqual(A.tolist(), sorted(A))
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed.")
+class NumpyMergeInplaceTests(unittest.TestCase):
+    def setUp(self):
+        random.seed(1337)
+
+    def test_find_first_unsorted_index(self):
+        A = numpy.array([1, 2, 3, 0, 4])
+        self.assertEqual(array_utils.find_first_unsorted_index(A, 0, 5), 3)
+        self.assertIsNone(array_utils.find_first_unsorted_index(A, 0, 3))
+
+    def test_merge_inplace(self):
+        for n, m in [(500, 500), (1000, 24), (1500, 1300)]:
+            for adaptive in [False, True]:
+                A = numpy.array(_random_runs(n, m), dtype=float)
+                merge_inplace(A, 0, len(A), adaptive=adaptive)
+                self.assertTrue(numpy.array_equal(A, numpy.sort(A)))
+
+    def test_merge_sort_inplace(self):
+        A = numpy.random.default_rng(1337).integers(0, 100, size=1000)
+        expected = numpy.sort(A)
+        merge_sort_inplace(A)
+        self.assertTrue(numpy.array_equal(A, expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+"""Validation policy shared by merge/ and cube-suffix/.
+
+Both trees check their results (sorted subarrays, lifted roots) as much as a
+single policy says:
+    - "off": no checks;
+    - "sampled" (default): a few of the checks, so that none costs a whole
+      extra pass over the input;
+    - "full": every check.
+What is sampled is up to merge/merge_validation.py and
+cube-suffix/hensel_validation.py, which both load this module once (as
+"validation_policy") and re-export it: setting the policy from either tree
+sets it for both.
+
+Example:
+    validation_policy.set_policy(validation_policy.FULL)  # e.g. debugging
+"""
+
+
+OFF = "off"
+SAMPLED = "sampled"
+FULL = "full"
+POLICIES = (OFF, SAMPLED, FULL)
+
+_policy = SAMPLED
+
+
+def set_policy(policy):
+    """Sets the policy used by calls that don't give one, returns the old one.
+    """
+    global _policy
+    previous, _policy = _policy, get_policy(policy)
+    return previous
+
+
+def get_policy(validate=None):
+    """Returns the policy 'validate' if given, otherwise the global policy."""
+    policy = _policy if validate is None else validate
+    assert policy in POLICIES, "Unknown validation policy: %s" % policy
+    return policy
@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+import unittest
+import validation_policy
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+
+class ValidationPolicyTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(validation_policy.set_policy,
+                        validation_policy.get_policy())
+
+    def test_default_is_sampled(self):
+        self.assertEqual(validation_policy.get_policy(),
+                         validation_policy.SAMPLED)
+
+    def test_set_policy(self):
+        self.assertEqual(validation_policy.set_policy(validation_policy.OFF),
+                         validation_policy.SAMPLED)
+        self.assertEqual(validation_policy.get_policy(),
+                         validation_policy.OFF)
+        self.assertEqual(validation_policy.get_policy(validation_policy.FULL),
+                         validation_policy.FULL)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(AssertionError):
+            validation_policy.set_policy("sometimes")
+        with self.assertRaises(AssertionError):
+            validation_policy.get_policy("sometimes")
+
+    def test_both_trees_in_one_process(self):
+        # ../merge and ../cube-suffix are importable side by side, and share
+        # the policy.
+        code = """
+import hensel
+import hensel_validation
+import merge
+import merge_validation
+from polynomial import Polynomial
+
+merge_validation.set_policy(merge_validation.FULL)
+assert hensel_validation.get_policy() == hensel_validation.FULL
+hensel_validation.set_policy(hensel_validation.OFF)
+assert merge_validation.get_policy() == merge_validation.OFF
+merge_validation.set_policy(merge_validation.FULL)
+A = [1, 3, 5, 2, 4, 6]
+merge.merge_inplace(A, 0, 6, 3)
+assert A == [1, 2, 3, 4, 5, 6], A
+f = Polynomial(coefficients=[-0x15, 0, 0, 1])
+assert hensel.first_root(f, 2, 8) == 0x8d
+"""
+        path = os.pathsep.join(os.path.join(ROOT, tree)
+                               for tree in ("merge", "cube-suffix"))
+        env = dict(os.environ, PYTHONPATH=path)
+        subprocess.run([sys.executable, "-c", code], env=env, check=True)
+
+
+if __name__ == "__main__":
+    unittest.main()